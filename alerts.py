@@ -0,0 +1,362 @@
+"""
+Real-Time System Monitor (RTSM) - Alerts Module
+
+This file contains the threshold alerting engine: rules such as
+`memory.percent > 90 for 30s` or `cpu > 95 avg 10s` are compiled once and
+checked on the sampler's collector threads as each sample is published.
+
+A rule is `METRIC OP THRESHOLD [for DURATION | avg DURATION] [clear LEVEL]`:
+"for" fires once the condition held for the whole duration, "avg" fires
+on the rolling average over the duration, and "clear" sets the level the
+value must go back past before the alert clears (5% of the threshold on
+the other side of it by default).
+"""
+
+import json
+import operator
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+ACTIONS = ("highlight", "bell", "json", "hook")
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+UNITS = {"": 1, "%": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+DURATION_UNITS = {"": 1, "s": 1, "ms": 0.001, "m": 60, "h": 3600}
+
+# Default distance of the clear level from the threshold, as a fraction of it
+DEFAULT_HYSTERESIS = 0.05
+
+RULE_PATTERN = re.compile(
+    r"^\s*(?P<metric>[a-z][a-z0-9_.]*)\s*(?P<op>>=|<=|>|<)\s*"
+    r"(?P<threshold>\d+(?:\.\d+)?)\s*(?P<unit>%|[kmgt](?:i?b)?)?"
+    r"(?:\s+(?P<mode>for|avg)\s+(?P<duration>\d+(?:\.\d+)?)\s*(?P<duration_unit>ms|s|m|h)?)?"
+    r"(?:\s+clear\s+(?P<clear>\d+(?:\.\d+)?)\s*(?P<clear_unit>%|[kmgt](?:i?b)?)?)?\s*$",
+    re.IGNORECASE
+)
+GPU_METRIC = re.compile(r"^gpu(?P<index>\d*)(?:\.(?P<field>usage|memory\.percent|memory\.used))?$")
+
+
+def _scale(value, unit):
+    """Apply a K/M/G/T (binary) or % suffix to a number"""
+    return float(value) * UNITS[(unit or "")[:1].lower()]
+
+
+def _gpu_extractor(index, field):
+    """Return a function picking a GPU field, the busiest GPU's without an index"""
+    if field == "usage":
+        pick = operator.itemgetter("usage")
+    else:
+        key = field.split(".")[1]
+        pick = lambda gpu: gpu["memory"][key]
+
+    def extract(value):
+        gpus = value.get("GPUs")
+        if not gpus:
+            return None
+        if index is None:
+            return max(map(pick, gpus))
+        for gpu in gpus:
+            if gpu["index"] == index:
+                return pick(gpu)
+        return None
+    return extract
+
+
+def metric_source(metric):
+    """
+    Resolve a rule's metric name
+
+    Returns:
+        tuple: (sampler collector name, function extracting the value
+            from what the collector published)
+
+    Raises:
+        ValueError: If the metric is unknown
+    """
+    if metric in ("cpu", "cpu.percent"):
+        return "cpu", float
+    if metric in ("memory", "memory.percent"):
+        return "memory", operator.itemgetter("percent")
+    if metric == "memory.used":
+        return "memory", operator.itemgetter("used")
+    match = GPU_METRIC.match(metric)
+    if match:
+        index = int(match["index"]) if match["index"] else None
+        return "gpu", _gpu_extractor(index, match["field"] or "usage")
+    raise ValueError(f"unknown metric '{metric}'")
+
+
+class AlertRule:
+    """
+    One compiled rule and its evaluation state
+
+    update() costs the same whatever the duration: "for" rules keep the
+    time the condition started holding, and "avg" rules keep a running
+    sum over a deque that each sample enters and leaves once.
+    """
+
+    __slots__ = ("text", "source", "extract", "compare", "threshold", "clear", "mode",
+                 "duration", "cooldown", "actions", "command", "firing", "value",
+                 "_since", "_fired_at", "_window", "_sum", "_first")
+
+    def __init__(self, text, actions=("highlight",), command=None, cooldown=60.0):
+        """
+        Compile `text`
+
+        Args:
+            text: Rule such as "memory.percent > 90 for 30s"
+            actions: Actions taken when the rule fires, from ACTIONS
+            command: Shell command run by the "hook" action
+            cooldown: Seconds after firing before the rule may fire again
+
+        Raises:
+            ValueError: If the rule or an action is invalid
+        """
+        match = RULE_PATTERN.match(text)
+        if not match:
+            raise ValueError(f"cannot parse alert rule '{text}'")
+        unknown = [action for action in actions if action not in ACTIONS]
+        if unknown:
+            raise ValueError(f"unknown alert action '{unknown[0]}' in '{text}'")
+        if "hook" in actions and not command:
+            raise ValueError(f"alert rule '{text}' has a hook action but no command")
+
+        self.text = text.strip()
+        self.source, self.extract = metric_source(match["metric"].lower())
+        op = match["op"]
+        self.compare = OPERATORS[op]
+        self.threshold = _scale(match["threshold"], match["unit"])
+        if match["clear"] is not None:
+            self.clear = _scale(match["clear"], match["clear_unit"])
+        else:
+            margin = abs(self.threshold) * DEFAULT_HYSTERESIS
+            self.clear = self.threshold - margin if op.startswith(">") else self.threshold + margin
+        self.mode = (match["mode"] or "").lower() or None
+        self.duration = (float(match["duration"]) * DURATION_UNITS[(match["duration_unit"] or "").lower()]
+                         if self.mode else 0.0)
+        self.cooldown = cooldown
+        self.actions = tuple(actions)
+        self.command = command
+        self.firing = False
+        self.value = None
+        self._since = None
+        self._fired_at = None
+        self._window = deque()
+        self._sum = 0.0
+        self._first = None
+
+    def update(self, now, value):
+        """
+        Feed one sample taken at monotonic time `now`
+
+        Returns:
+            str: "firing" or "cleared" when the state changed, else None
+        """
+        if self.mode == "avg":
+            window = self._window
+            window.append((now, value))
+            self._sum += value
+            if self._first is None:
+                self._first = now
+            while now - window[0][0] > self.duration:
+                self._sum -= window.popleft()[1]
+            value = self._sum / len(window)
+            ready = now - self._first >= self.duration
+        else:
+            ready = True
+        self.value = value
+
+        if self.firing:
+            # Hysteresis: stay firing until the value is back past the clear level
+            if self.compare(self.clear, value):
+                self.firing = False
+                self._since = None
+                return "cleared"
+            return None
+
+        if not self.compare(value, self.threshold):
+            self._since = None
+            return None
+        if self._since is None:
+            self._since = now
+        if self.mode == "for" and now - self._since < self.duration:
+            return None
+        if not ready:
+            return None
+        if self._fired_at is not None and now - self._fired_at < self.cooldown:
+            return None
+        self.firing = True
+        self._fired_at = now
+        return "firing"
+
+
+class AlertEngine:
+    """
+    Evaluate rules as the sampler publishes and carry out their actions
+
+    Register on_sample as a sampler listener. Highlights and the bell are
+    left for the UI thread to pick up; JSON events and hook commands run
+    on a small worker pool with a bounded backlog, so a slow hook never
+    delays a collector. Work beyond the backlog is dropped and counted.
+    """
+
+    def __init__(self, rules, log_path="rtsm-alerts.jsonl", workers=2, backlog=16,
+                 hook_timeout=30.0, clock=time.monotonic):
+        """
+        Args:
+            rules: Compiled AlertRules
+            log_path: File JSON events are appended to
+            workers: Threads running JSON writes and hooks
+            backlog: Most JSON writes and hooks queued or running at once
+            hook_timeout: Seconds a hook may run before it is killed
+            clock: Monotonic clock used for durations and cooldowns
+        """
+        self.rules = list(rules)
+        self.log_path = log_path
+        self.workers = workers
+        self.hook_timeout = hook_timeout
+        self.dropped = 0
+        self.bell = False
+        self._clock = clock
+        self._by_source = {}
+        for rule in self.rules:
+            self._by_source.setdefault(rule.source, []).append(rule)
+        self._slots = threading.BoundedSemaphore(backlog)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Compile the "alerts" section of a monitor config
+
+        Each entry is a rule string, or an object with "rule" and optional
+        "actions", "command" and "cooldown" keys. Invalid entries are
+        skipped and reported.
+
+        Returns:
+            tuple: (AlertEngine or None when there are no rules, list of
+                error messages)
+        """
+        rules = []
+        errors = []
+        default_actions = config.get("alert_actions", ["highlight"])
+        for entry in config.get("alerts") or ():
+            if isinstance(entry, str):
+                entry = {"rule": entry}
+            if not isinstance(entry, dict) or "rule" not in entry:
+                errors.append(f"alert without a rule: {entry}")
+                continue
+            try:
+                rules.append(AlertRule(
+                    entry["rule"],
+                    actions=entry.get("actions", default_actions),
+                    command=entry.get("command"),
+                    cooldown=float(entry.get("cooldown", config.get("alert_cooldown", 60.0)))
+                ))
+            except (TypeError, ValueError) as e:
+                errors.append(str(e))
+        if not rules:
+            return None, errors
+        return cls(rules, log_path=config.get("alert_log", "rtsm-alerts.jsonl")), errors
+
+    def on_sample(self, name, value):
+        """Sampler listener: evaluate the rules reading collector `name`"""
+        rules = self._by_source.get(name)
+        if not rules or value is None:
+            return
+        now = self._clock()
+        for rule in rules:
+            try:
+                sample = rule.extract(value)
+                if sample is None:
+                    continue
+                change = rule.update(now, sample)
+            except (KeyError, TypeError, ValueError, AttributeError):
+                # A collector reported an error instead of a reading
+                continue
+            if change is not None:
+                self._act(rule, change)
+
+    def _act(self, rule, change):
+        """Carry out the actions of a rule that fired or cleared"""
+        if change == "firing" and "bell" in rule.actions:
+            self.bell = True
+        if "json" in rule.actions:
+            self._submit(self._write_event, self._event(rule, change))
+        if "hook" in rule.actions and change == "firing":
+            self._submit(self._run_hook, rule.command, self._event(rule, change))
+
+    def _event(self, rule, change):
+        """Return the JSON event describing a state change"""
+        return {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "rule": rule.text,
+            "state": change,
+            "value": round(rule.value, 3),
+            "threshold": rule.threshold,
+        }
+
+    def _submit(self, func, *args):
+        """Run `func` on the worker pool unless the backlog is full"""
+        if not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            return
+        with self._pool_lock:
+            if self._pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="rtsm-alert")
+            future = self._pool.submit(func, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _write_event(self, event):
+        """Append one JSON event to the log"""
+        with self._log_lock:
+            try:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(event) + "\n")
+            except OSError:
+                self.dropped += 1
+
+    def _run_hook(self, command, event):
+        """Run a hook command with the event in its environment"""
+        env = dict(os.environ, RTSM_ALERT_RULE=event["rule"], RTSM_ALERT_STATE=event["state"],
+                   RTSM_ALERT_VALUE=str(event["value"]), RTSM_ALERT_EVENT=json.dumps(event))
+        try:
+            subprocess.run(command, shell=True, env=env, stdin=subprocess.DEVNULL,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           timeout=self.hook_timeout)
+        except (OSError, subprocess.SubprocessError):
+            self.dropped += 1
+
+    def active(self):
+        """Return the rules currently firing"""
+        return [rule for rule in self.rules if rule.firing]
+
+    def highlighted(self):
+        """Return the collector names whose panels should be highlighted"""
+        return {rule.source for rule in self.rules if rule.firing and "highlight" in rule.actions}
+
+    def take_bell(self):
+        """Return whether the bell should ring, and reset it"""
+        bell, self.bell = self.bell, False
+        return bell
+
+    def close(self, wait=True):
+        """Stop the worker pool once queued JSON writes and hooks finish, waiting if `wait`"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
\ No newline at end of file
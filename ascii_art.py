@@ -6,6 +6,7 @@ for displaying system logos.
 """
 
 import platform
+from utils import clip_to_width, display_width, FileWatcher
 
 # ASCII Art collection
 ASCII_ART = {
@@ -66,4 +67,57 @@ def get_ascii_art(custom_ascii=None):
     system = platform.system().lower()
     if system in ASCII_ART:
         return ASCII_ART[system]
-    return ASCII_ART["default"]  # Fallback
\ No newline at end of file
+    return ASCII_ART["default"]  # Fallback
+
+
+class ArtCache:
+    """
+    The ASCII art, loaded and measured once
+
+    Lines are measured in terminal columns when the art is loaded, and
+    clipped() keeps the lines cut to each screen size it was asked for,
+    so drawing the art does no work between resizes. A custom art file
+    is checked for edits at most every `check_interval` seconds.
+    """
+
+    # Screen sizes whose clipped lines are kept
+    MAX_SIZES = 4
+
+    def __init__(self, custom_ascii=None, check_interval=2.0):
+        """
+        Args:
+            custom_ascii: Path of a custom art file, or None for the OS logo
+            check_interval: Seconds between checks of the custom file
+        """
+        self.custom_ascii = custom_ascii
+        self._watcher = FileWatcher(custom_ascii, check_interval) if custom_ascii else None
+        self._load()
+
+    def _load(self):
+        """Read and measure the art"""
+        self.lines = tuple(get_ascii_art(self.custom_ascii).splitlines())
+        self.width = max(map(display_width, self.lines), default=0)
+        self._clipped = {}
+
+    def reload_if_changed(self):
+        """Reload the custom art file if it was edited; return True if it was"""
+        if self._watcher is None or not self._watcher.changed():
+            return False
+        try:
+            self._load()
+        except (OSError, UnicodeDecodeError):
+            # Unreadable for now; keep the art already loaded
+            return False
+        return True
+
+    def clipped(self, width, height):
+        """Return the lines cut to fit `width` columns and `height` rows"""
+        key = (width, height)
+        lines = self._clipped.get(key)
+        if lines is None:
+            if len(self._clipped) >= self.MAX_SIZES:
+                self._clipped.clear()
+            lines = self._clipped[key] = tuple(
+                clip_to_width(line, width) for line in self.lines[:height]
+            )
+        return lines
@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+Real-Time System Monitor (RTSM) - Benchmarks
+
+This file contains benchmarks for the monitor. Run it with the name of
+a benchmark, e.g. `python bench.py render`.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import platform
+import pty
+import select
+import signal
+import struct
+import sys
+import termios
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def bench_render(args):
+    """
+    Measure the bytes the dashboard writes to the terminal per frame
+
+    The monitor runs in a pseudo-terminal so every byte curses sends is
+    counted. Output produced during the warm-up (first layout) is skipped.
+    """
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.environ.setdefault("TERM", "xterm-256color")
+        os.execv(sys.executable, [
+            sys.executable, os.path.join(HERE, "main.py"),
+            "--refresh", str(args.refresh), "--gpu-backend", "fake"
+        ])
+
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", args.rows, args.cols, 0, 0))
+    start = time.monotonic()
+    warm_bytes = steady_bytes = 0
+    try:
+        while time.monotonic() - start < args.warmup + args.seconds:
+            ready, _, _ = select.select([fd], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                data = os.read(fd, 65536)
+            except OSError:
+                break
+            if time.monotonic() - start < args.warmup:
+                warm_bytes += len(data)
+            else:
+                steady_bytes += len(data)
+    finally:
+        os.write(fd, b"q")
+        time.sleep(0.5)
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(pid, 0)
+
+    frames = args.seconds / args.refresh
+    print(f"terminal:        {args.cols}x{args.rows}")
+    print(f"warm-up bytes:   {warm_bytes}")
+    print(f"steady bytes/s:  {steady_bytes / args.seconds:.1f}")
+    print(f"bytes/frame:     {steady_bytes / frames:.1f} (at {1 / args.refresh:.1f} frames/s)")
+
+
+def bench_collectors(args):
+    """
+    Measure the per-sample cost of the CPU and memory collectors
+
+    Each backend runs get_cpu_usage and get_memory_usage back to back
+    `--samples` times; the /proc reader is compared against psutil. The
+    cgroup backend also times its throttling and pressure read.
+    """
+    import resource_usage
+
+    results = {}
+    for backend in resource_usage.BACKENDS[1:]:
+        try:
+            resource_usage.set_backend(backend)
+        except RuntimeError as e:
+            print(f"{backend:8} unavailable ({e})")
+            continue
+        cases = [("cpu", resource_usage.get_cpu_usage), ("memory", resource_usage.get_memory_usage)]
+        if backend == "cgroup":
+            cases.append(("container", resource_usage.get_container_usage))
+        for name, func in cases:
+            func()
+            start = time.perf_counter()
+            for _ in range(args.samples):
+                func()
+            elapsed = time.perf_counter() - start
+            results[backend, name] = elapsed / args.samples
+            print(f"{backend:8} {name:8} {elapsed / args.samples * 1e6:8.1f} us/sample")
+
+    if ("procfs", "cpu") in results and ("psutil", "cpu") in results:
+        for name in ("cpu", "memory"):
+            speedup = results["psutil", name] / results["procfs", name]
+            print(f"procfs is {speedup:.1f}x faster for {name}")
+
+
+def bench_cluster(args):
+    """
+    Run `--agents` agents against an aggregator on localhost
+
+    Agents send synthetic snapshots from threads for `--seconds`; the
+    aggregator's received bytes per sample, host table cost and retained
+    memory are reported.
+    """
+    import random
+    import threading
+    from cluster import Agent, Aggregator
+    from exporter import Snapshot
+
+    static = {"OS": platform.platform(), "Hostname": "bench"}
+
+    def collect():
+        used = random.randrange(1 << 30, 4 << 30)
+        return Snapshot(time.time(), static, {
+            "CPU Usage": round(random.uniform(0, 100), 1),
+            "Memory": {"total": 8 << 30, "used": used, "percent": round(used / (8 << 30) * 100, 1)},
+        }, int(time.monotonic()))
+
+    aggregator = Aggregator("127.0.0.1:0", max_hosts=args.agents)
+    aggregator.start()
+    address = "127.0.0.1:{}".format(aggregator.server_address[1])
+    agents = [Agent(address, f"agent{i:04}", collect, interval=args.refresh)
+              for i in range(args.agents)]
+    threads = [threading.Thread(target=agent.run, daemon=True) for agent in agents]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    for agent in agents:
+        agent.stop()
+    for thread in threads:
+        thread.join()
+
+    start = time.perf_counter()
+    for _ in range(100):
+        rows = aggregator.hosts()
+    table = (time.perf_counter() - start) / 100
+    # What the aggregator keeps per host: the state and its metrics
+    kept = sum(
+        sys.getsizeof(host) + sys.getsizeof(host.metrics)
+        + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in host.metrics.items())
+        for host in aggregator._hosts.values()
+    )
+    aggregator.stop()
+
+    samples = sum(agent.sent for agent in agents)
+    print(f"hosts:           {len(rows)} of {args.agents}")
+    print(f"samples:         {samples} ({samples / args.seconds:.0f}/s)")
+    print(f"bytes/sample:    {aggregator.received_bytes / max(samples, 1):.1f}")
+    print(f"host table:      {table * 1e6:.0f} us")
+    print(f"state per host:  {kept / max(len(rows), 1):.0f} B")
+
+
+class FakeScreen:
+    """
+    Stand-in for a curses window that keeps nothing but byte counts
+
+    Lets a frame be rendered without a terminal or curses.initscr().
+    """
+
+    def __init__(self, rows=40, cols=120):
+        self.rows = rows
+        self.cols = cols
+        self.writes = 0
+        self.bytes = 0
+
+    def getmaxyx(self):
+        return self.rows, self.cols
+
+    def addstr(self, y, x, text, attr=0):
+        self.writes += 1
+        self.bytes += len(text.encode("utf-8"))
+
+    def erase(self):
+        pass
+
+    def noutrefresh(self):
+        pass
+
+
+def read_syscalls():
+    """Return the read and write syscalls made by this process, or None"""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(":") for line in f)
+    except OSError:
+        return None
+    return int(fields["syscr"]) + int(fields["syscw"])
+
+
+def measure(func, iterations):
+    """
+    Time `func` and count its allocations and syscalls
+
+    Returns:
+        dict: Latency percentiles in microseconds, tracemalloc peak and
+            retained bytes per call, and syscalls per call
+    """
+    for _ in range(min(iterations, 100)):
+        func()
+
+    timings = []
+    clock = time.perf_counter_ns
+    for _ in range(iterations):
+        start = clock()
+        func()
+        timings.append(clock() - start)
+    timings.sort()
+
+    # Syscalls, less the reads of /proc/self/io itself
+    before = read_syscalls()
+    for _ in range(iterations):
+        func()
+    after = read_syscalls()
+    overhead = read_syscalls() - after if after is not None else 0
+    syscalls = (after - before - overhead) / iterations if before is not None else None
+
+    # Allocations, on fewer calls since tracing is slow
+    traced = max(iterations // 10, 10)
+    tracemalloc.start()
+    try:
+        current, _ = tracemalloc.get_traced_memory()
+        peak = 0
+        for _ in range(traced):
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+        retained = (tracemalloc.get_traced_memory()[0] - current) / traced
+    finally:
+        tracemalloc.stop()
+
+    def percentile(p):
+        return timings[min(int(len(timings) * p / 100), len(timings) - 1)] / 1000
+
+    return {
+        "iterations": iterations,
+        "mean_us": sum(timings) / len(timings) / 1000,
+        "p50_us": percentile(50),
+        "p99_us": percentile(99),
+        "max_us": timings[-1] / 1000,
+        "alloc_peak_bytes": peak,
+        "alloc_retained_bytes": retained,
+        "syscalls": syscalls,
+    }
+
+
+def offline_dashboard(args, history_size=None):
+    """
+    Return a monitor and a renderer drawing on a FakeScreen
+
+    The monitor uses the fake GPU backend and has taken no sample yet;
+    `history_size` shortens its ring buffers.
+    """
+    import resource_usage
+    from gpu import FakeGPUBackend, GPUCollector
+    from monitor import RealTimeSystemMonitor
+    from renderer import Renderer
+
+    resource_usage.set_backend(args.backend)
+    gpu_collector = GPUCollector(FakeGPUBackend())
+    gpu_collector.poll()
+
+    monitor = RealTimeSystemMonitor(gpu_available=True, gpu_backend="fake")
+    monitor.gpu_collector = gpu_collector
+    monitor.attrs = dict.fromkeys(
+        ("title", "header", "label", "value", "ascii", "bar_filled", "bar_empty", "help", "alert"), 0
+    )
+    if history_size is not None:
+        monitor.history.capacity = history_size
+    renderer = Renderer(FakeScreen(args.rows, args.cols), update=lambda: None)
+    return monitor, renderer
+
+
+def suite_cases(args):
+    """Return the (name, function) pairs the suite measures"""
+    import atexit
+    import itertools
+    import resource_usage
+    from alerts import AlertEngine, AlertRule
+    from ascii_art import ArtCache, get_ascii_art
+    from bus import BusSampler, Publisher
+    from exporter import SnapshotCollector
+    from system_info import get_system_info
+    from utils import format_bytes
+
+    # A dashboard drawing on a fake screen, fed by one synchronous sample
+    monitor, renderer = offline_dashboard(args)
+    gpu_collector = monitor.gpu_collector
+    monitor.sampler.sample_once()
+    snapshot = monitor.sampler.snapshot()
+
+    def frame():
+        monitor.draw_frame(renderer, snapshot)
+        renderer.flush()
+
+    def layout_frame():
+        monitor._layout_key = None
+        frame()
+
+    # What drawing the art costs per frame once it is cached
+    art = ArtCache()
+
+    def cached_art():
+        art.reload_if_changed()
+        return art.clipped(args.cols, args.rows)
+
+    # Alert evaluation with a 10 s and a 1 h window; each call is 1 s later
+    def alert_engine(window):
+        rules = [AlertRule(f"cpu > 95 avg {window}"), AlertRule(f"cpu > 95 for {window}")]
+        engine = AlertEngine(rules, clock=itertools.count().__next__)
+        return lambda: engine.on_sample("cpu", 50.0)
+
+    # A snapshot bus viewer checking for news, and decoding the frame's
+    # snapshot each time it is published again
+    publisher = Publisher(f"rtsm-bench-{os.getpid()}")
+    atexit.register(publisher.close)
+    publisher.publish(snapshot, {})
+    viewer = BusSampler(publisher.name)
+    counts = {"cpu": 0}
+
+    def bus_decode():
+        counts["cpu"] += 1
+        publisher.publish(snapshot, counts)
+        viewer.poll()
+
+    # Every headless source at once on the collector pool
+    collector = SnapshotCollector(gpu_collector)
+    atexit.register(collector.close)
+
+    return [
+        ("system_info", get_system_info),
+        ("resource_usage", lambda: resource_usage.get_resource_usage(True, gpu_collector)),
+        ("snapshot_pool", collector.collect),
+        ("ascii_art", get_ascii_art),
+        ("ascii_art_cached", cached_art),
+        ("format_bytes", lambda: format_bytes(123456789)),
+        ("frame", frame),
+        ("frame_layout", layout_frame),
+        ("alerts_10s", alert_engine("10s")),
+        ("alerts_1h", alert_engine("1h")),
+        ("bus_poll", viewer.poll),
+        ("bus_decode", bus_decode),
+    ]
+
+
+def bench_suite(args):
+    """
+    Measure collectors and one dashboard frame
+
+    Runs offline without a terminal, curses or a GPU: the frame is drawn
+    on a FakeScreen with a FakeGPUBackend. Results can be written as JSON
+    with --json and compared against an earlier run with --compare.
+    """
+    import resource_usage
+
+    cases = suite_cases(args)
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": resource_usage.get_backend(),
+        "terminal": f"{args.cols}x{args.rows}",
+        "timestamp": time.time(),
+        "cases": {},
+    }
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f).get("cases", {})
+
+    print(f"{'case':<16}{'p50 us':>10}{'p99 us':>10}{'alloc B':>10}{'kept B':>9}{'syscalls':>10}"
+          + (f"{'p50 vs base':>13}" if baseline else ""))
+    for name, func in cases:
+        if args.cases and name not in args.cases:
+            continue
+        result = measure(func, args.iterations)
+        results["cases"][name] = result
+        syscalls = "-" if result["syscalls"] is None else f"{result['syscalls']:.2f}"
+        line = (f"{name:<16}{result['p50_us']:>10.1f}{result['p99_us']:>10.1f}"
+                f"{result['alloc_peak_bytes']:>10}{result['alloc_retained_bytes']:>9.0f}{syscalls:>10}")
+        if name in baseline:
+            change = result["p50_us"] / baseline[name]["p50_us"] * 100 - 100
+            line += f"{change:>+12.1f}%"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def resident_bytes():
+    """Return this process's resident memory"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # Peak rather than current, but it still shows growth
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def bench_soak(args):
+    """
+    Check that a long run keeps its memory flat
+
+    Draws `--frames` frames on a FakeScreen with every panel shown,
+    taking a real sample every `--sample-every` frames so values, caches
+    and the history keep changing. Warm-up fills the ring buffers; after
+    it, traced Python memory and RSS must not grow by more than
+    `--max-growth-kb`, or the benchmark exits with status 1.
+    """
+    import gc
+
+    monitor, renderer = offline_dashboard(args, history_size=args.history)
+    for panel in ("show_processes", "show_cores", "show_disks", "show_network"):
+        monitor.config[panel] = True
+    monitor.update_panels()
+    sampler = monitor.sampler
+
+    def run(frames):
+        for frame in range(frames):
+            if frame % args.sample_every == 0:
+                sampler.sample_once()
+            monitor.draw_frame(renderer, sampler.snapshot())
+            renderer.flush()
+
+    # Fill the ring buffers and every cache before measuring; objects
+    # allocated before tracing get replaced, so the baseline is taken
+    # after a few traced samples
+    for _ in range(args.history):
+        sampler.sample_once()
+    tracemalloc.start()
+    run(args.sample_every * 10)
+    gc.collect()
+    traced_before = tracemalloc.get_traced_memory()[0]
+    rss_before = resident_bytes()
+    start = time.perf_counter()
+    run(args.frames)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    traced_growth = tracemalloc.get_traced_memory()[0] - traced_before
+    tracemalloc.stop()
+    rss_growth = resident_bytes() - rss_before
+
+    print(f"frames:          {args.frames} ({args.frames // args.sample_every} samples)")
+    print(f"frame time:      {elapsed / args.frames * 1e6:.1f} us (traced)")
+    print(f"traced growth:   {traced_growth / 1024:.1f} KB")
+    print(f"RSS growth:      {rss_growth / 1024:.1f} KB")
+    limit = args.max_growth_kb * 1024
+    if traced_growth > limit or rss_growth > limit:
+        print(f"FAIL: memory grew by more than {args.max_growth_kb} KB")
+        sys.exit(1)
+    print("OK: memory stayed flat")
+
+
+def write_tree(root, files):
+    """Write `files`, a dict of relative path to contents, under `root`"""
+    for path, text in files.items():
+        path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Rewritten in place: the readers keep their descriptors open
+        with open(path, "w") as f:
+            f.write(text)
+
+
+def bench_cgroup(args):
+    """
+    Check the cgroup readers against fake v1 and v2 cgroup filesystems
+
+    Each tree is built in a temporary directory and read through
+    open_cgroup_reader, then its counters are advanced by one second of
+    a half-busy, half-throttled pod. The readings must match the values
+    the files imply, or the benchmark exits with status 1.
+    """
+    import tempfile
+    from cgroup import CgroupV1Reader, open_cgroup_reader
+
+    gib = 1 << 30
+    cases = [
+        (
+            "v2", "0::/kubepods/pod\n",
+            {
+                "cgroup.controllers": "cpu memory io\n",
+                "kubepods/pod/cpu.max": "50000 100000\n",
+                "kubepods/pod/cpu.stat": "usage_usec 1000000\nnr_periods 100\n"
+                                         "nr_throttled 10\nthrottled_usec 200000\n",
+                "kubepods/pod/memory.current": f"{gib // 2}\n",
+                "kubepods/pod/memory.max": f"{gib}\n",
+                "kubepods/pod/memory.stat": f"anon 1\ninactive_file {gib // 4}\n",
+                "kubepods/pod/cpu.pressure": "some avg10=1.50 avg60=0.00 avg300=0.00 total=1\n",
+                "kubepods/pod/memory.pressure": "some avg10=0.25 avg60=0.00 avg300=0.00 total=1\n",
+            },
+            {
+                "kubepods/pod/cpu.stat": "usage_usec 1250000\nnr_periods 110\n"
+                                         "nr_throttled 15\nthrottled_usec 300000\n",
+            },
+            {"cpu": 50.0, "memory": {"total": gib, "used": gib // 4, "percent": 25.0},
+             "cpu_limit": 0.5, "memory_limit": gib, "throttled_percent": 50.0,
+             "throttled_seconds": 0.3, "pressure": {"cpu": 1.5, "memory": 0.25}},
+        ),
+        (
+            "v1", "5:cpu,cpuacct:/docker/pod\n3:memory:/docker/pod\n",
+            {
+                "cpu/docker/pod/cpu.cfs_quota_us": "200000\n",
+                "cpu/docker/pod/cpu.cfs_period_us": "100000\n",
+                "cpu/docker/pod/cpu.stat": "nr_periods 100\nnr_throttled 10\n"
+                                           "throttled_time 200000000\n",
+                "cpuacct/docker/pod/cpuacct.usage": "1000000000\n",
+                "memory/docker/pod/memory.usage_in_bytes": f"{gib}\n",
+                "memory/docker/pod/memory.limit_in_bytes": f"{CgroupV1Reader.UNLIMITED}\n",
+                "memory/docker/pod/memory.stat": f"cache 1\ntotal_inactive_file {gib // 2}\n",
+            },
+            {
+                "cpu/docker/pod/cpu.stat": "nr_periods 110\nnr_throttled 15\n"
+                                           "throttled_time 300000000\n",
+                "cpuacct/docker/pod/cpuacct.usage": "2000000000\n",
+            },
+            # No memory limit: the working set is measured against the host
+            {"cpu": 50.0, "memory": {"total": 8 * gib, "used": gib // 2, "percent": 6.2},
+             "cpu_limit": 2.0, "memory_limit": None, "throttled_percent": 50.0,
+             "throttled_seconds": 0.3, "pressure": None},
+        ),
+    ]
+
+    failed = False
+    for version, proc_cgroup, files, after, expected in cases:
+        with tempfile.TemporaryDirectory() as root:
+            write_tree(root, files)
+            write_tree(root, {"self-cgroup": proc_cgroup})
+            now = [0.0]
+            reader = open_cgroup_reader(root, os.path.join(root, "self-cgroup"), cpu_count=4,
+                                        host_memory=8 * gib, clock=lambda: now[0])
+            if reader is None or reader.version != int(version[1]):
+                print(f"FAIL: {version} tree read as {reader and f'v{reader.version}'}")
+                failed = True
+                continue
+            write_tree(root, after)
+            now[0] = 1.0
+            start = time.perf_counter()
+            readings = {"cpu": reader.cpu_percent(), "memory": reader.memory_usage(),
+                        **reader.container_usage()}
+            elapsed = time.perf_counter() - start
+            reader.close()
+        wrong = {key: readings.get(key) for key, value in expected.items()
+                 if readings.get(key) != value}
+        if wrong:
+            print(f"FAIL: {version} read {wrong}, expected "
+                  f"{ {key: expected[key] for key in wrong} }")
+            failed = True
+        else:
+            print(f"OK: {version} read as expected in {elapsed * 1e6:.1f} us")
+
+    with tempfile.TemporaryDirectory() as root:
+        if open_cgroup_reader(root, os.path.join(root, "missing")) is not None:
+            print("FAIL: a reader was returned without a cgroup filesystem")
+            failed = True
+        else:
+            print("OK: no reader without a cgroup filesystem")
+    if failed:
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    "render": bench_render,
+    "collectors": bench_collectors,
+    "suite": bench_suite,
+    "cluster": bench_cluster,
+    "soak": bench_soak,
+    "cgroup": bench_cgroup,
+}
+
+
+def main():
+    """Parse arguments and run the requested benchmark"""
+    parser = argparse.ArgumentParser(description="RTSM benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS),
+                        help="Benchmark to run")
+    parser.add_argument("--seconds", type=float, default=10.0,
+                        help="Measurement duration in seconds (default: 10)")
+    parser.add_argument("--warmup", type=float, default=3.0,
+                        help="Seconds to skip before measuring (default: 3)")
+    parser.add_argument("--refresh", type=float, default=0.2,
+                        help="Monitor refresh rate in seconds (default: 0.2)")
+    parser.add_argument("--samples", type=int, default=20000,
+                        help="Samples per collector benchmark (default: 20000)")
+    parser.add_argument("--iterations", type=int, default=2000,
+                        help="Timed calls per suite case (default: 2000)")
+    parser.add_argument("--backend", type=str, default="auto",
+                        choices=["auto", "cgroup", "procfs", "psutil"],
+                        help="CPU and memory collector used by the suite (default: auto)")
+    parser.add_argument("--cases", nargs="+", metavar="CASE",
+                        help="Suite cases to run (default: all)")
+    parser.add_argument("--json", type=str, metavar="FILE",
+                        help="Write suite results as JSON")
+    parser.add_argument("--compare", type=str, metavar="FILE",
+                        help="Compare suite results against an earlier --json file")
+    parser.add_argument("--agents", type=int, default=200,
+                        help="Agents run by the cluster benchmark (default: 200)")
+    parser.add_argument("--frames", type=int, default=100000,
+                        help="Frames drawn by the soak benchmark (default: 100000)")
+    parser.add_argument("--sample-every", type=int, default=500,
+                        help="Frames per sample in the soak benchmark (default: 500)")
+    parser.add_argument("--history", type=int, default=300,
+                        help="Ring buffer length in the soak benchmark (default: 300)")
+    parser.add_argument("--max-growth-kb", type=float, default=256.0,
+                        help="Memory growth the soak benchmark tolerates (default: 256)")
+    parser.add_argument("--rows", type=int, default=40, help="Terminal rows")
+    parser.add_argument("--cols", type=int, default=120, help="Terminal columns")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+"""
+Real-Time System Monitor (RTSM) - Snapshot Bus Module
+
+This file contains the shared-memory snapshot bus. One publisher process
+per host runs the collectors and writes every new snapshot into a
+multiprocessing.shared_memory segment; dashboards and headless exporters
+map the segment read-only and draw from it, so any number of them cost
+the host one set of collections and one GPU poller.
+
+The segment starts with a header guarded by a seqlock: the publisher
+makes the sequence number odd, writes, then makes it even again, and a
+viewer retries until it read the same even number before and after its
+copy. The payload is the snapshot as JSON, decoded only when its
+generation moved.
+
+The segment belongs to one user: it is named after their uid, created
+readable by them alone, and viewers refuse to map a segment someone else
+owns, since the snapshot holds their processes' memory and I/O.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from types import MappingProxyType
+from sampler import NO_STATES, notify_listeners
+
+# One bus per user; the snapshot is not for other users to read
+DEFAULT_NAME = f"rtsm-{os.getuid()}" if hasattr(os, "getuid") else "rtsm"
+# Bytes reserved for the snapshot; a few KB are used
+DEFAULT_SIZE = 1 << 20
+# Seconds between publisher heartbeats, and without one before viewers give up
+HEARTBEAT = 1.0
+STALE_AFTER = 5.0
+
+MAGIC = b"RTSM"
+LAYOUT = 2
+
+# magic, layout, sequence, then the fields written under the seqlock:
+# heartbeat (CLOCK_MONOTONIC, shared by all processes), publisher pid,
+# payload length and payload generation
+HEADER = struct.Struct("<4sIQdIIQ")
+SEQUENCE = struct.Struct("<Q")
+SEQUENCE_OFFSET = 8
+STATE = struct.Struct("<dIIQ")
+STATE_OFFSET = 16
+PAYLOAD_OFFSET = 64
+READ_RETRIES = 100
+
+# Where POSIX shared memory is visible as files (Linux)
+SHM_DIR = "/dev/shm"
+
+_MISSING = object()
+
+
+def _open_segment(name):
+    """
+    Map segment `name` for reading
+
+    Returns:
+        tuple: (memoryview of the segment, function releasing it)
+
+    Raises:
+        OSError: If there is no such segment, or another user owns it
+    """
+    if os.path.isdir(SHM_DIR):
+        # A read-only mapping: viewers cannot disturb the publisher
+        fd = os.open(os.path.join(SHM_DIR, name), os.O_RDONLY | os.O_NOFOLLOW)
+        try:
+            owner = os.fstat(fd).st_uid
+            if owner != os.getuid():
+                raise PermissionError(f"segment is owned by uid {owner}")
+            segment = mmap.mmap(fd, 0, prot=mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        view = memoryview(segment)
+
+        def release():
+            view.release()
+            segment.close()
+        return view, release
+
+    from multiprocessing import resource_tracker, shared_memory
+    try:
+        segment = shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment with the
+        # resource tracker, which would unlink it when this process exits
+        segment = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment.buf, segment.close
+
+
+def read_header(buf):
+    """
+    Return the header of a bus segment as a dict, or None if it is not one
+
+    The fields are read without the seqlock, which is fine for the
+    publisher checks they are used for.
+    """
+    if len(buf) < PAYLOAD_OFFSET:
+        return None
+    magic, layout, sequence, heartbeat, pid, length, generation = HEADER.unpack_from(buf)
+    if magic != MAGIC or layout != LAYOUT:
+        return None
+    return {"heartbeat": heartbeat, "pid": pid, "length": length, "generation": generation}
+
+
+class Publisher:
+    """
+    Write snapshots into the bus segment for viewers to read
+
+    Publishing is safe from several collector threads at once. A
+    heartbeat only moves the sequence number, so viewers keep the
+    snapshot they decoded.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, size=DEFAULT_SIZE, stale_after=STALE_AFTER,
+                 clock=time.monotonic):
+        """
+        Create the segment
+
+        Args:
+            name: Segment name, shared by the publisher and its viewers
+            size: Bytes reserved for the snapshot
+            stale_after: Seconds without a heartbeat after which a
+                segment left behind is taken over
+            clock: Monotonic clock shared by all processes on the host
+
+        Raises:
+            RuntimeError: If another publisher is running or the segment
+                cannot be created
+        """
+        self.name = name
+        self.published = 0
+        self.dropped = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._generation = 0
+        self._length = 0
+        self._encoder = json.JSONEncoder(separators=(",", ":"))
+        self._memory = self._create(name, PAYLOAD_OFFSET + size, stale_after)
+        struct.pack_into("<4sI", self._memory.buf, 0, MAGIC, LAYOUT)
+        self.heartbeat()
+
+    def _create(self, name, size, stale_after):
+        """Create the segment, replacing one whose publisher died"""
+        from multiprocessing import shared_memory
+        try:
+            try:
+                memory = shared_memory.SharedMemory(name, create=True, size=size)
+            except FileExistsError:
+                buf, release = _open_segment(name)
+                try:
+                    header = read_header(buf)
+                finally:
+                    release()
+                if header is not None and self._clock() - header["heartbeat"] <= stale_after:
+                    raise RuntimeError(f"a publisher (pid {header['pid']}) is already "
+                                       f"running on bus '{name}'")
+                shared_memory.SharedMemory(name).unlink()
+                memory = shared_memory.SharedMemory(name, create=True, size=size)
+        except OSError as e:
+            raise RuntimeError(f"cannot create bus '{name}': {e}")
+        # SharedMemory creates the segment with mode 0600, readable by
+        # this user's viewers only
+        return memory
+
+    def publish(self, snapshot, counts):
+        """
+        Write a snapshot for the viewers
+
+        Args:
+            snapshot: Mapping of collector name to its latest value
+            counts: Samples taken so far by collector name, so viewers
+                can tell a repeated value from no new sample
+
+        Returns:
+            bool: False if the snapshot could not be encoded or did not fit
+        """
+        with self._lock:
+            return self._publish(snapshot, counts)
+
+    def _publish(self, snapshot, counts):
+        """publish() for a caller holding the lock"""
+        try:
+            payload = self._encoder.encode([dict(snapshot), counts]).encode("utf-8")
+        except (TypeError, ValueError):
+            self.dropped += 1
+            return False
+        if PAYLOAD_OFFSET + len(payload) > self._memory.size:
+            self.dropped += 1
+            return False
+        self._generation += 1
+        self._length = len(payload)
+        self._write(payload)
+        self.published += 1
+        return True
+
+    def heartbeat(self, at=None):
+        """Tell viewers the publisher is alive"""
+        with self._lock:
+            self._write(None, at)
+
+    def _write(self, payload, at=None):
+        """Write the payload, if any, and the state fields under the seqlock"""
+        buf = self._memory.buf
+        sequence = self._sequence + 1
+        SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, sequence)
+        if payload is not None:
+            buf[PAYLOAD_OFFSET:PAYLOAD_OFFSET + len(payload)] = payload
+        STATE.pack_into(buf, STATE_OFFSET, self._clock() if at is None else at,
+                        os.getpid(), self._length, self._generation)
+        self._sequence = sequence + 1
+        SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, self._sequence)
+
+    def attach(self, sampler):
+        """
+        Publish `sampler`'s snapshot after each of its samples
+
+        Every collector thread publishes, so the snapshot is taken, counted
+        and written under the lock: a snapshot taken earlier can then never
+        be written over a newer one, which viewers would see as a count
+        going back.
+        """
+        counts = {}
+
+        def publish(name, value):
+            with self._lock:
+                counts[name] = counts.get(name, 0) + 1
+                self._publish(sampler.snapshot(), counts)
+        sampler.add_listener(publish)
+
+    def close(self):
+        """Remove the segment; attached viewers see the publisher gone at once"""
+        if self._memory is None:
+            return
+        self.heartbeat(at=0.0)
+        self._memory.close()
+        try:
+            self._memory.unlink()
+        except OSError:
+            pass
+        self._memory = None
+
+
+class BusSampler:
+    """
+    Stand in for the Sampler by reading what a publisher collected
+
+    A thread reads the header every `poll_interval` seconds, decodes the
+    payload only when the publisher wrote a new snapshot, and calls the
+    listeners for the collectors that sampled since. Values equal to the
+    previous ones are kept as the previous objects, and an unchanged
+    snapshot stays the same object, as with the Sampler.
+
+    When the heartbeat stops for `stale_after` seconds the segment is
+    opened again, in case the publisher restarted; failing that,
+    `fallback` (when set) is called for a local Sampler that collects
+    from then on.
+    """
+
+    kind = "bus"
+
+    def __init__(self, name=DEFAULT_NAME, stale_after=STALE_AFTER, poll_interval=0.1,
+                 clock=time.monotonic):
+        """
+        Attach to a running publisher
+
+        Args:
+            name: Segment name the publisher uses
+            stale_after: Seconds without a heartbeat before the publisher
+                is considered gone
+            poll_interval: Seconds between header reads
+            clock: Monotonic clock shared by all processes on the host
+
+        Raises:
+            RuntimeError: If no publisher is running on the bus
+        """
+        self.name = name
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.started_at = None
+        self.publisher_pid = None
+        self.errors = 0
+        self.listener_errors = 0
+        self.fallback = None
+        self.local = None
+        self._timings = None
+        self._clock = clock
+        self._listeners = []
+        self._snapshot = MappingProxyType({})
+        self._counts = {}
+        self._generation = None
+        self._heartbeat = None
+        self._buf = None
+        self._release = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.open()
+
+    def open(self):
+        """(Re)attach to the segment and read the latest snapshot; raises RuntimeError"""
+        try:
+            buf, release = _open_segment(self.name)
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"no publisher on bus '{self.name}': {e}")
+        header = read_header(buf)
+        if (header is None or header["generation"] == 0
+                or self._clock() - header["heartbeat"] > self.stale_after):
+            release()
+            raise RuntimeError(f"no publisher on bus '{self.name}'")
+        self._close_segment()
+        self._buf, self._release = buf, release
+        self._generation = None
+        self.poll()
+
+    def _close_segment(self):
+        """Unmap the segment, if mapped"""
+        if self._release is not None:
+            self._buf = None
+            self._release()
+            self._release = None
+
+    @property
+    def attached(self):
+        """True while reading a publisher whose heartbeat is fresh"""
+        heartbeat = self._heartbeat
+        return (self.local is None and heartbeat is not None
+                and self._clock() - heartbeat <= self.stale_after)
+
+    @property
+    def timings(self):
+        """Collector timings of the local sampler after falling back, else None"""
+        return self.local.timings if self.local is not None else self._timings
+
+    @timings.setter
+    def timings(self, timings):
+        self._timings = timings
+        if self.local is not None:
+            self.local.timings = timings
+
+    def add_listener(self, func):
+        """Call `func(name, value)` on the polling thread for each new sample"""
+        self._listeners.append(func)
+
+    def start(self):
+        """Start polling the segment"""
+        self._stop.clear()
+        self.started_at = self._clock()
+        self._thread = threading.Thread(target=self._run, name="rtsm-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling, and the local sampler if there is one"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.local is not None:
+            self.local.stop()
+        self._close_segment()
+
+    def set_scale(self, scale):
+        """The publisher keeps its own pace; only a local sampler is rescaled"""
+        if self.local is not None:
+            self.local.set_scale(scale)
+
+    def set_paused(self, names):
+        """The publisher collects every panel; only a local sampler pauses collectors"""
+        if self.local is not None:
+            self.local.set_paused(names)
+
+    def states(self):
+        """Return the late collectors of the local sampler; the publisher's are its own"""
+        local = self.local
+        return local.states() if local is not None else NO_STATES
+
+    def snapshot(self):
+        """Return the latest snapshot without blocking"""
+        local = self.local
+        return local.snapshot() if local is not None else self._snapshot
+
+    def _read(self):
+        """
+        Read the state fields, and the payload if its generation moved
+
+        Returns:
+            tuple: (heartbeat, pid, generation, decoded payload or None),
+                or None while the publisher kept writing through every retry
+        """
+        buf = self._buf
+        for _ in range(READ_RETRIES):
+            _, _, sequence, heartbeat, pid, length, generation = HEADER.unpack_from(buf)
+            if sequence & 1:
+                continue
+            payload = None
+            failed = False
+            if generation != self._generation:
+                try:
+                    payload = json.loads(bytes(buf[PAYLOAD_OFFSET:PAYLOAD_OFFSET + length]))
+                    values, counts = payload
+                    if not isinstance(values, dict) or not isinstance(counts, dict):
+                        raise ValueError("not a snapshot")
+                except (ValueError, TypeError):
+                    # Torn by a concurrent write, unless the sequence held
+                    failed = True
+            if SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)[0] != sequence:
+                continue
+            if failed:
+                self.errors += 1
+                return None
+            return heartbeat, pid, generation, payload
+        return None
+
+    def poll(self):
+        """
+        Pick up the publisher's latest snapshot
+
+        Returns:
+            bool: False once the publisher's heartbeat is stale
+        """
+        state = self._read()
+        if state is None:
+            return self.attached
+        heartbeat, pid, generation, payload = state
+        self._heartbeat = heartbeat
+        self.publisher_pid = pid
+        if payload is not None:
+            self._generation = generation
+            self._update(*payload)
+        return self._clock() - heartbeat <= self.stale_after
+
+    def _update(self, values, counts):
+        """Swap in the decoded snapshot and notify the listeners"""
+        previous = self._snapshot
+        data = {}
+        changed = len(values) != len(previous)
+        for name, value in values.items():
+            old = previous.get(name, _MISSING)
+            if old is not _MISSING and old == value:
+                value = old
+            else:
+                changed = True
+            data[name] = value
+        if changed:
+            self._snapshot = MappingProxyType(data)
+        sampled = [name for name, count in counts.items()
+                   if name in data and self._counts.get(name) != count]
+        self._counts = counts
+        for name in sampled:
+            self.listener_errors += notify_listeners(self._listeners, name, data[name])
+
+    def _fall_back(self):
+        """Collect locally from now on"""
+        local = self.fallback()
+        local.timings = self._timings
+        for listener in self._listeners:
+            local.add_listener(listener)
+        local.start()
+        self.local = local
+        self._close_segment()
+
+    def _run(self):
+        """Polling thread body"""
+        while not self._stop.wait(self.poll_interval):
+            if self.poll():
+                continue
+            try:
+                # A restarted publisher creates a new segment
+                self.open()
+                continue
+            except RuntimeError:
+                pass
+            if self.fallback is not None:
+                self._fall_back()
+                return
+            self._stop.wait(HEARTBEAT)
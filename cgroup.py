@@ -0,0 +1,349 @@
+"""
+Real-Time System Monitor (RTSM) - Cgroup Module
+
+This file contains the container-aware collector backend, which reads
+CPU and memory usage of the monitor's own cgroup (v1 or v2) so that
+inside a container or Kubernetes pod the dashboard reports usage against
+the pod's limits instead of the host's totals.
+"""
+
+import os
+import threading
+import time
+from procfs import ProcFile
+
+# Pressure (PSI) files reported under Container, by resource
+PRESSURE_FILES = {"cpu": "cpu.pressure", "memory": "memory.pressure", "io": "io.pressure"}
+
+
+def cgroup_paths(proc_cgroup="/proc/self/cgroup"):
+    """
+    Parse /proc/self/cgroup
+
+    Returns:
+        dict: Cgroup path by controller name; "" is the v2 hierarchy
+    """
+    paths = {}
+    with open(proc_cgroup) as f:
+        for line in f:
+            parts = line.rstrip("\n").split(":", 2)
+            if len(parts) != 3:
+                continue
+            for controller in parts[1].split(","):
+                paths[controller] = parts[2]
+    return paths
+
+
+def _cgroup_dir(mount, path):
+    """Return the directory of cgroup `path` under `mount`"""
+    directory = os.path.join(mount, path.lstrip("/"))
+    # With a cgroup namespace, or when only its own cgroup is mounted, a
+    # container sees its cgroup at the mount point itself
+    return directory if os.path.isdir(directory) else mount
+
+
+def _value(file):
+    """Re-read a single-value file; return its integer, or None for "max" or -1"""
+    length = file.read()
+    text = file.buffer[:length].split()[0]
+    if text == b"max":
+        return None
+    value = int(text)
+    return value if value >= 0 else None
+
+
+def _field(file, length, name):
+    """Return the integer following `name` at the start of a line of a keyed file"""
+    buffer = file.buffer
+    if length > len(name) and buffer.startswith(name + b" "):
+        start = 0
+    else:
+        start = buffer.find(b"\n" + name + b" ", 0, length)
+        if start < 0:
+            raise KeyError(name.decode())
+        start += 1
+    end = buffer.find(b"\n", start, length)
+    if end < 0:
+        end = length
+    return int(buffer[start + len(name):end])
+
+
+def _pressure(file):
+    """Return the "some" 10 second average of a PSI file"""
+    length = file.read()
+    buffer = file.buffer
+    # "some avg10=1.23 avg60=0.45 avg300=0.10 total=123456"
+    start = buffer.find(b"avg10=", 0, length) + len(b"avg10=")
+    return float(buffer[start:buffer.find(b" ", start, length)])
+
+
+class CgroupReader:
+    """
+    Read usage from the current cgroup with open file descriptors
+
+    CPU usage is a percentage of what the cgroup may use: its quota when
+    one is set, otherwise the CPUs it may run on. Memory usage is the
+    working set (usage minus inactive page cache, which is what
+    Kubernetes evicts on) against the memory limit, or against the host's
+    memory when there is none. Limits are re-read on every sample, so a
+    resized pod is picked up.
+
+    The CPU, memory and container collectors share some files and their
+    buffers, so the public methods hold a lock. Subclasses provide the
+    version-specific reads.
+    """
+
+    version = None
+
+    def __init__(self, directories, cpu_count=None, host_memory=None, clock=time.monotonic):
+        """
+        Args:
+            directories: Cgroup directory by controller ("cpu", "cpuacct",
+                "memory"); a v2 cgroup uses the same one for all
+            cpu_count: CPUs the cgroup may run on without a quota, from
+                the scheduler affinity by default
+            host_memory: Memory in bytes used when there is no limit,
+                the physical memory by default
+            clock: Monotonic clock used to turn CPU time into usage
+        """
+        if cpu_count is None:
+            cpu_count = (len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity")
+                         else os.cpu_count() or 1)
+        if host_memory is None:
+            host_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        self.directories = directories
+        self.cpu_count = cpu_count
+        self.host_memory = host_memory
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._files = []
+        self._open_files()
+        self._last_cpu = (clock(), self._cpu_time())
+        self._last_throttling = self._throttling()
+        # Fail now rather than on the first sample if a file is unreadable
+        self.memory_usage()
+
+    def _open(self, controller, name):
+        """Open a file of the cgroup and keep it for close()"""
+        file = ProcFile(os.path.join(self.directories[controller], name))
+        self._files.append(file)
+        return file
+
+    def _open_files(self):
+        """Open the files the reader samples"""
+        raise NotImplementedError
+
+    def _cpu_time(self):
+        """Return the CPU seconds the cgroup has used"""
+        raise NotImplementedError
+
+    def cpu_limit(self):
+        """Return the CPU quota in CPUs, or None without one"""
+        raise NotImplementedError
+
+    def _throttling(self):
+        """Return (periods, throttled periods, throttled seconds) counters"""
+        raise NotImplementedError
+
+    def _memory(self):
+        """Return (usage, limit or None, inactive file cache) in bytes"""
+        raise NotImplementedError
+
+    def pressure(self):
+        """Return the PSI "some" 10 second averages by resource, or None"""
+        return None
+
+    @property
+    def limited(self):
+        """True if the cgroup has a CPU or memory limit"""
+        with self._lock:
+            return self.cpu_limit() is not None or self._memory()[1] is not None
+
+    def cpu_percent(self):
+        """Return CPU usage against the quota since the previous call"""
+        with self._lock:
+            now = self._clock()
+            used = self._cpu_time()
+            cpus = self.cpu_limit() or self.cpu_count
+        last_at, last_used = self._last_cpu
+        self._last_cpu = (now, used)
+        elapsed = now - last_at
+        if elapsed <= 0:
+            return 0.0
+        percent = (used - last_used) / (elapsed * cpus) * 100
+        return round(min(max(percent, 0.0), 100.0), 1)
+
+    def memory_usage(self):
+        """Return the working set against the limit as total, used and percent"""
+        with self._lock:
+            usage, limit, inactive = self._memory()
+        total = min(limit, self.host_memory) if limit is not None else self.host_memory
+        used = max(usage - inactive, 0)
+        return {
+            "total": total,
+            "used": used,
+            "percent": round(used / total * 100, 1) if total else 0.0
+        }
+
+    def container_usage(self):
+        """
+        Return limits, throttling and pressure since the previous call
+
+        Returns:
+            dict: "cpu_limit" (CPUs or None), "memory_limit" (bytes or
+                None), "throttled_percent" (share of scheduler periods
+                throttled), "throttled_seconds" (total so far) and
+                "pressure" (see pressure())
+        """
+        with self._lock:
+            periods, throttled, throttled_seconds = self._throttling()
+            usage = {
+                "cpu_limit": self.cpu_limit(),
+                "memory_limit": self._memory()[1],
+                "throttled_seconds": throttled_seconds,
+                "pressure": self.pressure(),
+            }
+        last_periods, last_throttled, _ = self._last_throttling
+        self._last_throttling = (periods, throttled, throttled_seconds)
+        elapsed = periods - last_periods
+        usage["throttled_percent"] = (round((throttled - last_throttled) / elapsed * 100, 1)
+                                      if elapsed > 0 else 0.0)
+        return usage
+
+    def close(self):
+        """Close the cgroup file descriptors"""
+        with self._lock:
+            for file in self._files:
+                file.close()
+            self._files = []
+
+
+class CgroupV2Reader(CgroupReader):
+    """Read a cgroup of the v2 unified hierarchy"""
+
+    version = 2
+
+    def _open_files(self):
+        self._cpu_stat = self._open("cpu", "cpu.stat")
+        self._memory_current = self._open("memory", "memory.current")
+        self._memory_stat = self._open("memory", "memory.stat")
+        # The cpu and memory limit files are missing in the root cgroup
+        self._cpu_max = self._open_optional("cpu", "cpu.max")
+        self._memory_max = self._open_optional("memory", "memory.max")
+        self._pressure = {}
+        for resource, name in PRESSURE_FILES.items():
+            file = self._open_optional("memory" if resource == "memory" else "cpu", name)
+            if file is not None:
+                try:
+                    _pressure(file)
+                except (OSError, ValueError):
+                    # PSI switched off in the kernel
+                    continue
+                self._pressure[resource] = file
+
+    def _open_optional(self, controller, name):
+        """Open a file that may be missing; return None if it cannot be opened"""
+        try:
+            return self._open(controller, name)
+        except OSError:
+            return None
+
+    def _cpu_time(self):
+        length = self._cpu_stat.read()
+        return _field(self._cpu_stat, length, b"usage_usec") / 1e6
+
+    def cpu_limit(self):
+        if self._cpu_max is None:
+            return None
+        length = self._cpu_max.read()
+        # "max 100000" or "50000 100000"
+        quota, period = self._cpu_max.buffer[:length].split()[:2]
+        if quota == b"max":
+            return None
+        return int(quota) / int(period)
+
+    def _throttling(self):
+        stat = self._cpu_stat
+        length = stat.read()
+        try:
+            return (_field(stat, length, b"nr_periods"), _field(stat, length, b"nr_throttled"),
+                    _field(stat, length, b"throttled_usec") / 1e6)
+        except KeyError:
+            # Without the cpu controller enabled there is no bandwidth control
+            return 0, 0, 0.0
+
+    def _memory(self):
+        length = self._memory_stat.read()
+        limit = _value(self._memory_max) if self._memory_max is not None else None
+        return (_value(self._memory_current), limit,
+                _field(self._memory_stat, length, b"inactive_file"))
+
+    def pressure(self):
+        if not self._pressure:
+            return None
+        return {resource: _pressure(file) for resource, file in self._pressure.items()}
+
+
+class CgroupV1Reader(CgroupReader):
+    """Read the cpu, cpuacct and memory controllers of the v1 hierarchies"""
+
+    version = 1
+
+    # memory.limit_in_bytes without a limit, rounded down to a page
+    UNLIMITED = 0x7FFFFFFFFFFFF000
+
+    def _open_files(self):
+        self._cpuacct_usage = self._open("cpuacct", "cpuacct.usage")
+        self._cfs_quota = self._open("cpu", "cpu.cfs_quota_us")
+        self._cfs_period = self._open("cpu", "cpu.cfs_period_us")
+        self._cpu_stat = self._open("cpu", "cpu.stat")
+        self._memory_usage = self._open("memory", "memory.usage_in_bytes")
+        self._memory_limit = self._open("memory", "memory.limit_in_bytes")
+        self._memory_stat = self._open("memory", "memory.stat")
+
+    def _cpu_time(self):
+        return _value(self._cpuacct_usage) / 1e9
+
+    def cpu_limit(self):
+        quota = _value(self._cfs_quota)
+        if quota is None:
+            return None
+        return quota / _value(self._cfs_period)
+
+    def _throttling(self):
+        stat = self._cpu_stat
+        length = stat.read()
+        return (_field(stat, length, b"nr_periods"), _field(stat, length, b"nr_throttled"),
+                _field(stat, length, b"throttled_time") / 1e9)
+
+    def _memory(self):
+        length = self._memory_stat.read()
+        limit = _value(self._memory_limit)
+        if limit is not None and limit >= self.UNLIMITED:
+            limit = None
+        return (_value(self._memory_usage), limit,
+                _field(self._memory_stat, length, b"total_inactive_file"))
+
+
+def open_cgroup_reader(root="/sys/fs/cgroup", proc_cgroup="/proc/self/cgroup", **kwargs):
+    """
+    Return a reader for the current cgroup, or None where cgroups cannot be read
+
+    Args:
+        root: Mount point of the cgroup filesystem
+        proc_cgroup: File listing the process's cgroups
+        kwargs: Passed on to the reader
+    """
+    try:
+        paths = cgroup_paths(proc_cgroup)
+        if os.path.isfile(os.path.join(root, "cgroup.controllers")):
+            directory = _cgroup_dir(root, paths.get("", "/"))
+            return CgroupV2Reader({"cpu": directory, "memory": directory}, **kwargs)
+        directories = {
+            controller: _cgroup_dir(os.path.join(root, controller), paths.get(controller, "/"))
+            for controller in ("cpu", "cpuacct", "memory")
+        }
+        return CgroupV1Reader(directories, **kwargs)
+    except (OSError, AttributeError, ValueError, IndexError, KeyError, ZeroDivisionError):
+        # No cgroup filesystem, no os.preadv or an unexpected file format
+        return None
@@ -0,0 +1,398 @@
+"""
+Real-Time System Monitor (RTSM) - Cluster Module
+
+This file contains the agent that pushes delta-encoded snapshots to an
+aggregator, and the asyncio aggregator that collects them from many
+hosts for the dashboard's host table.
+
+The protocol is newline-delimited JSON. An agent first sends
+`{"host": NAME, "static": {...}}`, then one line per sample holding the
+timestamp ("t"), the metrics that changed since the previous line ("d")
+and the keys that disappeared ("r"). Metric keys are the flat keys used
+by the JSON Lines exporter.
+"""
+
+import json
+import math
+import os
+import socket
+import threading
+import time
+from types import MappingProxyType
+from operator import itemgetter
+from scheduler import Scheduler
+
+# Longest line an aggregator accepts from an agent
+MAX_LINE = 64 * 1024
+# Longest host name kept
+MAX_HOST_NAME = 64
+
+# Metrics the host table reads, which agents must send as numbers, along
+# with every gpu{index}_usage_percent
+HOST_METRICS = ("cpu_usage_percent", "memory_usage_percent", "memory_used_bytes",
+                "memory_total_bytes")
+
+# Host table orderings, by position in the rows Aggregator.hosts returns
+HOST_SORT_KEYS = {
+    "cpu": itemgetter(1),
+    "memory": itemgetter(2),
+    "host": itemgetter(0),
+}
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    """
+    Parse "HOST:PORT", "PORT" or "unix:PATH"
+
+    Returns:
+        tuple: ("unix", path) or ("tcp", (host, port))
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or default_host, int(port))
+
+
+def host_metrics(values):
+    """
+    Return an agent's changed metrics with those the host table reads as floats
+
+    Raises:
+        ValueError: If one of them is not a finite number
+        TypeError: If one of them is not a number or numeric string
+    """
+    metrics = dict(values)
+    for key, value in metrics.items():
+        if key in HOST_METRICS or (key.startswith("gpu") and key.endswith("_usage_percent")):
+            value = metrics[key] = float(value)
+            if not math.isfinite(value):
+                raise ValueError(f"{key} is {value}")
+    return metrics
+
+
+class DeltaEncoder:
+    """Encode samples as the metrics that changed since the previous one"""
+
+    def __init__(self):
+        """Start with no previous sample, so the first line is complete"""
+        self._last = {}
+
+    def reset(self):
+        """Forget the previous sample; call on every new connection"""
+        self._last = {}
+
+    def encode(self, timestamp, metrics):
+        """Return one protocol line for flattened `metrics`"""
+        values = {key: value for key, name, labels, value in metrics}
+        last = self._last
+        message = {"t": round(timestamp, 3)}
+        changed = {key: value for key, value in values.items()
+                   if key not in last or last[key] != value}
+        if changed:
+            message["d"] = changed
+        removed = [key for key in last if key not in values]
+        if removed:
+            message["r"] = removed
+        self._last = values
+        return json.dumps(message, separators=(",", ":")) + "\n"
+
+
+class Agent:
+    """Push snapshots to an aggregator, reconnecting when the link drops"""
+
+    def __init__(self, address, name, collect, interval=1.0, max_backoff=30.0):
+        """
+        Args:
+            address: Aggregator address, see parse_address
+            name: Host name reported to the aggregator
+            collect: Function returning an exporter Snapshot
+            interval: Seconds between samples
+            max_backoff: Longest wait between reconnection attempts
+        """
+        self.address = address
+        self.name = name[:MAX_HOST_NAME]
+        self.collect = collect
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.sent_bytes = 0
+        self.sent = 0
+        self._encoder = DeltaEncoder()
+        self._socket = None
+        self._stop = threading.Event()
+
+    def _connect(self, static):
+        """Connect and send the hello line"""
+        kind, target = parse_address(self.address)
+        family = socket.AF_UNIX if kind == "unix" else socket.AF_INET
+        if kind == "tcp" and ":" in target[0]:
+            family = socket.AF_INET6
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(target)
+            hello = json.dumps({"host": self.name, "static": static}) + "\n"
+            sock.sendall(hello.encode("utf-8"))
+        except OSError:
+            sock.close()
+            raise
+        self._socket = sock
+        self._encoder.reset()
+
+    def _disconnect(self):
+        """Close the connection, if any"""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def send(self, snapshot):
+        """Send one snapshot, connecting first if needed; raises OSError"""
+        if self._socket is None:
+            self._connect(snapshot.static)
+        line = self._encoder.encode(snapshot.timestamp, snapshot.metrics).encode("utf-8")
+        try:
+            self._socket.sendall(line)
+        except OSError:
+            self._disconnect()
+            raise
+        self.sent_bytes += len(line)
+        self.sent += 1
+
+    def run(self, count=None):
+        """Sample and send every `interval` seconds until stopped"""
+        scheduler = Scheduler()
+        scheduler.add("sample", self.interval, time.monotonic())
+        failures = 0
+        samples = 0
+        try:
+            while not self._stop.is_set() and (count is None or samples < count):
+                self._stop.wait(scheduler.timeout())
+                if not scheduler.due():
+                    continue
+                snapshot = self.collect()
+                samples += 1
+                try:
+                    self.send(snapshot)
+                    failures = 0
+                except OSError:
+                    # Wait before reconnecting; samples taken meanwhile are dropped
+                    failures += 1
+                    self._stop.wait(min(self.interval * 2 ** failures, self.max_backoff))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._disconnect()
+
+    def stop(self):
+        """Stop `run` from another thread"""
+        self._stop.set()
+
+
+class HostState:
+    """What the aggregator knows about one host"""
+
+    __slots__ = ("name", "static", "metrics", "last_seen", "connected", "samples")
+
+    def __init__(self, name, static, now):
+        self.name = name
+        self.static = static
+        self.metrics = {}
+        self.last_seen = now
+        self.connected = True
+        self.samples = 0
+
+
+class Aggregator:
+    """
+    Accept agents over asyncio and keep the latest metrics of each host
+
+    Memory is bounded: at most `max_hosts` hosts with `max_metrics`
+    metrics each are kept, lines longer than MAX_LINE drop the agent,
+    and a new host replaces the one disconnected the longest when full.
+    A sample whose host table metrics are not numbers is skipped and
+    counted in `malformed`.
+
+    Aggregators stand in for the Sampler as the dashboard's source, and
+    snapshot() returns the host table under "hosts".
+    """
+
+    kind = "aggregate"
+
+    def __init__(self, address, max_hosts=1024, max_metrics=256, stale_after=10.0,
+                 clock=time.monotonic):
+        """
+        Args:
+            address: Address to listen on, see parse_address
+            max_hosts: Most hosts kept
+            max_metrics: Most metrics kept per host
+            stale_after: Seconds without a sample before a host is stale
+            clock: Monotonic clock used for ages
+        """
+        self.address = address
+        self.max_hosts = max_hosts
+        self.max_metrics = max_metrics
+        self.stale_after = stale_after
+        self.started_at = None
+        self.received_bytes = 0
+        self.rejected = 0
+        self.malformed = 0
+        self._clock = clock
+        self._hosts = {}
+        self._writers = set()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def add_listener(self, func):
+        """Hosts have no history; accepted for Sampler compatibility"""
+
+    def start(self):
+        """Listen on a background thread; raises OSError if binding fails"""
+        if self._thread is not None:
+            return
+        self.started_at = self._clock()
+        self._thread = threading.Thread(target=self._run, name="rtsm-aggregator", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        """Stop listening and drop all connections"""
+        loop = self._loop
+        if loop is not None and self._thread is not None:
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self):
+        """Aggregator thread body"""
+        # Imported here so the dashboard pays for asyncio only when aggregating
+        import asyncio
+
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            kind, target = parse_address(self.address)
+            if kind == "unix":
+                if os.path.exists(target):
+                    os.unlink(target)
+                server = asyncio.start_unix_server(self._handle, target, limit=MAX_LINE)
+            else:
+                server = asyncio.start_server(self._handle, *target, limit=MAX_LINE)
+            self._server = loop.run_until_complete(server)
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            # Closing the transports ends each handler at EOF
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop)))
+            loop.close()
+
+    @property
+    def server_address(self):
+        """Return the address the aggregator is bound to"""
+        return self._server.sockets[0].getsockname()
+
+    def _admit(self, name, static):
+        """Return the state for a connecting host, or None when full"""
+        now = self._clock()
+        with self._lock:
+            host = self._hosts.get(name)
+            if host is None and len(self._hosts) >= self.max_hosts:
+                # Replace the host that has been gone the longest
+                gone = [h for h in self._hosts.values() if not h.connected]
+                if not gone:
+                    return None
+                oldest = min(gone, key=lambda h: h.last_seen)
+                del self._hosts[oldest.name]
+            host = HostState(name, static, now)
+            self._hosts[name] = host
+            return host
+
+    async def _handle(self, reader, writer):
+        """Read one agent's stream until it disconnects"""
+        host = None
+        self._writers.add(writer)
+        try:
+            hello = json.loads(await reader.readline())
+            name = str(hello["host"])[:MAX_HOST_NAME]
+            static = hello.get("static") or {}
+            host = self._admit(name, static if isinstance(static, dict) else {})
+            if host is None:
+                self.rejected += 1
+                return
+            max_metrics = self.max_metrics
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.received_bytes += len(line)
+                message = json.loads(line)
+                try:
+                    update = host_metrics(message.get("d") or {})
+                except (ValueError, TypeError):
+                    self.malformed += 1
+                    continue
+                metrics = host.metrics
+                for key in message.get("r", ()):
+                    metrics.pop(key, None)
+                for key, value in update.items():
+                    if key in metrics or len(metrics) < max_metrics:
+                        metrics[key] = value
+                host.last_seen = self._clock()
+                host.samples += 1
+        except (ValueError, KeyError, TypeError, AttributeError, ConnectionError):
+            # Malformed input, or a line over MAX_LINE; drop the agent
+            pass
+        finally:
+            if host is not None:
+                host.connected = False
+            self._writers.discard(writer)
+            writer.close()
+
+    def hosts(self):
+        """
+        Return the host table
+
+        Returns:
+            list: (name, cpu percent, memory percent, memory used bytes,
+                memory total bytes, busiest GPU percent or None, age in
+                seconds, state, OS) tuples, where state is "ok", "stale"
+                or "offline"
+        """
+        now = self._clock()
+        with self._lock:
+            hosts = list(self._hosts.values())
+        rows = []
+        for host in hosts:
+            metrics = host.metrics
+            gpus = [value for key, value in list(metrics.items())
+                    if key.startswith("gpu") and key.endswith("_usage_percent")]
+            age = now - host.last_seen
+            if not host.connected:
+                state = "offline"
+            elif age > self.stale_after:
+                state = "stale"
+            else:
+                state = "ok"
+            rows.append((
+                host.name, metrics.get("cpu_usage_percent", 0.0),
+                metrics.get("memory_usage_percent", 0.0), metrics.get("memory_used_bytes", 0),
+                metrics.get("memory_total_bytes", 0), max(gpus) if gpus else None, age, state,
+                str(host.static.get("OS", ""))
+            ))
+        return rows
+
+    def snapshot(self):
+        """Return the host table in the layout the dashboard reads"""
+        return MappingProxyType({"hosts": self.hosts()})
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Real-Time System Monitor (RTSM) - Counters Module
+
+This file contains the per-core CPU, per-disk and per-interface rate
+collectors, which turn cumulative counters into rates from deltas
+between cached samples.
+"""
+
+import time
+from itertools import chain, repeat
+from operator import itemgetter, mul, sub
+import psutil
+
+# Device name prefixes left out of the panels by default
+DEFAULT_DISK_EXCLUDE = ("loop", "ram", "zram")
+DEFAULT_NETWORK_EXCLUDE = ("lo",)
+
+
+class CounterRates:
+    """
+    Per-second rates of cumulative counters, for many devices at once
+
+    Each sample is flattened into one list holding every chosen field of
+    every device, and rates are computed for the whole list with
+    map(operator.sub) and map(operator.mul) instead of a Python loop per
+    device. A counter going backwards (wrap or reset) gives a rate of 0.
+    """
+
+    def __init__(self, fields, clock=time.monotonic):
+        """
+        Args:
+            fields: Indexes of the counter fields to turn into rates
+            clock: Monotonic clock used for rates
+        """
+        self._getter = itemgetter(*fields) if len(fields) > 1 else (
+            lambda counters: (counters[fields[0]],)
+        )
+        self._width = len(fields)
+        self._clock = clock
+        self._names = None
+        self._values = None
+        self._sampled_at = None
+
+    def update(self, counters):
+        """
+        Add a sample and return the rates since the previous one
+
+        Args:
+            counters: Mapping of device name to a tuple of counters
+
+        Returns:
+            list: (name, rates) pairs, where rates has one value per field;
+                all zero on the first sample or when the devices changed
+        """
+        now = self._clock()
+        names = tuple(counters)
+        values = list(chain.from_iterable(map(self._getter, counters.values())))
+
+        if names == self._names and now > self._sampled_at:
+            deltas = list(map(sub, values, self._values))
+            if deltas and min(deltas) < 0:
+                deltas = [delta if delta > 0 else 0 for delta in deltas]
+            rates = list(map(mul, deltas, repeat(1 / (now - self._sampled_at))))
+        else:
+            rates = [0.0] * len(values)
+        self._names = names
+        self._values = values
+        self._sampled_at = now
+
+        # Regroup the flat list into one tuple per device
+        return list(zip(names, zip(*[iter(rates)] * self._width)))
+
+
+def _exclude(counters, prefixes):
+    """Return the counters of devices not matching any of `prefixes`"""
+    prefixes = tuple(prefixes)
+    return {
+        name: value for name, value in counters.items()
+        if not name.startswith(prefixes)
+    }
+
+
+class CoreUsage:
+    """Per-core CPU utilisation from cpu_times deltas"""
+
+    def __init__(self):
+        """Take the baseline sample"""
+        self._busy = None
+        self._total = None
+        self.sample()
+
+    @staticmethod
+    def _times(cores):
+        """Return (busy, total) lists of CPU time per core"""
+        # Guest time is already counted in user and nice on Linux, and
+        # iowait is idle time
+        totals = [
+            sum(times) - getattr(times, "guest", 0) - getattr(times, "guest_nice", 0)
+            for times in cores
+        ]
+        idle = [times.idle + getattr(times, "iowait", 0) for times in cores]
+        return list(map(sub, totals, idle)), totals
+
+    def sample(self):
+        """Return the utilisation percent of each core since the previous call"""
+        busy, total = self._times(psutil.cpu_times(percpu=True))
+        last_busy, last_total = self._busy, self._total
+        self._busy, self._total = busy, total
+        if last_total is None or len(last_total) != len(total):
+            return [0.0] * len(total)
+        return [
+            min(max(busy_delta / total_delta * 100, 0.0), 100.0) if total_delta > 0 else 0.0
+            for busy_delta, total_delta in zip(map(sub, busy, last_busy), map(sub, total, last_total))
+        ]
+
+
+class DiskRates:
+    """Per-disk read and write throughput and IOPS"""
+
+    def __init__(self, exclude=DEFAULT_DISK_EXCLUDE, clock=time.monotonic):
+        """
+        Args:
+            exclude: Disk name prefixes to leave out
+            clock: Monotonic clock used for rates
+        """
+        self.exclude = exclude
+        # read_count, write_count, read_bytes, write_bytes
+        self._rates = CounterRates((0, 1, 2, 3), clock)
+        self.sample()
+
+    def sample(self):
+        """
+        Return the rates of each disk since the previous call
+
+        Returns:
+            list: (name, read bytes/s, write bytes/s, IOPS) tuples
+        """
+        counters = psutil.disk_io_counters(perdisk=True) or {}
+        return [
+            (name, read_rate, write_rate, reads + writes)
+            for name, (reads, writes, read_rate, write_rate)
+            in self._rates.update(_exclude(counters, self.exclude))
+        ]
+
+
+class NetworkRates:
+    """Per-interface receive and transmit throughput"""
+
+    def __init__(self, exclude=DEFAULT_NETWORK_EXCLUDE, clock=time.monotonic):
+        """
+        Args:
+            exclude: Interface name prefixes to leave out
+            clock: Monotonic clock used for rates
+        """
+        self.exclude = exclude
+        # bytes_sent, bytes_recv
+        self._rates = CounterRates((0, 1), clock)
+        self.sample()
+
+    def sample(self):
+        """
+        Return the rates of each interface since the previous call
+
+        Returns:
+            list: (name, received bytes/s, sent bytes/s) tuples
+        """
+        counters = psutil.net_io_counters(pernic=True) or {}
+        return [
+            (name, recv_rate, sent_rate)
+            for name, (sent_rate, recv_rate)
+            in self._rates.update(_exclude(counters, self.exclude))
+        ]
\ No newline at end of file
@@ -0,0 +1,481 @@
+"""
+Real-Time System Monitor (RTSM) - Exporter Module
+
+This file contains the serializers that turn monitor snapshots into
+JSON Lines, CSV or Prometheus exposition text, and the headless loop
+that streams them without curses.
+"""
+
+import csv
+import json
+import sys
+import time
+from resource_usage import (get_resource_usage, get_cpu_usage, get_memory_usage, get_gpu_usage,
+                            get_container_usage, get_backend)
+from system_info import get_system_info, get_uptime_seconds
+from scheduler import Scheduler
+from sampler import CollectorPool, DEFAULT_TIMEOUT
+
+# System information fields that change while the process runs
+DYNAMIC_INFO_FIELDS = ("Uptime", "Terminal Size")
+
+# Per-process metric families as (key suffix, prometheus name, field of
+# the ProcessTable.top row); a prometheus name of None is export-only
+PROCESS_METRICS = (
+    ("pid", None, 0),
+    ("name", None, 1),
+    ("cpu_percent", "rtsm_process_cpu_percent", 2),
+    ("rss_bytes", "rtsm_process_rss_bytes", 3),
+    ("io_bytes_per_second", "rtsm_process_io_bytes_per_second", 4),
+)
+
+
+def static_info(system_info):
+    """Return the system information fields that never change"""
+    return {
+        key: value for key, value in system_info.items()
+        if key not in DYNAMIC_INFO_FIELDS
+    }
+
+
+def escape_label(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def flatten_metrics(resources, uptime_seconds=None, processes=None, states=None):
+    """
+    Flatten resource usage into a list of metrics
+
+    `states` maps the collectors that missed their deadline to their
+    state; each becomes a `{collector}_{state}` metric of 1.
+
+    Returns:
+        list: (key, prometheus name, prometheus labels, value) tuples,
+            where key is the flat name used by JSON Lines and CSV and a
+            prometheus name of None marks a field Prometheus skips
+    """
+    metrics = []
+    if uptime_seconds is not None:
+        metrics.append(("uptime_seconds", "rtsm_uptime_seconds", "", uptime_seconds))
+    if "CPU Usage" in resources:
+        metrics.append(("cpu_usage_percent", "rtsm_cpu_usage_percent", "",
+                        resources["CPU Usage"]))
+    mem = resources.get("Memory")
+    if mem:
+        metrics.append(("memory_used_bytes", "rtsm_memory_used_bytes", "", mem["used"]))
+        metrics.append(("memory_total_bytes", "rtsm_memory_total_bytes", "", mem["total"]))
+        metrics.append(("memory_usage_percent", "rtsm_memory_usage_percent", "",
+                        mem["percent"]))
+    container = resources.get("Container")
+    if container:
+        if container["cpu_limit"] is not None:
+            metrics.append(("container_cpu_limit_cores", "rtsm_container_cpu_limit_cores", "",
+                            container["cpu_limit"]))
+        if container["memory_limit"] is not None:
+            metrics.append(("container_memory_limit_bytes", "rtsm_container_memory_limit_bytes", "",
+                            container["memory_limit"]))
+        metrics.append(("container_throttled_percent", "rtsm_container_throttled_percent", "",
+                        container["throttled_percent"]))
+        metrics.append(("container_throttled_seconds", "rtsm_container_throttled_seconds", "",
+                        container["throttled_seconds"]))
+        for resource, average in (container["pressure"] or {}).items():
+            metrics.append((f"pressure_{resource}_some_avg10", "rtsm_pressure_some_avg10",
+                            f'resource="{resource}"', average))
+    # Prometheus rejects a family whose samples are split up, so every
+    # family is written for all GPUs and ranks before the next one starts
+    gpus = resources.get("GPUs", ())
+    for gpu in gpus:
+        metrics.append((f"gpu{gpu['index']}_usage_percent", "rtsm_gpu_usage_percent",
+                        f'gpu="{gpu["index"]}"', gpu["usage"]))
+    for field in ("used", "total"):
+        for gpu in gpus:
+            metrics.append((f"gpu{gpu['index']}_memory_{field}_megabytes",
+                            f"rtsm_gpu_memory_{field}_megabytes", f'gpu="{gpu["index"]}"',
+                            gpu["memory"][field]))
+    if "GPU Age" in resources:
+        metrics.append(("gpu_reading_age_seconds", "rtsm_gpu_reading_age_seconds", "",
+                        resources["GPU Age"]))
+    ranked = [
+        (rank, f'rank="{rank}",pid="{process[0]}",name="{escape_label(process[1])}"', process)
+        for rank, process in enumerate(processes or (), 1)
+    ]
+    for suffix, name, field in PROCESS_METRICS:
+        for rank, labels, process in ranked:
+            metrics.append((f"top{rank}_{suffix}", name, labels if name else "",
+                            process[field]))
+    for collector, state in (states or {}).items():
+        metrics.append((f"{collector}_{state}", "rtsm_collector_degraded",
+                        f'collector="{collector}",state="{state}"', 1))
+    return metrics
+
+
+class Snapshot:
+    """One collected sample of resource usage, flattened for export"""
+
+    def __init__(self, timestamp, static, resources, uptime_seconds=None, processes=None,
+                 states=None):
+        """
+        Args:
+            timestamp: UNIX time the sample was taken
+            static: Static system information fields
+            resources: Result of get_resource_usage
+            uptime_seconds: Seconds since boot, if known
+            processes: Top processes as returned by ProcessTable.top
+            states: Collectors that missed their deadline, by name, with
+                their CollectorHealth.state
+        """
+        self.timestamp = timestamp
+        self.static = static
+        self.resources = resources
+        self.uptime_seconds = uptime_seconds
+        self.processes = processes
+        self.states = states
+        self.metrics = flatten_metrics(resources, uptime_seconds, processes, states)
+
+
+def collect_snapshot(gpu_collector=None, process_table=None):
+    """Collect a snapshot directly from the system"""
+    resources = get_resource_usage(gpu_collector is not None, gpu_collector)
+    processes = process_table.refresh() if process_table is not None else None
+    return Snapshot(
+        time.time(), static_info(get_system_info()), resources, get_uptime_seconds(),
+        processes
+    )
+
+
+def sampler_resources(snapshot, partial=False):
+    """
+    Assemble the resource usage dictionary from a sampler snapshot
+
+    Args:
+        snapshot: Mapping of collector name to its latest value
+        partial: Leave out CPU or memory usage that is missing instead of
+            returning None
+
+    Returns:
+        dict: Resources as get_resource_usage reports them, or None before
+            the CPU and memory collectors first published
+    """
+    resources = {}
+    for key, name in (("CPU Usage", "cpu"), ("Memory", "memory")):
+        if name in snapshot:
+            resources[key] = snapshot[name]
+        elif not partial:
+            return None
+    if snapshot.get("container"):
+        resources["Container"] = snapshot["container"]
+    resources.update(snapshot.get("gpu", {}))
+    return resources
+
+
+def sampler_snapshot(snapshot, process_count=0, process_sort="cpu"):
+    """
+    Build a Snapshot from a sampler snapshot, such as the snapshot bus's
+
+    Args:
+        snapshot: Mapping of collector name to its latest value
+        process_count: Number of top processes to include
+        process_sort: Order of the top processes where the snapshot holds
+            them in every order
+
+    Raises:
+        RuntimeError: If no CPU and memory samples were collected yet
+    """
+    resources = sampler_resources(snapshot)
+    if resources is None:
+        raise RuntimeError("no samples collected yet")
+    processes = snapshot.get("processes") if process_count else None
+    if isinstance(processes, dict):
+        processes = processes.get(process_sort)
+    return Snapshot(
+        time.time(), static_info(snapshot.get("system_info", {})), resources,
+        get_uptime_seconds(), processes[:process_count] if processes else None
+    )
+
+
+class SnapshotCollector:
+    """
+    Collect snapshots with every source running concurrently under a deadline
+
+    A hung source, such as a stuck GPU driver or disk, no longer stalls
+    the stream: each snapshot holds what finished within the deadline,
+    earlier values of the sources that did not, and a degraded metric
+    for each of those.
+    """
+
+    def __init__(self, gpu_collector=None, process_table=None, interval=1.0, timeout=None,
+                 workers=4):
+        """
+        Args:
+            gpu_collector: Background GPU collector, or None to skip GPUs
+            process_table: ProcessTable reporting the top processes, or None
+            interval: Seconds between snapshots
+            timeout: Seconds each source may take, half the interval (at
+                most DEFAULT_TIMEOUT) by default
+            workers: Threads running the sources
+        """
+        if timeout is None:
+            timeout = min(interval / 2, DEFAULT_TIMEOUT)
+        pool = self.pool = CollectorPool(workers)
+        pool.add_collector("system_info", get_system_info, interval, timeout)
+        pool.add_collector("cpu", get_cpu_usage, interval, timeout)
+        pool.add_collector("memory", get_memory_usage, interval, timeout)
+        if get_backend() == "cgroup":
+            pool.add_collector("container", get_container_usage, interval, timeout)
+        if gpu_collector is not None:
+            pool.add_collector("gpu", lambda: get_gpu_usage(gpu_collector), interval, timeout)
+        if process_table is not None:
+            pool.add_collector("processes", process_table.refresh, interval, timeout)
+
+    def collect(self):
+        """Return a Snapshot of what the sources returned by their deadline"""
+        values, states = self.pool.collect()
+        return Snapshot(
+            time.time(), static_info(values.get("system_info") or {}),
+            sampler_resources(values, partial=True), get_uptime_seconds(),
+            values.get("processes"), states
+        )
+
+    def close(self):
+        """Stop the worker threads"""
+        self.pool.close()
+
+
+class Exporter:
+    """Base class for streaming exporters with batched flushes"""
+
+    # Written after each sample in a stream
+    separator = ""
+
+    def __init__(self, stream, flush_every=10):
+        """
+        Args:
+            stream: Text stream to write to
+            flush_every: Number of samples written between flushes
+        """
+        self.stream = stream
+        self.flush_every = flush_every
+        self._pending = 0
+
+    def write_static(self, static):
+        """Write the fields that do not change; called once per stream"""
+
+    def format_sample(self, timestamp, metrics):
+        """Return the text for one sample"""
+        raise NotImplementedError
+
+    def write_sample(self, timestamp, metrics):
+        """Write one sample, flushing every `flush_every` samples"""
+        self.stream.write(self.format_sample(timestamp, metrics) + self.separator)
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Flush buffered samples to the stream"""
+        self.stream.flush()
+        self._pending = 0
+
+
+class JSONLinesExporter(Exporter):
+    """One JSON object per line; the first line holds the static fields"""
+
+    def write_static(self, static):
+        """Write the static fields as the first line"""
+        self.stream.write(json.dumps({"static": static}, separators=(",", ":")) + "\n")
+
+    def format_sample(self, timestamp, metrics):
+        """Return one sample as a JSON line"""
+        sample = {"ts": round(timestamp, 3)}
+        for key, name, labels, value in metrics:
+            sample[key] = value
+        return json.dumps(sample, separators=(",", ":")) + "\n"
+
+
+class _LineBuffer:
+    """File-like object collecting what csv.writer writes"""
+
+    def __init__(self):
+        self.text = ""
+
+    def write(self, text):
+        self.text += text
+
+
+class CSVExporter(Exporter):
+    """CSV rows; static fields are written once as leading comment lines"""
+
+    def __init__(self, stream, flush_every=10):
+        """Initialize the exporter"""
+        super().__init__(stream, flush_every)
+        self._columns = None
+
+    def write_static(self, static):
+        """Write the static fields as `# key: value` comment lines"""
+        for key, value in static.items():
+            self.stream.write(f"# {key}: {value}\n")
+
+    def format_sample(self, timestamp, metrics):
+        """Return one CSV row, preceded by a header when the columns change"""
+        buffer = _LineBuffer()
+        writer = csv.writer(buffer, lineterminator="\n")
+        columns = tuple(key for key, name, labels, value in metrics)
+        if columns != self._columns:
+            self._columns = columns
+            writer.writerow(("ts",) + columns)
+        writer.writerow([f"{timestamp:.3f}"] + [value for key, name, labels, value in metrics])
+        return buffer.text
+
+
+class PrometheusExporter(Exporter):
+    """Prometheus text exposition format, one block per sample"""
+
+    separator = "\n"
+
+    HELP = {
+        "rtsm_info": "Static system information",
+        "rtsm_uptime_seconds": "Seconds since boot",
+        "rtsm_cpu_usage_percent": "CPU usage since the previous sample",
+        "rtsm_memory_used_bytes": "Used virtual memory",
+        "rtsm_memory_total_bytes": "Total virtual memory",
+        "rtsm_memory_usage_percent": "Virtual memory usage",
+        "rtsm_gpu_usage_percent": "GPU utilization",
+        "rtsm_gpu_memory_used_megabytes": "Used GPU memory",
+        "rtsm_gpu_memory_total_megabytes": "Total GPU memory",
+        "rtsm_gpu_reading_age_seconds": "Age of the latest GPU reading",
+        "rtsm_process_cpu_percent": "CPU usage of a top process (100 = one core)",
+        "rtsm_process_rss_bytes": "Resident memory of a top process",
+        "rtsm_process_io_bytes_per_second": "Disk I/O rate of a top process",
+        "rtsm_container_cpu_limit_cores": "CPU quota of the monitor's cgroup",
+        "rtsm_container_memory_limit_bytes": "Memory limit of the monitor's cgroup",
+        "rtsm_container_throttled_percent": "Share of CPU scheduler periods throttled by the quota",
+        "rtsm_container_throttled_seconds": "Time throttled by the CPU quota since the cgroup started",
+        "rtsm_pressure_some_avg10": "Share of time some tasks stalled on a resource over 10 s (PSI)",
+        "rtsm_collector_degraded": "Collectors that missed their deadline, by state",
+        "rtsm_self_cpu_percent": "CPU usage of the monitor itself",
+        "rtsm_self_rss_bytes": "Resident memory of the monitor itself",
+        "rtsm_self_dropped_samples": "Samples skipped because the monitor fell behind",
+        "rtsm_self_step_seconds": "Duration of the monitor's latest collect and write steps",
+    }
+
+    def __init__(self, stream, flush_every=10, timestamps=True):
+        """
+        Args:
+            timestamps: Append sample timestamps; turn off when serving
+                scrapes, which stamp samples themselves
+        """
+        super().__init__(stream, flush_every)
+        self.timestamps = timestamps
+        self._info = ""
+        self._headers = {}
+
+    def write_static(self, static):
+        """Pre-render the static fields as an rtsm_info metric"""
+        labels = ",".join(
+            f'{key.lower().replace(" ", "_")}="{escape_label(value)}"'
+            for key, value in static.items()
+        )
+        self._info = self.header("rtsm_info", "gauge") + f"rtsm_info{{{labels}}} 1\n"
+
+    def header(self, name, kind="gauge"):
+        """Return the cached HELP and TYPE lines of a metric"""
+        text = self._headers.get(name)
+        if text is None:
+            text = self._headers[name] = (
+                f"# HELP {name} {self.HELP.get(name, name)}\n# TYPE {name} {kind}\n"
+            )
+        return text
+
+    def format_sample(self, timestamp, metrics):
+        """Return one exposition block"""
+        suffix = f" {int(timestamp * 1000)}\n" if self.timestamps else "\n"
+        lines = [self._info]
+        last_name = None
+        for key, name, labels, value in metrics:
+            if name is None:
+                continue
+            if name != last_name:
+                lines.append(self.header(name))
+                last_name = name
+            if labels:
+                lines.append(f"{name}{{{labels}}} {value}{suffix}")
+            else:
+                lines.append(f"{name} {value}{suffix}")
+        return "".join(lines)
+
+
+EXPORTERS = {
+    "jsonl": JSONLinesExporter,
+    "csv": CSVExporter,
+    "prometheus": PrometheusExporter,
+}
+
+
+def run_headless(fmt="jsonl", output=None, interval=1.0, count=None, flush_every=10,
+                 gpu_collector=None, cache=None, process_table=None, recorder=None,
+                 instrumentation=None, collect=None):
+    """
+    Stream snapshots at a fixed cadence without drawing anything
+
+    Args:
+        fmt: One of EXPORTERS
+        output: File path to append to, or None for stdout
+        interval: Seconds between samples
+        count: Number of samples to write, or None to run until interrupted
+        flush_every: Number of samples written between flushes
+        gpu_collector: Background GPU collector, or None to skip GPUs
+        process_table: ProcessTable reporting the top processes, or None
+        recorder: Recorder also appending every sample, or None
+        instrumentation: Instrumentation timing each sample and adding the
+            monitor's own usage to the output, or None
+        cache: SnapshotCache to sample through, so that other readers such
+            as the HTTP endpoint share the same collections
+        collect: Function returning a Snapshot, used instead of collecting
+            directly, such as one reading the snapshot bus
+    """
+    if cache is not None:
+        collect = cache.get
+    elif collect is None:
+        collect = lambda: collect_snapshot(gpu_collector, process_table)
+
+    # With no format (fmt "none") samples are only recorded
+    exporter = None
+    if fmt in EXPORTERS:
+        stream = open(output, "a", buffering=1 << 16) if output else sys.stdout
+        exporter = EXPORTERS[fmt](stream, flush_every)
+        exporter.write_static(static_info(get_system_info()))
+
+    scheduler = Scheduler()
+    scheduler.add("sample", interval, time.monotonic() + interval)
+    written = 0
+    try:
+        while count is None or written < count:
+            time.sleep(scheduler.timeout())
+            if not scheduler.due():
+                continue
+            if instrumentation is None:
+                snapshot = collect()
+                metrics = snapshot.metrics
+            else:
+                start = time.perf_counter_ns()
+                snapshot = collect()
+                instrumentation.record("collect", time.perf_counter_ns() - start)
+                metrics = snapshot.metrics + instrumentation.metrics(scheduler.skipped)
+            
+            start = time.perf_counter_ns()
+            if exporter is not None:
+                exporter.write_sample(snapshot.timestamp, metrics)
+            # Records are fixed-width and need CPU and memory usage
+            if recorder is not None and "CPU Usage" in snapshot.resources and "Memory" in snapshot.resources:
+                recorder.write(snapshot)
+            if instrumentation is not None:
+                instrumentation.record("write", time.perf_counter_ns() - start)
+            written += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if exporter is not None:
+            exporter.flush()
+            if output:
+                stream.close()
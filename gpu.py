@@ -0,0 +1,326 @@
+"""
+Real-Time System Monitor (RTSM) - GPU Module
+
+This file contains the background GPU collector and the pluggable
+backends it reads from: GPUtil, a long-lived nvidia-smi stream, or a
+fake backend for tests.
+"""
+
+import shutil
+import subprocess
+import threading
+import time
+
+
+def make_gpu_reading(index, name, usage, memory_used, memory_total):
+    """Build the dictionary describing one GPU"""
+    return {
+        "index": index,
+        "name": name,
+        "usage": usage,
+        "memory": {
+            "total": memory_total,
+            "used": memory_used,
+            "percent": (memory_used / memory_total) * 100 if memory_total else 0.0
+        }
+    }
+
+
+class GPUBackend:
+    """Interface for GPU backends"""
+
+    name = "base"
+
+    def read(self):
+        """Return a list of GPU readings, raising an exception on failure"""
+        raise NotImplementedError
+
+    def read_timed(self):
+        """
+        Return the GPU readings and when they were taken
+
+        Returns:
+            tuple: (list of GPU readings, monotonic time of the reading)
+        """
+        return self.read(), time.monotonic()
+
+    def close(self):
+        """Release any resources held by the backend"""
+
+
+class GPUtilBackend(GPUBackend):
+    """Read GPUs through GPUtil (forks nvidia-smi on every read)"""
+
+    name = "gputil"
+
+    def __init__(self):
+        """Import GPUtil, raising ImportError if it is not installed"""
+        import GPUtil
+        self._gputil = GPUtil
+
+    def read(self):
+        """Return a reading for every GPU GPUtil reports"""
+        return [
+            make_gpu_reading(gpu.id, gpu.name, gpu.load * 100,
+                             gpu.memoryUsed, gpu.memoryTotal)
+            for gpu in self._gputil.getGPUs()
+        ]
+
+
+class NvidiaSmiStreamBackend(GPUBackend):
+    """Keep one `nvidia-smi --loop-ms` process running and parse its stream"""
+
+    name = "nvidia-smi"
+    QUERY = "index,name,utilization.gpu,memory.used,memory.total"
+
+    def __init__(self, interval=2.0, command="nvidia-smi", max_age=None):
+        """
+        Start nvidia-smi, raising FileNotFoundError if it is missing
+
+        Args:
+            interval: Seconds between the lines nvidia-smi writes
+            command: nvidia-smi executable
+            max_age: Seconds after which the latest lines are too old to
+                report, three intervals by default
+        """
+        self.max_age = max_age if max_age is not None else 3 * interval
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+        self._readings = {}
+        self._process = None
+        self._command = [
+            command, f"--query-gpu={self.QUERY}", "--format=csv,noheader,nounits",
+            f"--loop-ms={int(interval * 1000)}"
+        ]
+        self._spawn()
+
+    def _spawn(self):
+        """Start nvidia-smi and a thread reading its output"""
+        process = subprocess.Popen(
+            self._command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1
+        )
+        with self._lock:
+            # Lines of the previous process must not pass for new ones
+            self._process = process
+            self._readings = {}
+        thread = threading.Thread(
+            target=self._read_stream, args=(process,),
+            name="rtsm-nvidia-smi", daemon=True
+        )
+        thread.start()
+
+    def _read_stream(self, process):
+        """Update the latest reading of each GPU, and when it arrived, as lines arrive"""
+        for line in process.stdout:
+            fields = [field.strip() for field in line.split(",")]
+            if len(fields) != 5:
+                continue
+            try:
+                reading = make_gpu_reading(
+                    int(fields[0]), fields[1], float(fields[2]),
+                    float(fields[3]), float(fields[4])
+                )
+            except ValueError:
+                continue
+            with self._lock:
+                if process is not self._process:
+                    return
+                self._readings[reading["index"]] = (reading, time.monotonic())
+                self._arrived.notify_all()
+
+    def read(self):
+        """Return the latest line seen for each GPU"""
+        return self.read_timed()[0]
+
+    def read_timed(self):
+        """
+        Return the latest line seen for each GPU and when the oldest arrived
+
+        Waits up to `max_age` for the first lines of a new stream.
+
+        Raises:
+            RuntimeError: If nvidia-smi exited, or wrote nothing for
+                `max_age` seconds, as when it hangs
+        """
+        status = self._process.poll()
+        if status is not None:
+            # Restart the stream; the collector backs off between attempts
+            self._spawn()
+            raise RuntimeError(f"nvidia-smi exited with status {status}")
+        with self._lock:
+            if not self._readings:
+                self._arrived.wait(self.max_age)
+            if not self._readings:
+                raise RuntimeError("nvidia-smi has not reported any GPU yet")
+            received = min(at for reading, at in self._readings.values())
+            age = time.monotonic() - received
+            if age > self.max_age:
+                raise RuntimeError(f"nvidia-smi has not reported for {age:.0f} s")
+            return [self._readings[index][0] for index in sorted(self._readings)], received
+
+    def close(self):
+        """Stop the nvidia-smi process"""
+        if self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+class FakeGPUBackend(GPUBackend):
+    """Return canned readings; useful for tests and benchmarks"""
+
+    name = "fake"
+
+    def __init__(self, readings=None, error=None):
+        """
+        Args:
+            readings: List of readings to return, one fake GPU by default
+            error: Exception to raise from `read` instead of returning
+        """
+        if readings is None:
+            readings = [make_gpu_reading(0, "Fake GPU", 42.0, 2048.0, 8192.0)]
+        self.readings = readings
+        self.error = error
+        self.reads = 0
+
+    def read(self):
+        """Return the canned readings or raise the configured error"""
+        self.reads += 1
+        if self.error is not None:
+            raise self.error
+        return list(self.readings)
+
+
+BACKENDS = {
+    "gputil": GPUtilBackend,
+    "nvidia-smi": NvidiaSmiStreamBackend,
+    "fake": FakeGPUBackend,
+}
+
+
+def create_gpu_backend(name="auto", interval=2.0):
+    """
+    Create a GPU backend by name
+
+    "auto" prefers a long-lived nvidia-smi stream and falls back to GPUtil.
+
+    Returns:
+        GPUBackend or None if no backend is usable
+    """
+    if name == "auto":
+        if shutil.which("nvidia-smi"):
+            name = "nvidia-smi"
+        else:
+            name = "gputil"
+    try:
+        if name == "nvidia-smi":
+            return NvidiaSmiStreamBackend(interval=interval)
+        return BACKENDS[name]()
+    except (ImportError, OSError, KeyError):
+        return None
+
+
+class GPUCollector:
+    """Poll a GPU backend in the background and cache the last good reading"""
+
+    def __init__(self, backend=None, interval=2.0, max_backoff=60.0, factory=None):
+        """
+        Initialize the collector; call `start` to begin polling
+
+        When `backend` is None, `factory` is called on the collector thread
+        to create it, so probing for GPUs never delays the caller. If it
+        returns None the collector marks itself `unavailable` and stops.
+        """
+        self.backend = backend
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.last_error = None
+        self.unavailable = False
+        self._factory = factory
+        self._latest = (None, None)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start polling on a daemon thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rtsm-gpu", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling and close the backend"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        with self._lock:
+            backend = self.backend
+        if backend is not None:
+            backend.close()
+
+    def poll(self):
+        """Read the backend once and return the delay until the next read"""
+        try:
+            gpus, read_at = self.backend.read_timed()
+        except Exception as e:
+            self.last_error = e
+            self.failures += 1
+            return min(self.interval * 2 ** self.failures, self.max_backoff)
+        self._latest = (gpus, read_at)
+        self.failures = 0
+        self.last_error = None
+        return self.interval
+
+    def latest(self):
+        """
+        Return the last good reading without blocking
+
+        Returns:
+            tuple: (list of GPU readings, age in seconds), or (None, None)
+                if no reading has succeeded yet
+        """
+        gpus, read_at = self._latest
+        if read_at is None:
+            return None, None
+        return gpus, time.monotonic() - read_at
+
+    def _run(self):
+        """Collector thread body"""
+        if self.backend is None:
+            backend = self._factory() if self._factory is not None else None
+            if backend is None:
+                self.unavailable = True
+                return
+            with self._lock:
+                if self._stop.is_set():
+                    # Stopped while the backend was being created
+                    backend.close()
+                    return
+                self.backend = backend
+        while not self._stop.is_set():
+            delay = self.poll()
+            self._stop.wait(delay)
+
+
+def start_gpu_collector(backend="auto", interval=2.0):
+    """
+    Start polling a backend in the background without waiting for it
+
+    The backend is created on the collector thread; check `unavailable`
+    to find out whether none was usable.
+
+    Returns:
+        GPUCollector
+    """
+    collector = GPUCollector(
+        interval=interval, factory=lambda: create_gpu_backend(backend, interval)
+    )
+    collector.start()
+    return collector
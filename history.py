@@ -0,0 +1,211 @@
+"""
+Real-Time System Monitor (RTSM) - History Module
+
+This file contains the fixed-size, array-backed time series kept for
+each metric, their rolling aggregates, and sparkline rendering.
+"""
+
+import threading
+from array import array
+from collections import deque
+
+SPARK_CHARS = " ▁▂▃▄▅▆▇█"
+
+
+class RingBuffer:
+    """
+    Fixed-size time series with rolling min/avg/max/p95
+
+    Values live in a preallocated array('d'). Appending a sample updates
+    every aggregate in amortized O(1): the sum directly, min and max
+    through monotonic deques of sample numbers, and the percentiles
+    through a fixed-bin histogram over [low, high]. The sparkline and
+    summary text are kept until the next sample, so frames drawn in
+    between reuse them.
+
+    Collector threads append while the UI thread reads, so both hold the
+    buffer's lock: mid-append the min and max deques can be empty.
+    """
+
+    def __init__(self, capacity, low=0.0, high=100.0, bins=200):
+        """Allocate room for `capacity` samples"""
+        self.capacity = capacity
+        self.low = low
+        self.high = high
+        self._values = array("d", bytes(8 * capacity))
+        self._histogram = array("q", bytes(8 * bins))
+        self._bin_scale = bins / (high - low)
+        self._mins = deque()
+        self._maxes = deque()
+        self._count = 0
+        self._seq = 0
+        self._sum = 0.0
+        self._sparkline = (None, None, "")
+        self._summary = (None, "")
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of samples held"""
+        return self._count
+
+    def _bin(self, value):
+        """Return the histogram bin of a value"""
+        index = int((value - self.low) * self._bin_scale)
+        return min(max(index, 0), len(self._histogram) - 1)
+
+    def append(self, value):
+        """Add a sample, evicting the oldest one when full"""
+        with self._lock:
+            self._append(value)
+
+    def _append(self, value):
+        """Add a sample; the caller holds the lock"""
+        capacity = self.capacity
+        seq = self._seq
+        slot = seq % capacity
+        values = self._values
+
+        if self._count == capacity:
+            oldest = seq - capacity
+            old = values[slot]
+            self._sum -= old
+            self._histogram[self._bin(old)] -= 1
+            if self._mins[0] == oldest:
+                self._mins.popleft()
+            if self._maxes[0] == oldest:
+                self._maxes.popleft()
+        else:
+            self._count += 1
+
+        values[slot] = value
+        self._histogram[self._bin(value)] += 1
+        if slot == capacity - 1:
+            # Recompute the sum once per lap so rounding errors cannot pile up
+            self._sum = sum(values)
+        else:
+            self._sum += value
+
+        mins = self._mins
+        while mins and values[mins[-1] % capacity] >= value:
+            mins.pop()
+        mins.append(seq)
+        maxes = self._maxes
+        while maxes and values[maxes[-1] % capacity] <= value:
+            maxes.pop()
+        maxes.append(seq)
+
+        self._seq = seq + 1
+
+    def minimum(self):
+        """Return the smallest sample held"""
+        with self._lock:
+            return self._minimum()
+
+    def _minimum(self):
+        """minimum() for a caller holding the lock"""
+        return self._values[self._mins[0] % self.capacity] if self._count else 0.0
+
+    def maximum(self):
+        """Return the largest sample held"""
+        with self._lock:
+            return self._maximum()
+
+    def _maximum(self):
+        """maximum() for a caller holding the lock"""
+        return self._values[self._maxes[0] % self.capacity] if self._count else 0.0
+
+    def average(self):
+        """Return the mean of the samples held"""
+        return self._sum / self._count if self._count else 0.0
+
+    def percentile(self, percent):
+        """Return the given percentile, to the resolution of one histogram bin"""
+        with self._lock:
+            return self._percentile(percent)
+
+    def _percentile(self, percent):
+        """percentile() for a caller holding the lock"""
+        if not self._count:
+            return 0.0
+        target = self._count * percent / 100
+        seen = 0
+        for index, count in enumerate(self._histogram):
+            seen += count
+            if seen >= target:
+                value = self.low + (index + 1) / self._bin_scale
+                return min(max(value, self._minimum()), self._maximum())
+        return self._maximum()
+
+    def latest(self, n):
+        """Return up to the `n` most recent samples, oldest first"""
+        with self._lock:
+            return self._latest(n)
+
+    def _latest(self, n):
+        """latest() for a caller holding the lock"""
+        n = min(n, self._count)
+        start = self._seq - n
+        capacity = self.capacity
+        return [self._values[i % capacity] for i in range(start, self._seq)]
+
+    def sparkline(self, width):
+        """Render the most recent samples as a `width` character sparkline"""
+        seq = self._seq
+        cached_seq, cached_width, text = self._sparkline
+        if cached_seq == seq and cached_width == width:
+            return text
+        with self._lock:
+            seq = self._seq
+            samples = self._latest(width)
+        levels = len(SPARK_CHARS) - 1
+        scale = levels / (self.high - self.low)
+        chars = [
+            SPARK_CHARS[min(max(int(round((value - self.low) * scale)), 0), levels)]
+            for value in samples
+        ]
+        text = " " * (width - len(chars)) + "".join(chars)
+        self._sparkline = (seq, width, text)
+        return text
+
+    def summary(self):
+        """Return the rolling min/avg/max/p95 as text"""
+        seq = self._seq
+        cached_seq, text = self._summary
+        if cached_seq == seq:
+            return text
+        with self._lock:
+            seq = self._seq
+            text = (f" min {self._minimum():.0f} avg {self.average():.0f}"
+                    f" max {self._maximum():.0f} p95 {self._percentile(95):.0f}")
+        self._summary = (seq, text)
+        return text
+
+
+class History:
+    """Keep a ring buffer per metric, fed from sampler results"""
+
+    def __init__(self, capacity=3600):
+        """Initialize with room for `capacity` samples per metric"""
+        self.capacity = capacity
+        self.series = {}
+
+    def record(self, metric, value):
+        """Append a sample to a metric, creating its buffer on first use"""
+        series = self.series.get(metric)
+        if series is None:
+            series = self.series[metric] = RingBuffer(self.capacity)
+        series.append(value)
+
+    def record_sample(self, name, value):
+        """Sampler listener: record the metrics found in a collector result"""
+        if name == "cpu":
+            self.record("cpu", value)
+        elif name == "memory":
+            self.record("memory", value["percent"])
+        elif name == "gpu":
+            for gpu in value.get("GPUs", ()):
+                self.record(f"gpu{gpu['index']}", gpu["usage"])
+
+    def get(self, metric):
+        """Return the ring buffer of a metric, or None if it has no samples"""
+        return self.series.get(metric)
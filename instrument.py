@@ -0,0 +1,94 @@
+"""
+Real-Time System Monitor (RTSM) - Instrumentation Module
+
+This file contains the self-instrumentation that measures what the
+monitor itself costs: time spent per collector and per frame step, the
+process's own CPU and memory usage, and the achieved frame rate.
+"""
+
+import time
+from collections import deque
+import psutil
+
+
+class SelfUsage:
+    """CPU and resident memory used by this process"""
+
+    def __init__(self):
+        """Prime the CPU counters so the first sample has a baseline"""
+        self._process = psutil.Process()
+        self._process.cpu_percent(interval=None)
+
+    def sample(self):
+        """Return CPU usage since the previous call and the current RSS"""
+        with self._process.oneshot():
+            return {
+                "cpu_percent": self._process.cpu_percent(interval=None),
+                "rss": self._process.memory_info().rss,
+            }
+
+
+class Instrumentation:
+    """
+    perf_counter_ns timings of the monitor's hot paths
+
+    Callers only take timings while instrumentation is switched on, so a
+    disabled monitor pays for one flag check per frame or collection.
+    """
+
+    # Frame steps in display order
+    STEPS = ("layout", "draw", "refresh", "collect", "write")
+
+    def __init__(self, window=5.0, clock=time.perf_counter_ns):
+        """
+        Args:
+            window: Seconds over which the achieved frame rate is averaged
+            clock: Nanosecond clock used for frame times
+        """
+        self.timings = {}
+        self._clock = clock
+        self._window = int(window * 1e9)
+        self._frames = deque()
+        self._self_usage = SelfUsage()
+
+    def record(self, step, nanoseconds):
+        """Keep the duration of the latest run of `step`"""
+        self.timings[step] = nanoseconds
+
+    def frame(self):
+        """Count a frame drawn now"""
+        now = self._clock()
+        frames = self._frames
+        frames.append(now)
+        while frames[0] < now - self._window:
+            frames.popleft()
+
+    def fps(self):
+        """Return the frame rate achieved over the window"""
+        frames = self._frames
+        if len(frames) < 2 or frames[-1] == frames[0]:
+            return 0.0
+        return (len(frames) - 1) * 1e9 / (frames[-1] - frames[0])
+
+    def self_usage(self):
+        """Return this process's CPU percent and RSS since the previous call"""
+        return self._self_usage.sample()
+
+    def metrics(self, dropped=0):
+        """
+        Return the instrumentation as flattened metrics for the exporters
+
+        Returns:
+            list: (key, prometheus name, prometheus labels, value) tuples
+        """
+        usage = self.self_usage()
+        metrics = [
+            ("self_cpu_percent", "rtsm_self_cpu_percent", "", usage["cpu_percent"]),
+            ("self_rss_bytes", "rtsm_self_rss_bytes", "", usage["rss"]),
+            ("self_dropped_samples", "rtsm_self_dropped_samples", "", dropped),
+        ]
+        for step in self.STEPS:
+            if step in self.timings:
+                metrics.append((f"self_{step}_seconds", "rtsm_self_step_seconds",
+                                f'step="{step}"', self.timings[step] / 1e9))
+        return metrics
\ No newline at end of file
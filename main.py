@@ -5,69 +5,413 @@ Real-Time System Monitor (RTSM) - A Neofetch-like tool with live updates
 This is the main entry point for the RTSM tool.
 """
 
-import os
+import time
+
+# Reference point for --profile-startup
+STARTED = time.perf_counter()
+
 import sys
 import argparse
-import time
-from monitor import RealTimeSystemMonitor
-from utils import set_square_terminal_size
+from importlib.util import find_spec
 
-# Try to import required modules
-try:
-    import psutil
-except ImportError:
+# Check for required modules without importing them; everything else is
+# imported when first needed and GPUs are probed in the background
+if find_spec("psutil") is None:
     print("Error: Required module 'psutil' not found. Please install it using:")
     print("pip install psutil")
     sys.exit(1)
 
-# Optional GPU monitoring
-try:
-    import GPUtil
-    GPU_AVAILABLE = True
-except ImportError:
-    GPU_AVAILABLE = False
-
 
 def parse_arguments():
     """Parse command-line arguments"""
     parser = argparse.ArgumentParser(description="Real-Time System Monitor (RTSM)")
-    parser.add_argument("-r", "--refresh", type=float, default=1.0,
-                       help="Refresh rate in seconds (default: 1.0)")
+    parser.add_argument("-r", "--refresh", type=float,
+                       help="Refresh interval in seconds for CPU and memory "
+                            "(default: per-panel intervals from the config)")
+    parser.add_argument("--adaptive", action="store_true",
+                       help="Refresh less often while nothing changes and no key is pressed")
     parser.add_argument("-a", "--ascii", type=str,
                        help="Path to custom ASCII art file")
     parser.add_argument("-c", "--config", type=str,
                        help="Path to configuration file (JSON)")
     parser.add_argument("-s", "--square", type=int, 
                        help="Set terminal to square size (e.g. 80 for 80x80)")
+    parser.add_argument("--gpu-backend", type=str, default="auto",
+                       choices=["auto", "nvidia-smi", "gputil", "fake"],
+                       help="GPU backend to poll (default: auto)")
+    parser.add_argument("--gpu-interval", type=float,
+                       help="Seconds between GPU polls (default: 2.0)")
+    parser.add_argument("--backend", type=str, default="auto",
+                       choices=["auto", "cgroup", "procfs", "psutil"],
+                       help="CPU and memory collector; 'cgroup' reports usage against the "
+                            "container's limits, 'auto' picks it inside a container with "
+                            "limits and otherwise reads /proc directly on Linux (default: auto)")
+    parser.add_argument("--headless", action="store_true",
+                       help="Stream samples instead of drawing the dashboard")
+    parser.add_argument("--format", type=str, default="jsonl",
+                       choices=["jsonl", "csv", "prometheus", "none"],
+                       help="Headless output format; 'none' only serves --serve (default: jsonl)")
+    parser.add_argument("-o", "--output", type=str,
+                       help="Headless output file to append to (default: stdout)")
+    parser.add_argument("--count", type=int,
+                       help="Number of headless samples to write (default: unlimited)")
+    parser.add_argument("--flush-every", type=int, default=10,
+                       help="Headless samples written between flushes (default: 10)")
+    parser.add_argument("--top", type=int, default=0,
+                       help="Number of top processes to include in headless output (default: 0)")
+    parser.add_argument("--top-sort", type=str, default="cpu", choices=["cpu", "rss", "io"],
+                       help="Order of the top processes (default: cpu)")
+    parser.add_argument("--self-metrics", action="store_true",
+                       help="Add the monitor's own CPU, memory and step timings to headless output")
+    parser.add_argument("--record", type=str, metavar="FILE",
+                       help="Append samples to a binary recording")
+    parser.add_argument("--record-interval", type=float, default=1.0,
+                       help="Seconds between recorded samples in the dashboard (default: 1.0)")
+    parser.add_argument("--record-max-mb", type=float, default=64.0,
+                       help="Rotate the recording at this size in MB; 0 never rotates (default: 64)")
+    parser.add_argument("--replay", type=str, metavar="FILE",
+                       help="Play back a recording instead of monitoring this system")
+    parser.add_argument("--speed", type=float, default=1.0,
+                       help="Replay speed; 0 replays headless output as fast as possible (default: 1.0)")
+    parser.add_argument("--seek", type=float, default=0.0,
+                       help="Seconds into the recording to start the replay at (default: 0)")
+    parser.add_argument("--profile-startup", action="store_true",
+                       help="Report import and startup times on exit")
+    parser.add_argument("--serve", type=str, metavar="ADDRESS",
+                       help="Serve /metrics and /snapshot.json on PORT, HOST:PORT "
+                            "or unix:PATH (binds to 127.0.0.1 by default)")
+    parser.add_argument("--max-staleness", type=float, default=1.0,
+                       help="Seconds a served snapshot may be reused (default: 1.0)")
+    parser.add_argument("--agent", type=str, metavar="ADDRESS",
+                       help="Push samples to an aggregator at HOST:PORT or unix:PATH "
+                            "instead of drawing the dashboard")
+    parser.add_argument("--agent-name", type=str,
+                       help="Host name the agent reports (default: this host's name)")
+    parser.add_argument("--aggregate", type=str, metavar="ADDRESS",
+                       help="Accept agents on PORT, HOST:PORT or unix:PATH and show one row "
+                            "per host (binds to 127.0.0.1 by default)")
+    parser.add_argument("--publish", action="store_true",
+                       help="Collect once for every RTSM on this host and publish the "
+                            "snapshots to the shared-memory bus instead of drawing")
+    parser.add_argument("--bus", type=str, metavar="NAME",
+                       help="Shared-memory segment of the snapshot bus (default: rtsm-UID)")
+    parser.add_argument("--no-bus", action="store_true",
+                       help="Collect locally even when a publisher is running")
+    parser.add_argument("--max-hosts", type=int, default=1024,
+                       help="Most hosts the aggregator keeps (default: 1024)")
+    parser.add_argument("--stale-after", type=float, default=10.0,
+                       help="Seconds without a sample before a host is marked stale (default: 10)")
     
     return parser.parse_args()
 
 
+def start_server(args, collect, max_staleness):
+    """Start the HTTP metrics endpoint, returning the server and its cache"""
+    from server import MetricsServer, SnapshotCache
+    
+    cache = SnapshotCache(collect, max_staleness)
+    server = MetricsServer(cache, args.serve)
+    server.start()
+    return server, cache
+
+
+def open_recorder(args):
+    """Return a Recorder for --record, or None"""
+    if not args.record:
+        return None
+    from recorder import Recorder
+    return Recorder(args.record, max_bytes=int(args.record_max_mb * (1 << 20)))
+
+
+def open_recording(args):
+    """Open the --replay recording, exiting with a message when it is unusable"""
+    from recorder import Recording
+    try:
+        return Recording(args.replay)
+    except (OSError, ValueError) as e:
+        print(f"Error: cannot replay {args.replay}: {e}")
+        sys.exit(1)
+
+
+def attach_bus(args):
+    """Return a BusSampler reading this host's publisher, or None to collect locally"""
+    if args.no_bus:
+        return None
+    from bus import BusSampler, DEFAULT_NAME
+    try:
+        return BusSampler(args.bus or DEFAULT_NAME)
+    except RuntimeError:
+        return None
+
+
+def publish(args):
+    """Collect for every viewer on this host until interrupted"""
+    from bus import Publisher, DEFAULT_NAME
+    from monitor import RealTimeSystemMonitor
+    monitor = RealTimeSystemMonitor(
+        refresh_rate=args.refresh,
+        config_file=args.config,
+        gpu_available=True,
+        gpu_backend=args.gpu_backend,
+        gpu_interval=args.gpu_interval
+    )
+    try:
+        publisher = Publisher(args.bus or DEFAULT_NAME)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    monitor.publish(publisher)
+
+
+def run_headless(args):
+    """Stream samples to stdout or a file without curses"""
+    from exporter import SnapshotCollector, sampler_snapshot, run_headless as stream_samples
+    from gpu import start_gpu_collector
+    from processes import ProcessTable
+    from instrument import Instrumentation
+    
+    interval = args.refresh or 1.0
+    process_table = ProcessTable(args.top, args.top_sort) if args.top else None
+    recorder = open_recorder(args)
+    bus = attach_bus(args)
+    if bus is not None:
+        bus.start()
+    # Started only when collecting locally, as nvidia-smi polls are costly
+    collectors = []
+    
+    def collect():
+        if bus is not None and bus.attached:
+            return sampler_snapshot(bus.snapshot(), args.top, args.top_sort)
+        if not collectors:
+            gpu_collector = start_gpu_collector(args.gpu_backend, args.gpu_interval or 2.0)
+            collectors.append((gpu_collector, SnapshotCollector(gpu_collector, process_table, interval)))
+        return collectors[0][1].collect()
+    
+    server = cache = None
+    try:
+        if args.serve:
+            # The stream and the endpoint share collections
+            server, cache = start_server(args, collect, min(args.max_staleness, interval / 2))
+        if args.format == "none" and recorder is None:
+            if server is not None:
+                server.serve_forever()
+            return
+        stream_samples(
+            fmt=args.format,
+            output=args.output,
+            interval=interval,
+            count=args.count,
+            flush_every=args.flush_every,
+            cache=cache,
+            collect=collect,
+            process_table=process_table,
+            recorder=recorder,
+            instrumentation=Instrumentation() if args.self_metrics else None
+        )
+    finally:
+        if recorder is not None:
+            recorder.close()
+        if server is not None:
+            server.stop()
+        if bus is not None:
+            bus.stop()
+        for gpu_collector, collector in collectors:
+            collector.close()
+            gpu_collector.stop()
+
+
+def run_agent(args):
+    """Push samples to an aggregator until interrupted"""
+    import socket
+    from cluster import Agent
+    from exporter import SnapshotCollector
+    from gpu import start_gpu_collector
+    from processes import ProcessTable
+    
+    interval = args.refresh or 1.0
+    process_table = ProcessTable(args.top, args.top_sort) if args.top else None
+    gpu_collector = start_gpu_collector(args.gpu_backend, args.gpu_interval or 2.0)
+    collector = SnapshotCollector(gpu_collector, process_table, interval)
+    agent = Agent(
+        args.agent,
+        args.agent_name or socket.gethostname(),
+        collector.collect,
+        interval=interval
+    )
+    try:
+        agent.run(args.count)
+    finally:
+        collector.close()
+        gpu_collector.stop()
+
+
+def aggregate(args):
+    """Show the hosts whose agents connect to --aggregate"""
+    from cluster import Aggregator
+    from monitor import RealTimeSystemMonitor
+    
+    source = Aggregator(args.aggregate, max_hosts=args.max_hosts, stale_after=args.stale_after)
+    try:
+        source.start()
+    except OSError as e:
+        print(f"Error: cannot listen on {args.aggregate}: {e}")
+        sys.exit(1)
+    monitor = RealTimeSystemMonitor(
+        refresh_rate=args.refresh,
+        config_file=args.config,
+        source=source
+    )
+    monitor.run()
+
+
+def stop_on_sigterm():
+    """Handle SIGTERM like Ctrl-C, so that every mode cleans up when a service manager stops it"""
+    import signal
+    
+    def handler(signum, frame):
+        # A second SIGTERM during the cleanup ends the process at once
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        raise KeyboardInterrupt
+    
+    signal.signal(signal.SIGTERM, handler)
+
+
 def main():
     """Main entry point"""
     args = parse_arguments()
+    stop_on_sigterm()
+    
+    profiler = None
+    if args.profile_startup:
+        from startup import StartupProfiler
+        profiler = StartupProfiler(STARTED)
+        profiler.install()
+        profiler.mark("parse arguments")
+    try:
+        run(args, profiler)
+    finally:
+        if profiler is not None:
+            profiler.uninstall()
+            profiler.report()
+
+
+def run(args, profiler=None):
+    """Run the mode selected on the command line"""
+    # Select how CPU and memory usage are collected
+    from resource_usage import set_backend
+    try:
+        set_backend(args.backend)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if profiler is not None:
+        profiler.mark("select backend")
+    
+    if args.replay:
+        replay(args)
+        return
+    
+    if args.agent:
+        run_agent(args)
+        return
+    
+    if args.aggregate:
+        aggregate(args)
+        return
+    
+    if args.publish:
+        publish(args)
+        return
+    
+    if args.headless:
+        run_headless(args)
+        return
     
     # Set square terminal size if requested
+    warnings = []
     if args.square:
+        from utils import set_square_terminal_size
         if not set_square_terminal_size(args.square):
-            print(f"Warning: Could not set terminal to {args.square}x{args.square}")
-            print("The program will continue with the current terminal size.")
-            time.sleep(2)  # Give user time to read the warning
-    
-    # Warn about optional modules
-    if not GPU_AVAILABLE:
-        print("Warning: 'GPUtil' module not found. GPU monitoring will be disabled.")
-        print("To enable GPU monitoring, install GPUtil: pip install GPUtil")
-        time.sleep(2)  # Give user time to read the warning
+            warnings.append(f"Could not set terminal to {args.square}x{args.square}; "
+                            "using the current size")
     
-    # Run the monitor
+    # Run the monitor (imported here so headless mode never loads curses)
+    from monitor import RealTimeSystemMonitor
+    if profiler is not None:
+        profiler.mark("import monitor")
+    # Draw what this host's publisher collects, if one is running; the
+    # recorder is driven by a local collector
+    recorder = open_recorder(args)
+    source = attach_bus(args) if recorder is None else None
+    if profiler is not None:
+        profiler.mark("attach bus")
     monitor = RealTimeSystemMonitor(
         refresh_rate=args.refresh,
         custom_ascii=args.ascii,
         config_file=args.config,
-        gpu_available=GPU_AVAILABLE
+        # GPUs are probed in the background; a missing backend is
+        # reported on the status line
+        gpu_available=True,
+        gpu_backend=args.gpu_backend,
+        gpu_interval=args.gpu_interval,
+        source=source,
+        recorder=recorder,
+        record_interval=args.record_interval,
+        warnings=warnings,
+        adaptive=args.adaptive,
+        # What the server exports is collected whatever the panels show
+        exporting=bool(args.serve)
     )
-    monitor.run()
+    if profiler is not None:
+        profiler.mark("create monitor")
+    server = None
+    if args.serve:
+        # Serve what the dashboard already collects
+        server, _ = start_server(args, monitor.export_snapshot, args.max_staleness)
+    try:
+        monitor.run()
+    finally:
+        if server is not None:
+            server.stop()
+        if monitor.recorder is not None:
+            monitor.recorder.close()
+        if profiler is not None and monitor.first_frame_at is not None:
+            profiler.mark("first frame", monitor.first_frame_at)
+
+
+def replay(args):
+    """Play back a recording in the dashboard or as headless output"""
+    recording = open_recording(args)
+    try:
+        if args.headless:
+            from recorder import replay_headless
+            replay_headless(
+                recording,
+                fmt=args.format if args.format != "none" else "jsonl",
+                output=args.output,
+                speed=args.speed,
+                offset=args.seek,
+                flush_every=args.flush_every
+            )
+            return
+        
+        from recorder import ReplaySampler
+        from monitor import RealTimeSystemMonitor
+        try:
+            source = ReplaySampler(recording, args.speed or 1.0, args.seek)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        monitor = RealTimeSystemMonitor(
+            refresh_rate=args.refresh,
+            custom_ascii=args.ascii,
+            config_file=args.config,
+            gpu_available=bool(recording.gpus),
+            source=source
+        )
+        monitor.run()
+    finally:
+        recording.close()
 
 
 if __name__ == "__main__":
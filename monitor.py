@@ -8,33 +8,202 @@ system monitoring functionality and UI rendering.
 import os
 import sys
 import curses
+import heapq
+import math
 import time
 import json
 from datetime import datetime
-from utils import format_bytes
-from system_info import get_system_info
-from resource_usage import get_resource_usage
-from ascii_art import get_ascii_art, ASCII_ART
+from utils import format_bytes, FileWatcher
+from system_info import get_system_info, get_uptime_seconds, invalidate_system_info
+from resource_usage import get_cpu_usage, get_memory_usage, get_gpu_usage, get_container_usage, get_backend
+from ascii_art import ArtCache, ASCII_ART
+from sampler import Sampler
+from gpu import start_gpu_collector
+from renderer import Renderer
+from scheduler import Scheduler, AdaptiveRate
+from history import History, SPARK_CHARS
+from exporter import Snapshot, static_info, sampler_resources
+from processes import ProcessTable, SORT_KEYS
+from counters import CoreUsage, DiskRates, NetworkRates
+from instrument import Instrumentation
+from cluster import HOST_SORT_KEYS
+from alerts import AlertEngine
+from bus import HEARTBEAT
+from panels import PANELS, compile_layout, load_plugins, resolve_layout
+
+# Seconds each key moves the replay position by
+REPLAY_SEEK_KEYS = {
+    curses.KEY_LEFT: -60,
+    curses.KEY_RIGHT: 60,
+    curses.KEY_DOWN: -3600,
+    curses.KEY_UP: 3600,
+}
+
+# Collectors export_snapshot reads
+EXPORTED_COLLECTORS = ("system_info", "cpu", "memory", "container", "gpu")
+
+# Top processes published in each order for viewers of the snapshot bus
+BUS_PROCESSES = 20
+
+# Offset of frame deadlines from collector deadlines, so collectors have
+# published by the time the frame showing their data is drawn
+FRAME_PHASE = 0.01
 
 
 class RealTimeSystemMonitor:
     """Main system monitor class"""
     
-    def __init__(self, refresh_rate=1.0, custom_ascii=None, config_file=None, gpu_available=False):
-        """Initialize the system monitor"""
+    def __init__(self, refresh_rate=None, custom_ascii=None, config_file=None, gpu_available=False,
+                 gpu_backend="auto", gpu_interval=None, source=None, recorder=None,
+                 record_interval=1.0, warnings=None, adaptive=False, exporting=False):
+        """
+        Initialize the system monitor
+
+        Each panel refreshes at its own interval from the "intervals"
+        config section; `refresh_rate` overrides the CPU and memory
+        intervals and `gpu_interval` the GPU one. A `source` such as a
+        ReplaySampler replaces the live sampler; an Aggregator source
+        switches the dashboard to the host table, and a BusSampler source
+        draws what the host's publisher collects, collecting locally if
+        it goes away. A `recorder` appends
+        a snapshot every `record_interval` seconds. `warnings` are shown
+        on the status line instead of delaying startup. `adaptive` (or the
+        "adaptive" config key) stretches all intervals while nothing
+        happens. Edits to the config and custom art files are picked up
+        while running.
+
+        Only the collectors of the panels shown run; the recorder, alert
+        rules and `exporting` (serving export_snapshot) keep the ones
+        they read running too.
+        """
         self.refresh_rate = refresh_rate
         self.custom_ascii = custom_ascii
         self.running = True
         self.gpu_available = gpu_available
+        self.gpu_backend = gpu_backend
+        self.gpu_collector = None
+        self.recorder = recorder
+        self.record_interval = record_interval
+        self.source_kind = source.kind if source is not None else "live"
+        self.replaying = self.source_kind == "replay"
+        self.aggregating = self.source_kind == "aggregate"
+        self.publishing = False
+        self.exporting = exporting or recorder is not None
+        # Set once collectors run in this process rather than in a publisher
+        self.collecting = False
+        self.host_offset = 0
+        self.warnings = list(warnings or ())
+        self.first_frame_at = None
+        self.attrs = {}
+        self._layout_key = None
+        self._layout = None
+        # Panels in the alert color this frame
+        self.highlighted = ()
+        self._drawn = None
+        # Text and bar segments reused while the values they show are unchanged
+        self._resources = (None, None)
+        self._texts = {}
+        self._bars = {}
+        self._clock = (None, False, "")
+        self._warning = (None, False, "")
+        self.config_file = config_file
         self.config = self.load_config(config_file)
+        self._config_watcher = FileWatcher(config_file) if config_file else None
+        self.art = ArtCache(custom_ascii)
         
-    def load_config(self, config_file):
-        """Load configuration from file or use defaults"""
+        self.intervals = dict(self.config["intervals"])
+        if refresh_rate:
+            self.intervals["cpu"] = refresh_rate
+            self.intervals["memory"] = refresh_rate
+        if gpu_interval:
+            self.intervals["gpu"] = gpu_interval
+        self.gpu_interval = self.intervals["gpu"]
+        self.history = History(self.config["history_size"])
+        self.process_table = ProcessTable(self.config["process_count"], self.config["process_sort"])
+        self.core_usage = CoreUsage()
+        self.disk_rates = DiskRates(self.config["disk_exclude"])
+        self.network_rates = NetworkRates(self.config["network_exclude"])
+        self.instrumentation = Instrumentation()
+        self.scheduler = None
+        self.sampler = None
+        self.alerts = None
+        
+        # Third-party panels register themselves as their modules are imported
+        self.warnings = self.warnings + load_plugins(self.config["plugins"])
+        self._layout_errors = []
+        self.set_layout()
+        self.sampler = source if source is not None else self.create_sampler()
+        self.sampler.add_listener(self.history.record_sample)
+        # Replays and aggregators have no collectors to fall behind
+        self._states = getattr(self.sampler, "states", None)
+        if self.source_kind == "bus":
+            source.fallback = self.collect_locally
+        if self.config["show_instrumentation"]:
+            self.sampler.timings = {}
+        
+        # Alert rules are evaluated on the collector threads as samples arrive
+        self._alert_listener = False
+        self._alert_errors = []
+        self.set_alerts(*AlertEngine.from_config(self.config))
+        
+        self.adaptive = None
+        if (adaptive or self.config["adaptive"]) and self.source_kind in ("live", "bus"):
+            self.adaptive = AdaptiveRate(
+                self.config["adaptive_max_scale"], self.config["adaptive_settle"],
+                self.config["adaptive_threshold"]
+            )
+            self.sampler.add_listener(self.adaptive.observe)
+        
+    def load_config(self, config_file, strict=False):
+        """
+        Load configuration from file or use defaults
+
+        A missing or invalid file gives the defaults, or raises OSError or
+        ValueError when `strict`.
+        """
         default_config = {
             "show_system_info": True,
             "show_ascii": True,
             "show_resources": True,
             "show_clock": True,
+            "show_history": True,
+            "history_size": 3600,
+            "show_processes": False,
+            "process_count": 5,
+            "process_sort": "cpu",
+            "show_cores": True,
+            "show_disks": False,
+            "show_network": False,
+            "device_count": 4,
+            "disk_exclude": ["loop", "ram", "zram"],
+            "network_exclude": ["lo"],
+            "show_instrumentation": False,
+            "host_sort": "cpu",
+            "alerts": [],
+            "alert_actions": ["highlight"],
+            "alert_cooldown": 60.0,
+            "alert_log": "rtsm-alerts.jsonl",
+            "adaptive": False,
+            "adaptive_max_scale": 16.0,
+            "adaptive_settle": 15.0,
+            "adaptive_threshold": 10.0,
+            "collector_timeout": 2.0,
+            "layout": ["ascii", "system_info", "cpu", "memory", "container", "gpu",
+                       "cores", "disks", "network", "processes", "clock"],
+            "plugins": [],
+            "intervals": {
+                "cpu": 0.5,
+                "memory": 2.0,
+                "container": 2.0,
+                "gpu": 2.0,
+                "system_info": 60.0,
+                "processes": 2.0,
+                "cores": 1.0,
+                "disks": 2.0,
+                "network": 2.0,
+                "instrumentation": 1.0,
+                "clock": 1.0,
+            },
             "colors": {
                 "title": curses.COLOR_CYAN,
                 "label": curses.COLOR_GREEN,
@@ -42,6 +211,7 @@ class RealTimeSystemMonitor:
                 "ascii": curses.COLOR_YELLOW,
                 "bar_filled": curses.COLOR_GREEN,
                 "bar_empty": curses.COLOR_WHITE,
+                "alert": curses.COLOR_RED,
             }
         }
         
@@ -56,38 +226,209 @@ class RealTimeSystemMonitor:
                         else:
                             default_config[key] = value
             except (FileNotFoundError, json.JSONDecodeError):
-                pass
+                if strict:
+                    raise
                 
         return default_config
     
+    def create_sampler(self):
+        """Create the background sampler that feeds the dashboard, with hidden panels' collectors paused"""
+        sampler = Sampler(self.config["collector_timeout"])
+        intervals = self.intervals
+        sampler.add_collector("system_info", get_system_info, intervals["system_info"])
+        sampler.add_collector("cpu", get_cpu_usage, intervals["cpu"])
+        sampler.add_collector("memory", get_memory_usage, intervals["memory"])
+        if get_backend() == "cgroup":
+            sampler.add_collector("container", get_container_usage, intervals["container"])
+        if self.gpu_available:
+            sampler.add_collector(
+                "gpu",
+                lambda: get_gpu_usage(self.gpu_collector) if self.gpu_collector else {},
+                intervals["gpu"]
+            )
+        sampler.add_collector("processes", self.collect_processes, intervals["processes"])
+        sampler.add_collector("cores", self.core_usage.sample, intervals["cores"])
+        sampler.add_collector("disks", self.disk_rates.sample, intervals["disks"])
+        sampler.add_collector("network", self.network_rates.sample, intervals["network"])
+        sampler.add_collector("instrumentation", self.instrumentation.self_usage,
+                              intervals["instrumentation"])
+        for panel in PANELS.values():
+            if panel.collect is not None:
+                sampler.add_collector(panel.name, panel.collect, intervals.get(panel.name, panel.interval))
+        if self.recorder is not None:
+            sampler.add_collector("record", self.record_snapshot, self.record_interval)
+        sampler.set_paused(self.hidden_collectors())
+        return sampler
+    
+    def collect_locally(self):
+        """Return a sampler taking over from a snapshot bus publisher that went away"""
+        self.collecting = True
+        self.start_gpu_polling()
+        self.warnings = self.warnings + ["snapshot bus publisher stopped; collecting locally"]
+        return self.create_sampler()
+    
+    def record_snapshot(self):
+        """Append what the sampler last collected to the recording"""
+        self.recorder.write(self.export_snapshot())
+    
+    def collect_processes(self):
+        """Refresh the process table"""
+        if self.publishing:
+            # Each viewer of the snapshot bus picks its own order and count
+            self.process_table.update()
+            return {sort: self.process_table.top(BUS_PROCESSES, sort) for sort in SORT_KEYS}
+        return self.process_table.refresh()
+    
+    def hidden_collectors(self):
+        """
+        Return the collectors that no shown panel, alert rule or export reads
+
+        Nothing is hidden while publishing, since each viewer of the
+        snapshot bus shows its own panels.
+        """
+        if self.publishing:
+            return frozenset()
+        collected = {"instrumentation"}
+        for panel in PANELS.values():
+            collected.update(panel.sources())
+        needed = set(EXPORTED_COLLECTORS) if self.exporting else set()
+        for panel in self.visible_panels:
+            needed.update(panel.sources())
+        if self.config["show_instrumentation"]:
+            needed.add("instrumentation")
+        if self.alerts is not None:
+            needed.update(rule.source for rule in self.alerts.rules)
+        return frozenset(collected - needed)
+    
+    def pause_hidden_collectors(self):
+        """Pause the collectors nothing reads and resume the rest"""
+        set_paused = getattr(self.sampler, "set_paused", None)
+        if set_paused is not None:
+            set_paused(self.hidden_collectors())
+        self.start_gpu_polling()
+    
+    def start_gpu_polling(self):
+        """Start polling the GPUs once this process collects and something reads them"""
+        if (self.collecting and self.gpu_available and self.gpu_collector is None
+                and "gpu" not in self.hidden_collectors()):
+            self.gpu_collector = start_gpu_collector(self.gpu_backend, self.gpu_interval)
+    
+    def set_layout(self):
+        """Look up the panels of the "layout" config and report unknown ones"""
+        self.panels, errors = resolve_layout(self.config["layout"])
+        self.warnings = [w for w in self.warnings if w not in self._layout_errors] + errors
+        self._layout_errors = errors
+        self.update_panels()
+    
+    def update_panels(self):
+        """Pick up panels the config shows or hides, pausing the collectors nothing reads"""
+        config = self.config
+        self.visible_panels = tuple(panel for panel in self.panels if panel.shown(config))
+        self.pause_hidden_collectors()
+    
+    def resources_from_snapshot(self, snapshot):
+        """
+        Assemble the resource usage dictionary from sampler results, once per snapshot
+
+        CPU and memory usage are left out while their collectors have not
+        published, such as when their panels are hidden.
+        """
+        cached_snapshot, resources = self._resources
+        if cached_snapshot is snapshot:
+            return resources
+        resources = sampler_resources(snapshot, partial=True)
+        self._resources = (snapshot, resources)
+        return resources
+    
+    def export_snapshot(self):
+        """Build an exportable snapshot from what the sampler last collected"""
+        snapshot = self.sampler.snapshot()
+        resources = self.resources_from_snapshot(snapshot)
+        if "CPU Usage" not in resources or "Memory" not in resources:
+            raise RuntimeError("no samples collected yet")
+        return Snapshot(
+            time.time(), static_info(snapshot.get("system_info", {})),
+            resources, get_uptime_seconds()
+        )
+    
     def save_config(self, config_file):
         """Save configuration to file"""
         if config_file:
             with open(config_file, 'w') as f:
                 json.dump(self.config, f, indent=4)
     
-    def draw_progress_bar(self, stdscr, y, x, width, percentage, filled_color, empty_color):
-        """Draw a progress bar with color"""
-        filled_width = int(width * percentage / 100)
-        
-        # Set colors for filled part
-        stdscr.attron(curses.color_pair(filled_color))
-        stdscr.addstr(y, x, "█" * filled_width)
-        stdscr.attroff(curses.color_pair(filled_color))
+    def set_alerts(self, engine, errors=()):
+        """Swap in a new alert engine and report its rule errors"""
+        previous = self.alerts
+        self.alerts = engine
+        if engine is not None and not self._alert_listener:
+            self.sampler.add_listener(self.alert_sample)
+            self._alert_listener = True
+        if previous is not None:
+            # Queued events and hooks of the old rules finish in the background
+            previous.close(wait=False)
+        self.warnings = [w for w in self.warnings if w not in self._alert_errors] + list(errors)
+        self._alert_errors = list(errors)
+        # The collectors the rules read run whatever the panels show
+        self.pause_hidden_collectors()
+    
+    def alert_sample(self, name, value):
+        """Sampler listener handing samples to the current alert engine"""
+        alerts = self.alerts
+        if alerts is not None:
+            alerts.on_sample(name, value)
+    
+    def reload_config(self):
+        """
+        Apply an edited config file without restarting
+
+        Intervals, the history size, the adaptive mode, the collector
+        timeout and the panel plugins are fixed once sampling has started;
+        edits to them apply after a restart. An unreadable file, or one naming
+        an unknown process or host order, leaves the running config alone.
+
+        Returns:
+            bool: True if the config was applied
+        """
+        try:
+            config = self.load_config(self.config_file, strict=True)
+        except (OSError, ValueError):
+            return False
+        if config["process_sort"] not in SORT_KEYS or config["host_sort"] not in HOST_SORT_KEYS:
+            return False
+        for key in ("intervals", "history_size", "adaptive", "collector_timeout", "plugins"):
+            config[key] = self.config[key]
+        previous, self.config = self.config, config
         
-        # Set colors for empty part
-        stdscr.attron(curses.color_pair(empty_color))
-        stdscr.addstr(y, x + filled_width, "░" * (width - filled_width))
-        stdscr.attroff(curses.color_pair(empty_color))
+        self.process_table.count = config["process_count"]
+        self.process_table.sort = config["process_sort"]
+        self.disk_rates.exclude = config["disk_exclude"]
+        self.network_rates.exclude = config["network_exclude"]
+        self.sampler.timings = {} if config["show_instrumentation"] else None
+        if self.adaptive is not None:
+            self.adaptive.max_scale = config["adaptive_max_scale"]
+            self.adaptive.settle = config["adaptive_settle"]
+            self.adaptive.threshold = config["adaptive_threshold"]
+        if self.attrs:
+            self.setup_colors()
+        self.set_layout()
+        alert_keys = ("alerts", "alert_actions", "alert_cooldown", "alert_log")
+        if any(config[key] != previous[key] for key in alert_keys):
+            self.set_alerts(*AlertEngine.from_config(config))
+        return True
     
-    def curses_main(self, stdscr):
-        """Main curses interface handler"""
-        # Setup curses
-        curses.curs_set(0)  # Hide cursor
+    def reload_files(self):
+        """Pick up edits to the config and custom art files; return True if either changed"""
+        changed = self.art.reload_if_changed()
+        if self._config_watcher is not None and self._config_watcher.changed():
+            changed = self.reload_config() or changed
+        return changed
+    
+    def setup_colors(self):
+        """Initialize color pairs and the attributes used for drawing"""
         curses.start_color()
         curses.use_default_colors()
         
-        # Initialize color pairs
         colors = self.config["colors"]
         curses.init_pair(1, colors["title"], -1)
         curses.init_pair(2, colors["label"], -1)
@@ -95,200 +436,476 @@ class RealTimeSystemMonitor:
         curses.init_pair(4, colors["ascii"], -1)
         curses.init_pair(5, colors["bar_filled"], -1)
         curses.init_pair(6, colors["bar_empty"], -1)
+        curses.init_pair(7, colors["alert"], -1)
+        
+        self.attrs = {
+            "title": curses.color_pair(1) | curses.A_BOLD,
+            "header": curses.color_pair(2) | curses.A_BOLD,
+            "label": curses.color_pair(2),
+            "value": curses.color_pair(3),
+            "ascii": curses.color_pair(4),
+            "bar_filled": curses.color_pair(5),
+            "bar_empty": curses.color_pair(6),
+            "help": curses.A_DIM,
+            "alert": curses.color_pair(7) | curses.A_BOLD,
+        }
+    
+    def progress_bar(self, width, percentage, filled_attr, empty_attr):
+        """Return the segments of a progress bar, reused for each width and fill"""
+        filled_width = int(width * percentage / 100)
+        key = (width, filled_width, filled_attr, empty_attr)
+        segments = self._bars.get(key)
+        if segments is None:
+            if len(self._bars) >= 4096:
+                self._bars.clear()
+            segments = self._bars[key] = (
+                ("█" * filled_width, filled_attr),
+                ("░" * (width - filled_width), empty_attr)
+            )
+        return segments
+    
+    def cached_text(self, key, value, format):
+        """
+        Return format(value), reusing the result while `value` is unchanged
+
+        Published samples are never modified, so the same object means
+        the same text; texts are dropped with each new layout.
+        """
+        cached = self._texts.get(key)
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        text = format(value)
+        self._texts[key] = (value, text)
+        return text
+    
+    @staticmethod
+    def memory_text(mem):
+        """Describe memory usage"""
+        return f"{format_bytes(mem['used'])} / {format_bytes(mem['total'])} ({mem['percent']:.1f}%)"
+    
+    @staticmethod
+    def vram_text(memory):
+        """Describe GPU memory usage"""
+        return f"{memory['used']:.1f} / {memory['total']:.1f} MB ({memory['percent']:.1f}%)"
+    
+    @staticmethod
+    def cores_text(cores):
+        """Summarise per-core usage and render one glyph per core"""
+        busiest = max(range(len(cores)), key=cores.__getitem__)
+        glyphs = "".join(SPARK_CHARS[1 + min(int(percent * 8 / 100), 7)] for percent in cores)
+        return f"{len(cores)}, busiest #{busiest} at {cores[busiest]:.1f}%", glyphs
+    
+    def disk_rows(self, disks):
+        """Return the rows of the disk I/O panel"""
+        return [
+            f"{name[:10]:<10} R {format_bytes(read_rate):>10}/s"
+            f"  W {format_bytes(write_rate):>10}/s  {iops:>7.0f} IOPS"
+            for name, read_rate, write_rate, iops in self.busiest_devices(
+                disks, lambda disk: disk[1] + disk[2])
+        ]
+    
+    def network_rows(self, network):
+        """Return the rows of the network panel"""
+        return [
+            f"{name[:10]:<10} RX {format_bytes(recv_rate):>10}/s  TX {format_bytes(sent_rate):>10}/s"
+            for name, recv_rate, sent_rate in self.busiest_devices(
+                network, lambda nic: nic[1] + nic[2])
+        ]
+    
+    @staticmethod
+    def process_rows(processes):
+        """Return the rows of the top processes panel"""
+        return [
+            f"{pid:>7} {name[:16]:<16} {cpu:>6.1f} {format_bytes(rss):>10} {format_bytes(io_rate):>10}"
+            for pid, name, cpu, rss, io_rate in processes
+        ]
+    
+    def history_segments(self, metric, width):
+        """Return a sparkline with the rolling min/avg/max/p95 of a metric, or None before its first sample"""
+        series = self.history.get(metric)
+        if series is None:
+            return None
+        return (
+            (series.sparkline(width), self.attrs["bar_filled"]),
+            (series.summary(), self.attrs["value"])
+        )
+    
+    def alert_attrs(self, panel):
+        """Return the value and bar attributes of a panel, in the alert color while it alerts"""
+        attrs = self.attrs
+        if panel in self.highlighted:
+            return attrs["alert"], attrs["alert"]
+        return attrs["value"], attrs["bar_filled"]
+    
+    def layout_key(self, snapshot):
+        """Return what the static layout depends on besides the screen size"""
+        if self.aggregating:
+            return self.config["host_sort"]
+        return (
+            self.visible_panels, self.config["show_history"], self.config["show_instrumentation"],
+            tuple(panel.layout_key(self, snapshot) for panel in self.visible_panels)
+        )
+    
+    def instrumentation_text(self, snapshot):
+        """Describe the monitor's own CPU, memory and frame rate"""
+        usage = snapshot.get("instrumentation") or {}
+        requested = 1 / min(self.intervals.values())
+        skipped = self.scheduler.skipped if self.scheduler is not None else 0
+        return (f"RTSM cpu {usage.get('cpu_percent', 0.0):.1f}% rss {format_bytes(usage.get('rss', 0))}"
+                f" | {self.instrumentation.fps():.1f}/{requested:.1f} fps | dropped {skipped}")
+    
+    def timings_text(self, snapshot):
+        """Describe the duration of the last frame steps and collector runs"""
+        timings = dict(getattr(self.sampler, "timings", None) or {})
+        steps = " ".join(
+            f"{step} {self.instrumentation.timings[step] / 1000:.0f}us"
+            for step in ("layout", "draw", "refresh") if step in self.instrumentation.timings
+        )
+        collect = " ".join(f"{name} {ns / 1000:.0f}us" for name, ns in sorted(timings.items()))
+        return f"frame: {steps} | collect: {collect}"
+    
+    def status_text(self):
+        """Return the firing alerts and warnings to show on the status line"""
+        gpu_missing = self.gpu_collector is not None and self.gpu_collector.unavailable
+        # The warnings list is replaced, never changed in place, so its text can be kept
+        cached_warnings, cached_missing, warning = self._warning
+        if cached_warnings is not self.warnings or cached_missing != gpu_missing:
+            warnings = list(self.warnings)
+            if gpu_missing:
+                warnings.append("GPU monitoring disabled: neither nvidia-smi nor GPUtil found "
+                                "(pip install GPUtil)")
+            warning = "Warning: " + "; ".join(warnings) if warnings else ""
+            self._warning = (self.warnings, gpu_missing, warning)
+        active = self.alerts.active() if self.alerts is not None else None
+        states = self._states() if self._states is not None else None
+        if not active and not states:
+            return warning
+        parts = [f"ALERT {rule.text} ({rule.value:.1f})" for rule in active or ()]
+        if states:
+            # Panels of these collectors show their last sample
+            parts.append("Late: " + ", ".join(f"{name} {state}" for name, state in states.items()))
+        if warning:
+            parts.append(warning)
+        return "; ".join(parts)
+    
+    def container_text(self, container):
+        """Describe the cgroup's limits, throttling and pressure on one line"""
+        cpu_limit = container["cpu_limit"]
+        memory_limit = container["memory_limit"]
+        parts = [
+            f"{cpu_limit:.2f} CPU" if cpu_limit is not None else "no CPU limit",
+            format_bytes(memory_limit) if memory_limit is not None else "no memory limit",
+            f"throttled {container['throttled_percent']:.1f}%",
+        ]
+        pressure = container["pressure"]
+        if pressure:
+            parts.append("PSI " + " ".join(f"{resource} {average:.1f}"
+                                           for resource, average in pressure.items()))
+        return ", ".join(parts)
+    
+    def busiest_devices(self, devices, rate):
+        """Return up to `device_count` devices, busiest first when some are left out"""
+        count = self.config["device_count"]
+        if len(devices) <= count:
+            return devices
+        return heapq.nlargest(count, devices, key=rate)
+    
+    def draw_hosts(self, renderer, snapshot):
+        """Draw the aggregator's host table, one row per host"""
+        attrs = self.attrs
+        screen_height, screen_width = renderer.size
+        sort = self.config["host_sort"]
+        hosts = sorted(snapshot.get("hosts") or (), key=HOST_SORT_KEYS[sort],
+                       reverse=sort != "host")
+        
+        if renderer.needs_layout:
+            title = "Real-Time System Monitor (RTSM) - Hosts"
+            renderer.static(0, max(0, (screen_width - len(title)) // 2), title, attrs["title"])
+            header = (f"{'HOST':<24} {'CPU%':>6} {'MEM%':>6} {'MEM USED':>10} {'MEM TOTAL':>10}"
+                      f" {'GPU%':>6} {'AGE':>6} {'STATE':<8} OS")
+            renderer.static(2, 0, header[:screen_width - 1], attrs["label"])
+            renderer.static(screen_height - 1, 0,
+                            "Hosts: q quit, s sort, up/down scroll", attrs["help"])
+        
+        down = sum(1 for host in hosts if host[7] != "ok")
+        renderer.cell(1, 0, (f"{len(hosts)} hosts, {down} stale or offline, by {sort}", attrs["header"]))
+        
+        # Rows between the header and the clock line
+        rows = max(screen_height - 5, 0)
+        self.host_offset = max(0, min(self.host_offset, len(hosts) - rows))
+        for y, (name, cpu, mem_percent, used, total, gpu, age, state, os_name) in enumerate(
+                hosts[self.host_offset:self.host_offset + rows], 3):
+            gpu_text = f"{gpu:.1f}" if gpu is not None else "-"
+            row = (f"{name[:24]:<24} {cpu:>6.1f} {mem_percent:>6.1f} {format_bytes(used):>10}"
+                   f" {format_bytes(total):>10} {gpu_text:>6} {age:>5.0f}s {state:<8} {os_name}")
+            renderer.cell(y, 0, (row[:screen_width - 1],
+                                 attrs["value"] if state == "ok" else attrs["help"]))
+        
+        if self.config["show_clock"]:
+            clock_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            renderer.cell(screen_height - 2, max(0, screen_width - len(clock_str) - 1),
+                          (clock_str, attrs["title"]))
+    
+    def compile_layout(self, size, snapshot):
+        """Lay out the title, the shown panels and the status and help lines for a terminal size"""
+        attrs = self.attrs
+        height, width = size
+        # Keep panels clear of the instrumentation overlay rows
+        bottom = height - (4 if self.config["show_instrumentation"] else 1)
+        layout = compile_layout(self, self.visible_panels, size, bottom, snapshot)
+        
+        title = "Real-Time System Monitor (RTSM)"
+        layout.static(0, max(0, (width - len(title)) // 2), title, attrs["title"])
+        
+        # Warnings on the status line, left of the clock
+        status_width = max(layout.status_width, 0)
+        def status(snapshot):
+            text = self.status_text()
+            if not text:
+                return None
+            return ((text[:status_width], attrs["alert"] if text.startswith("ALERT") else attrs["help"]),)
+        layout.add(height - 2, 0, None, status)
+        
+        # The instrumentation overlay, if enabled
+        if self.config["show_instrumentation"] and height > 6:
+            layout.add(height - 4, 0, attrs["help"], self.instrumentation_text)
+            layout.add(height - 3, 0, attrs["help"], self.timings_text)
+        
+        help_text = ("Keys: q quit, c config, h history, p processes, s sort, "
+                     "k cores, d disks, n network, i instrumentation")
+        if self.replaying:
+            help_text = ("Replay: q quit, space pause, [ ] speed, "
+                         "left/right seek 1 min, up/down seek 1 h")
+        layout.static(height - 1, 0, help_text, attrs["help"])
+        return layout
+    
+    def draw_frame(self, renderer, snapshot):
+        """Queue one frame of the dashboard on the renderer"""
+        layout_key = self.layout_key(snapshot)
+        if layout_key != self._layout_key:
+            renderer.reset()
+            self._layout_key = layout_key
+            self._texts.clear()
+            if not self.aggregating:
+                # Work out where everything goes once, rather than on every frame
+                self._layout = self.compile_layout(renderer.size, snapshot)
+                self._layout.draw_static(renderer)
+        if self.aggregating:
+            self.draw_hosts(renderer, snapshot)
+            return
+        self.highlighted = self.alerts.highlighted() if self.alerts is not None else ()
+        self._layout.draw(renderer, snapshot)
+    
+    def clock_text(self, snapshot):
+        """Return the clock shown at the bottom right"""
+        if self.replaying and "time" in snapshot:
+            # Show the replay time and state instead of the wall clock
+            state = "paused" if self.sampler.paused else f"{self.sampler.speed:g}x"
+            return (datetime.fromtimestamp(snapshot["time"]).strftime("%Y-%m-%d %H:%M:%S")
+                    + f" [replay {state}]")
+        # Seconds would be stale between stretched refreshes
+        minutes = self.scheduler is not None and self.scheduler.scale > 1
+        now = time.time()
+        key = int(now) // 60 if minutes else int(now)
+        cached_key, cached_minutes, text = self._clock
+        if cached_key != key or cached_minutes != minutes:
+            text = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M" if minutes else "%Y-%m-%d %H:%M:%S")
+            self._clock = (key, minutes, text)
+        return text
+    
+    def frame_state(self, snapshot):
+        """Return what a frame shows that can change without a keypress"""
+        return snapshot, self.clock_text(snapshot), self.status_text()
+    
+    def read_focus_event(self, stdscr):
+        """Consume the rest of a focus report that started with ESC"""
+        stdscr.timeout(0)
+        sequence = (stdscr.getch(), stdscr.getch())
+        if sequence == (ord('['), ord('I')):
+            self.adaptive.set_focus(True)
+        elif sequence == (ord('['), ord('O')):
+            self.adaptive.set_focus(False)
+        return -1
+    
+    def handle_key(self, key):
+        """Handle a keypress; return True if the screen needs redrawing"""
+        if key == -1:
+            return False
+        if self.adaptive is not None:
+            self.adaptive.activity()
+        if key == ord('q'):
+            self.running = False
+        elif key == curses.KEY_RESIZE:
+            invalidate_system_info("Terminal Size")
+            self._layout_key = None
+        elif key == ord('c'):
+            # Toggle features
+            self.config["show_system_info"] = not self.config["show_system_info"]
+        elif key == ord('h'):
+            self.config["show_history"] = not self.config["show_history"]
+        elif key == ord('p'):
+            self.config["show_processes"] = not self.config["show_processes"]
+        elif self.aggregating and key in (curses.KEY_UP, curses.KEY_DOWN):
+            self.host_offset += 1 if key == curses.KEY_DOWN else -1
+        elif self.aggregating and key == ord('s'):
+            # Cycle the host table order
+            orders = list(HOST_SORT_KEYS)
+            self.config["host_sort"] = orders[(orders.index(self.config["host_sort"]) + 1) % len(orders)]
+        elif self.replaying and key in REPLAY_SEEK_KEYS:
+            self.sampler.seek(REPLAY_SEEK_KEYS[key])
+        elif self.replaying and key == ord(' '):
+            self.sampler.toggle_pause()
+        elif self.replaying and key in (ord('['), ord(']')):
+            self.sampler.set_speed(self.sampler.speed * (2 if key == ord(']') else 0.5))
+        elif key == ord('i'):
+            self.config["show_instrumentation"] = not self.config["show_instrumentation"]
+            self.sampler.timings = {} if self.config["show_instrumentation"] else None
+        elif key == ord('k'):
+            self.config["show_cores"] = not self.config["show_cores"]
+        elif key == ord('d'):
+            self.config["show_disks"] = not self.config["show_disks"]
+        elif key == ord('n'):
+            self.config["show_network"] = not self.config["show_network"]
+        elif key == ord('s'):
+            # Cycle the process sort order
+            orders = list(SORT_KEYS)
+            sort = orders[(orders.index(self.config["process_sort"]) + 1) % len(orders)]
+            self.config["process_sort"] = self.process_table.sort = sort
+        # Start or pause the collectors of panels the key showed or hid
+        self.update_panels()
+        return True
+    
+    def draw_instrumented_frame(self, renderer, snapshot):
+        """Draw and flush a frame, timing each step"""
+        clock = time.perf_counter_ns
+        instrumentation = self.instrumentation
+        start = clock()
+        self.draw_frame(renderer, snapshot)
+        drawn = clock()
+        # The renderer still needs a layout until the flush if this frame laid out
+        instrumentation.record("layout" if renderer.needs_layout else "draw", drawn - start)
+        renderer.flush()
+        instrumentation.record("refresh", clock() - drawn)
+        instrumentation.frame()
+    
+    def curses_main(self, stdscr):
+        """Main curses interface handler"""
+        # Setup curses
+        curses.curs_set(0)  # Hide cursor
+        self.setup_colors()
+        renderer = Renderer(stdscr)
+        self._layout_key = None
+        
+        # One deadline per panel, aligned just after the matching collector
+        scheduler = self.scheduler = Scheduler()
+        start = (self.sampler.started_at or time.monotonic()) + FRAME_PHASE
+        for panel, interval in self.intervals.items():
+            scheduler.add(panel, interval, start)
+        redraw = True
+        if self.adaptive is not None:
+            # Ask the terminal to report focus changes as ESC [ I and ESC [ O
+            self.set_focus_reporting(True)
         
         # Main loop
         while self.running:
             try:
-                # Clear screen
-                stdscr.clear()
-                
-                # Calculate dimensions and positions
-                screen_height, screen_width = stdscr.getmaxyx()
-                ascii_art = get_ascii_art(self.custom_ascii).splitlines()
-                ascii_height = len(ascii_art)
-                ascii_width = max(len(line) for line in ascii_art) if ascii_art else 0
+                # Lay out again when the terminal size changed
+                if stdscr.getmaxyx() != renderer.size:
+                    self._layout_key = None
+                    redraw = True
                 
-                # Display ASCII art if enabled
-                if self.config["show_ascii"]:
-                    stdscr.attron(curses.color_pair(4))
-                    for i, line in enumerate(ascii_art):
-                        if i < screen_height:
-                            stdscr.addstr(i, 0, line[:screen_width-1])
-                    stdscr.attroff(curses.color_pair(4))
+                # Lay out again when the config or art file was edited
+                if self.reload_files():
+                    self._layout_key = None
+                    redraw = True
                 
-                # Display title
-                title = "Real-Time System Monitor (RTSM)"
-                stdscr.attron(curses.color_pair(1) | curses.A_BOLD)
-                stdscr.addstr(0, max(0, (screen_width - len(title)) // 2), title[:screen_width-1])
-                stdscr.attroff(curses.color_pair(1) | curses.A_BOLD)
+                if scheduler.due() or redraw:
+                    snapshot = self.sampler.snapshot()
+                    state = self.frame_state(snapshot) if self.adaptive is not None else None
+                    if self.config["show_instrumentation"]:
+                        self.draw_instrumented_frame(renderer, snapshot)
+                    elif redraw or state is None or state != self._drawn:
+                        # In adaptive mode, frames showing nothing new are skipped
+                        self.draw_frame(renderer, snapshot)
+                        renderer.flush()
+                    self._drawn = state
+                    redraw = False
+                    if self.alerts is not None and self.alerts.take_bell():
+                        curses.beep()
+                    if self.first_frame_at is None:
+                        self.first_frame_at = time.perf_counter()
                 
-                # Starting position for system info
-                info_x = ascii_width + 2
-                info_y = 2
+                # Rescale once due panels have run, so intervals continue from them
+                if self.adaptive is not None:
+                    scale = self.adaptive.scale()
+                    if scale != scheduler.scale:
+                        self.sampler.set_scale(scale)
+                        scheduler.set_scale(scale, time.monotonic() + FRAME_PHASE)
                 
-                # Display system information if enabled
-                if self.config["show_system_info"]:
-                    system_info = get_system_info()
-                    
-                    stdscr.attron(curses.color_pair(2) | curses.A_BOLD)
-                    stdscr.addstr(info_y, info_x, "SYSTEM INFORMATION")
-                    stdscr.attroff(curses.color_pair(2) | curses.A_BOLD)
-                    info_y += 1
-                    
-                    for key, value in system_info.items():
-                        if info_y < screen_height - 1:
-                            stdscr.attron(curses.color_pair(2))
-                            stdscr.addstr(info_y, info_x, f"{key}: ")
-                            stdscr.attroff(curses.color_pair(2))
-                            
-                            stdscr.attron(curses.color_pair(3))
-                            stdscr.addstr(f"{value}"[:screen_width - info_x - len(key) - 3])
-                            stdscr.attroff(curses.color_pair(3))
-                            
-                            info_y += 1
-                
-                # Display resource information if enabled
-                if self.config["show_resources"]:
-                    resources = get_resource_usage(self.gpu_available)
-                    
-                    info_y += 1
-                    if info_y < screen_height - 1:
-                        stdscr.attron(curses.color_pair(2) | curses.A_BOLD)
-                        stdscr.addstr(info_y, info_x, "RESOURCE USAGE")
-                        stdscr.attroff(curses.color_pair(2) | curses.A_BOLD)
-                        info_y += 1
-                    
-                    # CPU
-                    if info_y < screen_height - 1:
-                        stdscr.attron(curses.color_pair(2))
-                        stdscr.addstr(info_y, info_x, f"CPU Usage: ")
-                        stdscr.attroff(curses.color_pair(2))
-                        
-                        stdscr.attron(curses.color_pair(3))
-                        stdscr.addstr(f"{resources['CPU Usage']:.1f}%")
-                        stdscr.attroff(curses.color_pair(3))
-                        
-                        # Draw progress bar
-                        bar_width = min(40, screen_width - info_x - 20)
-                        if bar_width > 5:
-                            self.draw_progress_bar(
-                                stdscr, info_y, info_x + 20, 
-                                bar_width, resources['CPU Usage'],
-                                5, 6
-                            )
-                        
-                        info_y += 1
-                    
-                    # Memory
-                    if info_y < screen_height - 1:
-                        mem = resources["Memory"]
-                        stdscr.attron(curses.color_pair(2))
-                        stdscr.addstr(info_y, info_x, f"Memory: ")
-                        stdscr.attroff(curses.color_pair(2))
-                        
-                        stdscr.attron(curses.color_pair(3))
-                        mem_text = f"{format_bytes(mem['used'])} / {format_bytes(mem['total'])} ({mem['percent']:.1f}%)"
-                        stdscr.addstr(mem_text[:screen_width - info_x - 8])
-                        stdscr.attroff(curses.color_pair(3))
-                        
-                        info_y += 1
-                        
-                        # Draw memory progress bar
-                        if info_y < screen_height - 1:
-                            bar_width = min(40, screen_width - info_x - 10)
-                            if bar_width > 5:
-                                self.draw_progress_bar(
-                                    stdscr, info_y, info_x + 10, 
-                                    bar_width, mem['percent'],
-                                    5, 6
-                                )
-                            info_y += 1
-                    
-                    # GPU (if available)
-                    if "GPU" in resources and info_y < screen_height - 3:
-                        gpu = resources["GPU"]
-                        info_y += 1
-                        
-                        stdscr.attron(curses.color_pair(2))
-                        stdscr.addstr(info_y, info_x, f"GPU: ")
-                        stdscr.attroff(curses.color_pair(2))
-                        
-                        stdscr.attron(curses.color_pair(3))
-                        stdscr.addstr(f"{gpu['name']}"[:screen_width - info_x - 6])
-                        stdscr.attroff(curses.color_pair(3))
-                        
-                        info_y += 1
-                        
-                        if info_y < screen_height - 1:
-                            stdscr.attron(curses.color_pair(2))
-                            stdscr.addstr(info_y, info_x, f"GPU Usage: ")
-                            stdscr.attroff(curses.color_pair(2))
-                            
-                            stdscr.attron(curses.color_pair(3))
-                            stdscr.addstr(f"{gpu['usage']:.1f}%")
-                            stdscr.attroff(curses.color_pair(3))
-                            
-                            # Draw GPU usage progress bar
-                            bar_width = min(40, screen_width - info_x - 20)
-                            if bar_width > 5:
-                                self.draw_progress_bar(
-                                    stdscr, info_y, info_x + 20, 
-                                    bar_width, gpu['usage'],
-                                    5, 6
-                                )
-                            
-                            info_y += 1
-                        
-                        if info_y < screen_height - 1:
-                            stdscr.attron(curses.color_pair(2))
-                            stdscr.addstr(info_y, info_x, f"GPU Memory: ")
-                            stdscr.attroff(curses.color_pair(2))
-                            
-                            stdscr.attron(curses.color_pair(3))
-                            vram_text = f"{gpu['memory']['used']:.1f} / {gpu['memory']['total']:.1f} MB ({gpu['memory']['percent']:.1f}%)"
-                            stdscr.addstr(vram_text[:screen_width - info_x - 12])
-                            stdscr.attroff(curses.color_pair(3))
-                            
-                            info_y += 1
-                
-                # Display clock if enabled
-                if self.config["show_clock"]:
-                    clock_y = screen_height - 2
-                    now = datetime.now()
-                    clock_str = now.strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    stdscr.attron(curses.color_pair(1) | curses.A_BOLD)
-                    stdscr.addstr(clock_y, max(0, screen_width - len(clock_str) - 1), clock_str)
-                    stdscr.attroff(curses.color_pair(1) | curses.A_BOLD)
-                
-                # Display help at the bottom
-                help_text = "Press 'q' to quit, 'c' for config"
-                stdscr.attron(curses.A_DIM)
-                stdscr.addstr(screen_height - 1, 0, help_text[:screen_width-1])
-                stdscr.attroff(curses.A_DIM)
-                
-                # Refresh the screen
-                stdscr.refresh()
-                
-                # Handle input (non-blocking)
-                stdscr.nodelay(True)
+                # Wait for input until the next panel is due
+                stdscr.timeout(math.ceil(scheduler.timeout() * 1000))
                 key = stdscr.getch()
-                
-                if key == ord('q'):
-                    self.running = False
-                elif key == ord('c'):
-                    # Toggle features
-                    self.config["show_system_info"] = not self.config["show_system_info"]
-                
-                # Sleep for refresh rate
-                time.sleep(self.refresh_rate)
+                if key == 27 and self.adaptive is not None:
+                    key = self.read_focus_event(stdscr)
+                redraw = self.handle_key(key)
                 
             except KeyboardInterrupt:
                 self.running = False
             except curses.error:
-                # Terminal size might have changed, just continue
-                pass
+                # Terminal size might have changed, lay out again
+                self._layout_key = None
+                redraw = True
+        
+        if self.adaptive is not None:
+            self.set_focus_reporting(False)
+    
+    def set_focus_reporting(self, enabled):
+        """Switch the terminal's focus reports on or off"""
+        try:
+            os.write(sys.stdout.fileno(), b"\033[?1004h" if enabled else b"\033[?1004l")
+        except OSError:
+            pass
     
     def run(self):
         """Run the monitor"""
-        curses.wrapper(self.curses_main)
\ No newline at end of file
+        if self.source_kind == "live":
+            self.collecting = True
+            self.start_gpu_polling()
+        self.sampler.start()
+        try:
+            curses.wrapper(self.curses_main)
+        finally:
+            self.sampler.stop()
+            if self.gpu_collector is not None:
+                self.gpu_collector.stop()
+            if self.alerts is not None:
+                self.alerts.close()
+    
+    def publish(self, publisher):
+        """
+        Collect for the viewers of the snapshot bus instead of drawing, until interrupted
+
+        Every panel is collected whatever the config shows, since each
+        viewer shows its own, and alerts are left to the viewers.
+        """
+        self.publishing = self.collecting = True
+        for key in ("show_processes", "show_cores", "show_disks", "show_network"):
+            self.config[key] = True
+        self.set_alerts(None)
+        self.update_panels()
+        # Viewers attach once a complete snapshot is published
+        self.sampler.sample_once()
+        publisher.publish(self.sampler.snapshot(), {})
+        publisher.attach(self.sampler)
+        self.sampler.start()
+        try:
+            while True:
+                time.sleep(HEARTBEAT)
+                publisher.heartbeat()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.sampler.stop()
+            if self.gpu_collector is not None:
+                self.gpu_collector.stop()
+            publisher.close()
\ No newline at end of file
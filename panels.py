@@ -0,0 +1,603 @@
+"""
+Real-Time System Monitor (RTSM) - Panels Module
+
+This file contains the dashboard's panels and the layout engine. The
+"layout" config list names the panels in the order they are stacked.
+Once per terminal size (and whenever what a panel shows changes shape,
+such as a GPU appearing), each shown panel lays itself out into static
+text and a flat draw list of (y, x, attr, produce) operations. A frame
+is then a loop calling each producer with the snapshot, with no
+geometry worked out.
+
+Third-party panels subclass Panel, register with register_panel and are
+loaded from the modules listed in the "plugins" config list.
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+from utils import format_percent
+from system_info import get_system_field, get_uptime
+
+# System information fields that belong to the session of the process
+SESSION_FIELDS = ("Shell", "Terminal Size")
+
+# Columns of the clock, and of the replay state shown after it
+CLOCK_WIDTH = len("2026-01-01 00:00:00")
+REPLAY_STATE_WIDTH = len(" [replay paused]")
+
+# Panels by name; see register_panel
+PANELS = {}
+
+
+class Layout:
+    """
+    Static text and draw operations of the dashboard at one terminal size
+
+    Panels are stacked in a column starting at `x`: each one adds its
+    rows at `y` and moves `y` past them. room() is the number of rows
+    left above the status and help lines.
+    """
+
+    def __init__(self, size, bottom, attrs):
+        """
+        Args:
+            size: Terminal (height, width)
+            bottom: First row the column must leave free
+            attrs: Curses attributes by name, see setup_colors
+        """
+        self.height, self.width = size
+        self.bottom = bottom
+        self.attrs = attrs
+        self.x = 2
+        self.y = 2
+        # Columns of the status line left of the clock
+        self.status_width = self.width
+        self.statics = []
+        self.ops = []
+
+    def room(self):
+        """Return the rows left in the column"""
+        return self.bottom - self.y
+
+    def static(self, y, x, text, attr):
+        """Add text drawn once per layout"""
+        self.statics.append((y, x, text, attr))
+
+    def add(self, y, x, attr, produce):
+        """
+        Draw produce(snapshot) at (y, x) on every frame
+
+        The producer returns the text, drawn in `attr`, or None to leave
+        the cell blank; with `attr` None it returns (text, attr) segments.
+        """
+        self.ops.append((y, x, attr, produce))
+
+    def field(self, y, x, label, attr, produce):
+        """Add a static label followed by a value drawn on every frame"""
+        self.static(y, x, label, self.attrs["label"])
+        self.add(y, x + len(label), attr, produce)
+
+    def draw_static(self, renderer):
+        """Draw the static text on a freshly reset renderer"""
+        for y, x, text, attr in self.statics:
+            renderer.static(y, x, text, attr)
+
+    def draw(self, renderer, snapshot):
+        """Queue one frame's cells on the renderer"""
+        cell = renderer.cell
+        for y, x, attr, produce in self.ops:
+            value = produce(snapshot)
+            if value is None:
+                continue
+            if attr is None:
+                cell(y, x, *value)
+            else:
+                cell(y, x, (value, attr))
+
+
+class Panel:
+    """
+    One panel of the dashboard
+
+    Subclasses set `name` and implement layout(). `collectors` are the
+    sampler collectors the panel reads; they are paused while no shown
+    panel, alert rule or export reads them. A panel with a collect()
+    method gets a collector of its own, named after the panel and run
+    every `interval` seconds (or as set under "intervals"), and finds its
+    samples in the snapshot under its name.
+
+    `toggle` is the config key hiding the panel while false, and `group`
+    a header shared by neighbouring panels of the same group. Panels
+    with `column` false are placed on their own instead of stacked, and
+    are laid out before the column.
+    """
+
+    name = None
+    collectors = ()
+    toggle = None
+    group = None
+    column = True
+    collect = None
+    interval = 2.0
+
+    def sources(self):
+        """Return the names of the collectors the panel reads"""
+        if self.collect is not None:
+            return tuple(self.collectors) + (self.name,)
+        return tuple(self.collectors)
+
+    def shown(self, config):
+        """Return whether the config shows the panel"""
+        return self.toggle is None or bool(config.get(self.toggle, True))
+
+    def ready(self, monitor, snapshot):
+        """Return whether the snapshot holds anything for the panel to show"""
+        return self.collect is None or snapshot.get(self.name) is not None
+
+    def layout_key(self, monitor, snapshot):
+        """Return what the panel's layout depends on in the snapshot"""
+        return self.ready(monitor, snapshot)
+
+    def layout(self, monitor, layout, snapshot):
+        """Add the panel's static text and draw operations to `layout`"""
+        raise NotImplementedError
+
+
+def register_panel(cls):
+    """
+    Class decorator adding a panel to PANELS under its name
+
+    A panel registered under the name of another replaces it.
+    """
+    PANELS[cls.name] = cls()
+    return cls
+
+
+def load_plugins(modules):
+    """
+    Import the modules that register third-party panels
+
+    Args:
+        modules: Module names, or paths of .py files
+
+    Returns:
+        list: Error messages for the modules that could not be loaded
+    """
+    errors = []
+    for module in modules:
+        try:
+            if module.endswith(".py"):
+                name = os.path.splitext(os.path.basename(module))[0]
+                spec = importlib.util.spec_from_file_location(f"rtsm_plugin_{name}", module)
+                plugin = sys.modules[spec.name] = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(plugin)
+            else:
+                importlib.import_module(module)
+        except Exception as e:
+            errors.append(f"cannot load panel plugin '{module}': {e}")
+    return errors
+
+
+def resolve_layout(names):
+    """
+    Look up the panels a layout names
+
+    Returns:
+        tuple: (tuple of Panels in layout order, list of error messages
+            for unknown names)
+    """
+    panels = []
+    errors = []
+    for name in names:
+        panel = PANELS.get(name)
+        if panel is None:
+            errors.append(f"unknown panel '{name}' in layout")
+        elif panel not in panels:
+            panels.append(panel)
+    return tuple(panels), errors
+
+
+def compile_layout(monitor, panels, size, bottom, snapshot):
+    """
+    Lay out `panels` for a terminal size
+
+    Args:
+        monitor: The RealTimeSystemMonitor drawing the panels
+        panels: Shown panels in layout order
+        size: Terminal (height, width)
+        bottom: First row the column must leave free
+        snapshot: Snapshot whose shape the layout follows
+
+    Returns:
+        Layout
+    """
+    layout = Layout(size, bottom, monitor.attrs)
+    for panel in panels:
+        if not panel.column and panel.ready(monitor, snapshot):
+            panel.layout(monitor, layout, snapshot)
+    group = None
+    for panel in panels:
+        if not panel.column or not panel.ready(monitor, snapshot):
+            continue
+        if panel.group != group:
+            group = panel.group
+            if group is not None:
+                layout.y += 1
+                if layout.room() > 0:
+                    layout.static(layout.y, layout.x, group, layout.attrs["header"])
+                layout.y += 1
+        panel.layout(monitor, layout, snapshot)
+    return layout
+
+
+def add_bar(monitor, layout, y, x, source, percent):
+    """Add a progress bar of percent(snapshot), in the alert color while `source` alerts"""
+    width = min(40, layout.width - x)
+    if width <= 5:
+        return
+    empty_attr = layout.attrs["bar_empty"]
+    layout.add(y, x, None, lambda snapshot: monitor.progress_bar(
+        width, percent(snapshot), monitor.alert_attrs(source)[1], empty_attr))
+
+
+def add_history(monitor, layout, bar_x, metric):
+    """Add the sparkline row of a metric while history is shown"""
+    if not monitor.config["show_history"] or layout.room() <= 0:
+        return
+    layout.static(layout.y, layout.x, "History: ", layout.attrs["label"])
+    width = min(40, layout.width - bar_x)
+    if width > 5:
+        layout.add(layout.y, bar_x, None, lambda snapshot: monitor.history_segments(metric, width))
+    layout.y += 1
+
+
+@register_panel
+class AsciiArtPanel(Panel):
+    """The ASCII art, left of the column"""
+
+    name = "ascii"
+    toggle = "show_ascii"
+    column = False
+
+    def layout(self, monitor, layout, snapshot):
+        art = monitor.art
+        for i, line in enumerate(art.clipped(layout.width, layout.bottom + 1)):
+            layout.static(i, 0, line, layout.attrs["ascii"])
+        layout.x = max(layout.x, art.width + 2)
+
+
+@register_panel
+class SystemInfoPanel(Panel):
+    """OS, host and session details"""
+
+    name = "system_info"
+    collectors = ("system_info",)
+    toggle = "show_system_info"
+
+    def ready(self, monitor, snapshot):
+        return bool(snapshot.get("system_info"))
+
+    def layout_key(self, monitor, snapshot):
+        return tuple(snapshot.get("system_info") or ())
+
+    def layout(self, monitor, layout, snapshot):
+        layout.static(layout.y, layout.x, "SYSTEM INFORMATION", layout.attrs["header"])
+        layout.y += 1
+        for key in snapshot["system_info"]:
+            if layout.room() <= 0:
+                break
+            layout.field(layout.y, layout.x, f"{key}: ", layout.attrs["value"],
+                         self.value(monitor, key))
+            layout.y += 1
+
+    @staticmethod
+    def value(monitor, key):
+        """Return the producer of one field"""
+        if key == "Uptime" and not monitor.replaying:
+            # Derived from the boot time, so it can tick with the clock
+            return lambda snapshot: get_uptime()
+        if key == "Terminal Size" and not monitor.replaying:
+            # Read on every frame, so a resize shows at once rather than
+            # with the next system information sample
+            return lambda snapshot: get_system_field(key)
+        if key in SESSION_FIELDS and monitor.source_kind == "bus":
+            # The publisher's own session is not the viewer's
+            return lambda snapshot: get_system_field(key)
+        return lambda snapshot: str(snapshot["system_info"][key])
+
+
+class ResourcePanel(Panel):
+    """A panel of the resource usage group"""
+
+    toggle = "show_resources"
+    group = "RESOURCE USAGE"
+    # Key of the panel's reading in the resource dictionary
+    resource = None
+
+    def ready(self, monitor, snapshot):
+        return self.resource in monitor.resources_from_snapshot(snapshot)
+
+
+@register_panel
+class CpuPanel(ResourcePanel):
+    """Total CPU usage"""
+
+    name = "cpu"
+    collectors = ("cpu",)
+    resource = "CPU Usage"
+
+    def layout(self, monitor, layout, snapshot):
+        if layout.room() <= 0:
+            return
+        resources = monitor.resources_from_snapshot
+        y, x = layout.y, layout.x
+        layout.field(y, x, "CPU Usage: ", None, lambda snapshot: (
+            (format_percent(resources(snapshot)["CPU Usage"]), monitor.alert_attrs("cpu")[0]),))
+        add_bar(monitor, layout, y, x + 20, "cpu", lambda snapshot: resources(snapshot)["CPU Usage"])
+        layout.y += 1
+        add_history(monitor, layout, x + 20, "cpu")
+
+
+@register_panel
+class MemoryPanel(ResourcePanel):
+    """Memory usage"""
+
+    name = "memory"
+    collectors = ("memory",)
+    resource = "Memory"
+
+    def layout(self, monitor, layout, snapshot):
+        if layout.room() <= 0:
+            return
+        resources = monitor.resources_from_snapshot
+        x = layout.x
+        layout.field(layout.y, x, "Memory: ", None, lambda snapshot: (
+            (monitor.cached_text("memory", resources(snapshot)["Memory"], monitor.memory_text),
+             monitor.alert_attrs("memory")[0]),))
+        layout.y += 1
+        if layout.room() > 0:
+            add_bar(monitor, layout, layout.y, x + 10, "memory",
+                    lambda snapshot: resources(snapshot)["Memory"]["percent"])
+            layout.y += 1
+        add_history(monitor, layout, x + 10, "memory")
+
+
+@register_panel
+class ContainerPanel(ResourcePanel):
+    """Limits, throttling and pressure of the cgroup backend"""
+
+    name = "container"
+    collectors = ("container",)
+    resource = "Container"
+
+    def layout(self, monitor, layout, snapshot):
+        if layout.room() <= 0:
+            return
+        resources = monitor.resources_from_snapshot
+        layout.field(layout.y, layout.x, "Container: ", layout.attrs["value"], lambda snapshot: (
+            monitor.cached_text("container", resources(snapshot)["Container"], monitor.container_text)))
+        layout.y += 1
+
+
+@register_panel
+class GpuPanel(ResourcePanel):
+    """Usage and memory of each GPU"""
+
+    name = "gpu"
+    collectors = ("gpu",)
+
+    def ready(self, monitor, snapshot):
+        resources = monitor.resources_from_snapshot(snapshot)
+        return "GPUs" in resources or "GPU Error" in resources
+
+    def layout_key(self, monitor, snapshot):
+        resources = monitor.resources_from_snapshot(snapshot)
+        return len(resources.get("GPUs", ())), "GPU Error" in resources
+
+    def layout(self, monitor, layout, snapshot):
+        resources = monitor.resources_from_snapshot(snapshot)
+        for position, gpu in enumerate(resources.get("GPUs", ())):
+            if layout.room() <= 2:
+                break
+            layout.y += 1
+            self.layout_gpu(monitor, layout, position, gpu["index"])
+
+        if "GPUs" not in resources and layout.room() > 1:
+            layout.y += 1
+            layout.field(layout.y, layout.x, "GPU: ", layout.attrs["value"], lambda snapshot: (
+                monitor.cached_text("gpu_error", monitor.resources_from_snapshot(snapshot)["GPU Error"],
+                                    "unavailable ({})".format)))
+            layout.y += 1
+
+    def layout_gpu(self, monitor, layout, position, index):
+        """Lay out the rows of the GPU at `position` in the readings"""
+        resources = monitor.resources_from_snapshot
+        x = layout.x
+
+        def name(snapshot):
+            readings = resources(snapshot)
+            gpu_name = readings["GPUs"][position]["name"]
+            if readings["GPU Age"] > monitor.gpu_interval * 3:
+                gpu_name += f" (stale {readings['GPU Age']:.0f}s)"
+            return gpu_name
+
+        def reading(snapshot):
+            return resources(snapshot)["GPUs"][position]
+
+        layout.field(layout.y, x, f"GPU {index}: ", layout.attrs["value"], name)
+        layout.y += 1
+
+        if layout.room() > 0:
+            layout.field(layout.y, x, "GPU Usage: ", None, lambda snapshot: (
+                (format_percent(reading(snapshot)["usage"]), monitor.alert_attrs("gpu")[0]),))
+            add_bar(monitor, layout, layout.y, x + 20, "gpu",
+                    lambda snapshot: reading(snapshot)["usage"])
+            layout.y += 1
+
+        add_history(monitor, layout, x + 20, f"gpu{index}")
+
+        if layout.room() > 0:
+            layout.field(layout.y, x, "GPU Memory: ", layout.attrs["value"], lambda snapshot: (
+                monitor.cached_text(index, reading(snapshot)["memory"], monitor.vram_text)))
+            layout.y += 1
+
+
+@register_panel
+class CoresPanel(Panel):
+    """One glyph per core, wrapped to the screen width"""
+
+    name = "cores"
+    collectors = ("cores",)
+    toggle = "show_cores"
+
+    def ready(self, monitor, snapshot):
+        return bool(snapshot.get("cores"))
+
+    def layout_key(self, monitor, snapshot):
+        return len(snapshot.get("cores") or ())
+
+    def layout(self, monitor, layout, snapshot):
+        if layout.room() <= 2:
+            return
+        layout.y += 1
+        layout.field(layout.y, layout.x, "Cores: ", layout.attrs["value"], lambda snapshot: (
+            monitor.cached_text("cores", snapshot["cores"], monitor.cores_text)[0]))
+        layout.y += 1
+
+        per_row = max(8, min(64, layout.width - layout.x - 2))
+
+        def split(cores):
+            glyphs = monitor.cached_text("cores", cores, monitor.cores_text)[1]
+            return [glyphs[start:start + per_row] for start in range(0, len(glyphs), per_row)]
+
+        for row in range(-(-len(snapshot["cores"]) // per_row)):
+            if layout.room() <= 0:
+                break
+            layout.add(layout.y, layout.x + 2, layout.attrs["bar_filled"],
+                       lambda snapshot, row=row: monitor.cached_text("core_rows", snapshot["cores"], split)[row])
+            layout.y += 1
+
+
+class DevicePanel(Panel):
+    """Rates of the busiest devices, one row each"""
+
+    title = None
+
+    def ready(self, monitor, snapshot):
+        return bool(snapshot.get(self.name))
+
+    def layout_key(self, monitor, snapshot):
+        return len(snapshot.get(self.name) or ())
+
+    def rows(self, monitor):
+        """Return the function formatting the panel's rows"""
+        raise NotImplementedError
+
+    def layout(self, monitor, layout, snapshot):
+        if layout.room() <= 2:
+            return
+        layout.y += 1
+        layout.static(layout.y, layout.x, self.title, layout.attrs["header"])
+        layout.y += 1
+        name = self.name
+        rows = self.rows(monitor)
+        for rank in range(min(len(snapshot[name]), monitor.config["device_count"])):
+            if layout.room() <= 1:
+                break
+            layout.add(layout.y, layout.x, layout.attrs["value"],
+                       lambda snapshot, rank=rank: monitor.cached_text(name, snapshot[name], rows)[rank])
+            layout.y += 1
+
+
+@register_panel
+class DisksPanel(DevicePanel):
+    """Disk throughput and IOPS"""
+
+    name = "disks"
+    collectors = ("disks",)
+    toggle = "show_disks"
+    title = "DISK I/O"
+
+    def rows(self, monitor):
+        return monitor.disk_rows
+
+
+@register_panel
+class NetworkPanel(DevicePanel):
+    """Network throughput"""
+
+    name = "network"
+    collectors = ("network",)
+    toggle = "show_network"
+    title = "NETWORK"
+
+    def rows(self, monitor):
+        return monitor.network_rows
+
+
+@register_panel
+class ProcessesPanel(Panel):
+    """The top processes in the configured order"""
+
+    name = "processes"
+    collectors = ("processes",)
+    toggle = "show_processes"
+
+    def layout_key(self, monitor, snapshot):
+        return monitor.config["process_sort"]
+
+    def layout(self, monitor, layout, snapshot):
+        if layout.room() <= 3:
+            return
+        sort = monitor.config["process_sort"]
+        layout.y += 1
+        layout.static(layout.y, layout.x, f"TOP PROCESSES (by {sort})", layout.attrs["header"])
+        header = f"{'PID':>7} {'NAME':<16} {'CPU%':>6} {'RSS':>10} {'IO/s':>10}"
+        layout.static(layout.y + 1, layout.x, header, layout.attrs["label"])
+        layout.y += 2
+
+        def rows(snapshot):
+            processes = snapshot.get("processes")
+            if isinstance(processes, dict):
+                # The snapshot bus publishes the top processes in every order
+                processes = processes.get(sort)
+            return monitor.cached_text("processes", processes, monitor.process_rows) if processes else ()
+
+        def row(rank):
+            def produce(snapshot):
+                ranked = rows(snapshot)
+                return ranked[rank] if rank < len(ranked) else None
+            return produce
+
+        for rank in range(monitor.config["process_count"]):
+            if layout.room() <= 1:
+                break
+            layout.add(layout.y, layout.x, layout.attrs["value"], row(rank))
+            layout.y += 1
+
+
+@register_panel
+class ClockPanel(Panel):
+    """The clock, or the replay time and state, at the bottom right"""
+
+    name = "clock"
+    toggle = "show_clock"
+    column = False
+
+    def layout(self, monitor, layout, snapshot):
+        width = CLOCK_WIDTH + (REPLAY_STATE_WIDTH if monitor.replaying else 0)
+        layout.status_width -= width + 2
+        # Right-aligned in a fixed width, so shorter texts such as the
+        # minutes-only clock keep the same position
+        text = padded = None
+
+        def produce(snapshot):
+            nonlocal text, padded
+            current = monitor.clock_text(snapshot)
+            if current is not text:
+                text, padded = current, current.rjust(width)
+            return padded
+
+        layout.add(layout.height - 2, max(0, layout.width - width - 1), layout.attrs["title"], produce)
@@ -0,0 +1,123 @@
+"""
+Real-Time System Monitor (RTSM) - Processes Module
+
+This file contains the per-process table used by the top-N process
+panel and the headless export.
+"""
+
+import heapq
+import time
+import psutil
+
+# What each sort order ranks processes by
+SORT_KEYS = {
+    "cpu": lambda entry: entry.cpu_percent,
+    "rss": lambda entry: entry.rss,
+    "io": lambda entry: entry.io_rate,
+}
+
+
+class ProcessEntry:
+    """Cached state of one process between refreshes"""
+
+    __slots__ = ("pid", "name", "cpu_percent", "rss", "io_rate",
+                 "cpu_time", "io_bytes", "sampled_at", "generation")
+
+    def __init__(self, pid, name):
+        self.pid = pid
+        self.name = name
+        self.cpu_percent = 0.0
+        self.rss = 0
+        self.io_rate = 0.0
+        self.cpu_time = None
+        self.io_bytes = None
+        self.sampled_at = None
+        self.generation = 0
+
+
+class ProcessTable:
+    """
+    Track every process incrementally and report the top N
+
+    psutil.process_iter reuses its Process objects between calls, and
+    this table keeps one entry per (pid, create_time) with the counters
+    from the previous refresh. CPU and I/O rates are deltas between two
+    refreshes, so nothing blocks. Names are read only for new processes
+    and entries of exited processes are dropped.
+    """
+
+    ATTRS = ["cpu_times", "memory_info", "io_counters"]
+
+    def __init__(self, count=5, sort="cpu", clock=time.monotonic):
+        """
+        Args:
+            count: Number of processes `refresh` returns
+            sort: Key ranking the processes: "cpu", "rss" or "io"
+            clock: Monotonic clock used for rates
+        """
+        self.count = count
+        self.sort = sort
+        self._clock = clock
+        self._entries = {}
+        self._generation = 0
+
+    def __len__(self):
+        """Return the number of processes tracked"""
+        return len(self._entries)
+
+    def update(self):
+        """Sample every process once, updating rates from the previous sample"""
+        self._generation += 1
+        generation = self._generation
+        entries = self._entries
+        now = self._clock()
+
+        for proc in psutil.process_iter(self.ATTRS, ad_value=None):
+            try:
+                key = (proc.pid, proc.create_time())
+                entry = entries.get(key)
+                if entry is None:
+                    entry = entries[key] = ProcessEntry(proc.pid, proc.name())
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+
+            info = proc.info
+            cpu_times = info["cpu_times"]
+            memory_info = info["memory_info"]
+            io_counters = info["io_counters"]
+            cpu_time = cpu_times.user + cpu_times.system if cpu_times else None
+            io_bytes = io_counters.read_bytes + io_counters.write_bytes if io_counters else None
+
+            if entry.sampled_at is not None and now > entry.sampled_at:
+                elapsed = now - entry.sampled_at
+                if cpu_time is not None and entry.cpu_time is not None:
+                    entry.cpu_percent = (cpu_time - entry.cpu_time) / elapsed * 100
+                if io_bytes is not None and entry.io_bytes is not None:
+                    entry.io_rate = (io_bytes - entry.io_bytes) / elapsed
+            entry.cpu_time = cpu_time
+            entry.io_bytes = io_bytes
+            entry.rss = memory_info.rss if memory_info else 0
+            entry.sampled_at = now
+            entry.generation = generation
+
+        # Drop processes that exited since the previous refresh
+        for key in [key for key, entry in entries.items() if entry.generation != generation]:
+            del entries[key]
+
+    def top(self, count=None, sort=None):
+        """
+        Return the top processes without sorting the whole table
+
+        Returns:
+            list: (pid, name, cpu percent, rss bytes, io bytes/s) tuples
+        """
+        key = SORT_KEYS[sort or self.sort]
+        return [
+            (entry.pid, entry.name, entry.cpu_percent, entry.rss, entry.io_rate)
+            for entry in heapq.nlargest(count or self.count, self._entries.values(), key=key)
+        ]
+
+    def refresh(self):
+        """Update the table and return the current top processes"""
+        self.update()
+        return self.top()
@@ -0,0 +1,119 @@
+"""
+Real-Time System Monitor (RTSM) - Procfs Module
+
+This file contains the Linux-native collector backend, which reads CPU
+and memory usage straight from /proc instead of going through psutil.
+"""
+
+import os
+
+# Largest read of a /proc file; only the start of each file is parsed
+BUFFER_SIZE = 8192
+
+
+class ProcFile:
+    """
+    A /proc file kept open and re-read into a reused buffer
+
+    The file descriptor stays open for the lifetime of the reader, so each
+    sample costs one pread instead of an open, read and close.
+    """
+
+    def __init__(self, path, size=BUFFER_SIZE):
+        """Open `path` and allocate its read buffer"""
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buffer = bytearray(size)
+
+    def read(self):
+        """Re-read the file from offset 0 and return the number of bytes read"""
+        return os.preadv(self.fd, [self.buffer], 0)
+
+    def close(self):
+        """Close the file descriptor"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class ProcReader:
+    """
+    Read CPU and memory usage from /proc with open file descriptors
+
+    Only the aggregate `cpu` line of /proc/stat and the MemTotal and
+    MemAvailable lines of /proc/meminfo are parsed. Results match what
+    psutil.cpu_percent(interval=None) and psutil.virtual_memory() report.
+    """
+
+    def __init__(self, root="/proc"):
+        """
+        Args:
+            root: Mount point of procfs
+        """
+        self._stat = ProcFile(os.path.join(root, "stat"))
+        self._meminfo = ProcFile(os.path.join(root, "meminfo"))
+        self._last_cpu = self._cpu_times()
+        # Fail now rather than on the first sample if a field is missing
+        self.memory_usage()
+
+    def _cpu_times(self):
+        """Return (busy, total) jiffies from the aggregate cpu line"""
+        stat = self._stat
+        length = stat.read()
+        buffer = stat.buffer
+        end = buffer.find(b"\n", 0, length)
+        # "cpu  user nice system idle iowait irq softirq steal guest guest_nice";
+        # guest time is already counted in user and nice
+        fields = buffer[4:end].split()
+        times = [int(field) for field in fields[:8]]
+        total = sum(times)
+        return total - times[3] - times[4], total
+
+    def cpu_percent(self):
+        """Return CPU usage since the previous call without blocking"""
+        busy, total = self._cpu_times()
+        last_busy, last_total = self._last_cpu
+        self._last_cpu = (busy, total)
+        if total <= last_total:
+            return 0.0
+        percent = (busy - last_busy) / (total - last_total) * 100
+        return round(min(max(percent, 0.0), 100.0), 1)
+
+    def _meminfo_field(self, name, length):
+        """Return a /proc/meminfo field in bytes"""
+        buffer = self._meminfo.buffer
+        start = buffer.find(name, 0, length)
+        if start < 0:
+            raise KeyError(name.decode())
+        end = buffer.find(b"\n", start, length)
+        # "MemTotal:       16303408 kB"
+        return int(buffer[start + len(name):end].split()[0]) * 1024
+
+    def memory_usage(self):
+        """Return virtual memory usage as total, used and percent"""
+        length = self._meminfo.read()
+        total = self._meminfo_field(b"MemTotal:", length)
+        available = self._meminfo_field(b"MemAvailable:", length)
+        if available > total:
+            # Containers may report host values; psutil reports free instead
+            available = self._meminfo_field(b"MemFree:", length)
+        used = total - available
+        return {
+            "total": total,
+            "used": used,
+            "percent": round(used / total * 100, 1) if total else 0.0
+        }
+
+    def close(self):
+        """Close the /proc file descriptors"""
+        self._stat.close()
+        self._meminfo.close()
+
+
+def open_proc_reader(root="/proc"):
+    """Return a ProcReader, or None where /proc cannot be used"""
+    try:
+        return ProcReader(root)
+    except (OSError, AttributeError, ValueError, IndexError, KeyError):
+        # No procfs, no os.preadv or an unexpected file format
+        return None
\ No newline at end of file
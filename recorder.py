@@ -0,0 +1,443 @@
+"""
+Real-Time System Monitor (RTSM) - Recorder Module
+
+This file contains the compact binary sample recorder and the
+memory-mapped replay source that drives the dashboard or the headless
+exporters from a recording.
+
+A recording starts with the magic bytes "RTSM", a format version and the
+length of a JSON header holding the static system information, the GPU
+names and the struct format of one record. Fixed-width records follow,
+so record `i` is found by offset alone.
+"""
+
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from types import MappingProxyType
+from gpu import make_gpu_reading
+from sampler import notify_listeners
+from system_info import format_uptime
+
+MAGIC = b"RTSM"
+VERSION = 1
+# Magic, version and header length
+PREAMBLE = struct.Struct("<4sHI")
+# Timestamp, uptime, CPU percent, memory used, memory total, memory percent
+BASE_FORMAT = "<dIfQQf"
+# Usage percent, memory used and memory total (MB) of each GPU; NaN in a
+# record taken before the GPUs first reported
+GPU_FORMAT = "fff"
+BASE_SIZE = struct.calcsize(BASE_FORMAT)
+GPU_SIZE = struct.calcsize("<" + GPU_FORMAT)
+# Seconds a new recording waits for the first GPU readings
+SETTLE = 10.0
+
+
+def record_format(gpu_count):
+    """Return the struct format of one record with `gpu_count` GPUs"""
+    return BASE_FORMAT + GPU_FORMAT * gpu_count
+
+
+def record_header(snapshot):
+    """Return the recording header a Snapshot is written under"""
+    gpus = snapshot.resources.get("GPUs", ())
+    return {
+        "static": snapshot.static,
+        "gpus": [gpu["name"] for gpu in gpus],
+        "record": record_format(len(gpus)),
+    }
+
+
+def pack_record(layout, snapshot):
+    """Pack a Snapshot into one record, with NaN for GPUs it has no readings of"""
+    resources = snapshot.resources
+    mem = resources["Memory"]
+    values = [
+        snapshot.timestamp, int(snapshot.uptime_seconds or 0), resources["CPU Usage"],
+        mem["used"], mem["total"], mem["percent"]
+    ]
+    gpus = resources.get("GPUs", ())
+    for gpu in gpus:
+        values += [gpu["usage"], gpu["memory"]["used"], gpu["memory"]["total"]]
+    missing = (layout.size - BASE_SIZE) // GPU_SIZE - len(gpus)
+    if missing > 0:
+        values += [math.nan] * (3 * missing)
+    return layout.pack(*values)
+
+
+class Recorder:
+    """
+    Append snapshots to a recording file
+
+    The file is fsynced every `fsync_interval` seconds and rotated like
+    logging.handlers.RotatingFileHandler once it would grow past
+    `max_bytes`: FILE becomes FILE.1, FILE.1 becomes FILE.2 and so on up
+    to `backups` old files. A new file is also started when the static
+    fields or the number of GPUs change, since records are fixed-width.
+
+    GPUs are probed in the background, so the first samples usually come
+    without them. Until a sample has GPU readings or a GPU error, or for
+    at most `settle` seconds, samples are held in memory instead, and
+    then written under the final header with NaN for the GPUs.
+    """
+
+    def __init__(self, path, fsync_interval=10.0, max_bytes=64 << 20, backups=5,
+                 settle=SETTLE, clock=time.monotonic):
+        """
+        Args:
+            path: Recording file to append to
+            fsync_interval: Seconds between fsyncs
+            max_bytes: Size at which the file is rotated, or 0 to never rotate
+            backups: Number of rotated files kept
+            settle: Seconds to hold samples back waiting for the GPUs
+            clock: Monotonic clock used to schedule fsyncs
+        """
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.settle = settle
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._file = None
+        self._header = None
+        self._layout = None
+        self._size = 0
+        self._pending = []
+        self._settled = False
+        self._synced_at = self._started_at = clock()
+
+    def _open(self, header):
+        """Open the file for appending, starting a new one if it does not match"""
+        text = json.dumps(header).encode("utf-8")
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as f:
+                    magic, version, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+                    matches = (magic == MAGIC and version == VERSION
+                               and f.read(length) == text)
+            except (OSError, struct.error):
+                matches = False
+            if not matches:
+                self._rotate()
+
+        self._layout = struct.Struct(header["record"])
+        self._file = open(self.path, "ab")
+        start = PREAMBLE.size + len(text)
+        size = self._file.seek(0, os.SEEK_END)
+        if size == 0:
+            self._file.write(PREAMBLE.pack(MAGIC, VERSION, len(text)) + text)
+            size = start
+        else:
+            # Drop a record cut short by a crash
+            size -= (size - start) % self._layout.size
+            self._file.truncate(size)
+        self._size = size
+        self._header = header
+
+    def _rotate(self):
+        """Shift FILE to FILE.1, FILE.1 to FILE.2 and so on"""
+        if self.backups <= 0:
+            os.unlink(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def _close_file(self):
+        """Flush, fsync and close the current file"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def write(self, snapshot):
+        """Append one Snapshot"""
+        with self._lock:
+            now = self._clock()
+            if not self._settled:
+                resources = snapshot.resources
+                if ("GPUs" not in resources and "GPU Error" not in resources
+                        and now - self._started_at < self.settle):
+                    self._pending.append(snapshot)
+                    return
+                self._settled = True
+            self._append(snapshot)
+
+            if now - self._synced_at >= self.fsync_interval:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._synced_at = now
+
+    def _append(self, snapshot):
+        """Write the held samples and `snapshot` under the header of `snapshot`"""
+        header = record_header(snapshot)
+        if header != self._header:
+            self._close_file()
+            self._open(header)
+        elif self.max_bytes and self._size + self._layout.size > self.max_bytes:
+            self._close_file()
+            self._rotate()
+            self._open(header)
+
+        if self._pending:
+            for held in self._pending:
+                self._file.write(pack_record(self._layout, held))
+            self._size += len(self._pending) * self._layout.size
+            self._pending = []
+        self._file.write(pack_record(self._layout, snapshot))
+        self._size += self._layout.size
+
+    def close(self):
+        """Write any held samples, then flush and close the recording"""
+        with self._lock:
+            if self._pending:
+                self._append(self._pending.pop())
+            self._close_file()
+            self._header = None
+
+
+class _Timestamps:
+    """Sequence view of the record timestamps, for bisect"""
+
+    def __init__(self, recording):
+        self._recording = recording
+
+    def __len__(self):
+        return len(self._recording)
+
+    def __getitem__(self, index):
+        return self._recording.timestamp(index)
+
+
+class Recording:
+    """
+    Read-only, memory-mapped view of a recording file
+
+    Opening maps the file without reading the records, so it is instant
+    whatever the size. Records are unpacked on access.
+    """
+
+    def __init__(self, path):
+        """Map `path` and parse its header"""
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, length = PREAMBLE.unpack_from(self._map)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not an RTSM recording")
+        header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + length])
+        self.static = header["static"]
+        self.gpus = header["gpus"]
+        self._layout = struct.Struct(header["record"])
+        self._start = PREAMBLE.size + length
+        self._count = (len(self._map) - self._start) // self._layout.size
+        self._timestamps = _Timestamps(self)
+
+    def __len__(self):
+        """Return the number of records"""
+        return self._count
+
+    def timestamp(self, index):
+        """Return the timestamp of record `index`"""
+        return struct.unpack_from("<d", self._map, self._start + index * self._layout.size)[0]
+
+    def index_at(self, timestamp):
+        """Return the index of the last record at or before `timestamp`"""
+        return max(bisect.bisect_right(self._timestamps, timestamp) - 1, 0)
+
+    def record(self, index):
+        """
+        Return record `index`
+
+        Returns:
+            tuple: (timestamp, uptime seconds, resources) where resources
+                has the layout get_resource_usage returns
+        """
+        values = self._layout.unpack_from(self._map, self._start + index * self._layout.size)
+        timestamp, uptime, cpu, mem_used, mem_total, mem_percent = values[:6]
+        resources = {
+            "CPU Usage": round(cpu, 1),
+            "Memory": {"total": mem_total, "used": mem_used, "percent": round(mem_percent, 1)},
+        }
+        if self.gpus and not math.isnan(values[6]):
+            # Taken before the GPUs first reported when NaN
+            resources["GPUs"] = [
+                make_gpu_reading(i, name, *values[6 + i * 3:9 + i * 3])
+                for i, name in enumerate(self.gpus)
+            ]
+            resources["GPU Age"] = 0.0
+        return timestamp, uptime, resources
+
+    def close(self):
+        """Unmap the file"""
+        self._map.close()
+
+
+class ReplaySampler:
+    """
+    Drop-in replacement for Sampler that plays back a recording
+
+    Replay time advances with the monotonic clock scaled by `speed`, and
+    snapshot() returns the record at the current replay time in the same
+    layout the sampler publishes. Listeners are called for each record
+    passed, so history sparklines fill in as the recording plays.
+    """
+
+    kind = "replay"
+
+    def __init__(self, recording, speed=1.0, offset=0.0, clock=time.monotonic):
+        """
+        Args:
+            recording: Recording to play back
+            speed: Replay seconds per real second
+            offset: Seconds into the recording to start at
+            clock: Monotonic clock driving the replay
+        """
+        if not len(recording):
+            raise ValueError(f"{recording.path} holds no samples")
+        self.recording = recording
+        self.speed = speed
+        self.paused = False
+        self.started_at = None
+        self._clock = clock
+        self._listeners = []
+        self.listener_errors = 0
+        self._first = recording.timestamp(0)
+        self._last = recording.timestamp(len(recording) - 1)
+        self._index = None
+        self._snapshot = MappingProxyType({})
+        self._rebase(self._first + offset)
+
+    def add_listener(self, func):
+        """Call `func(name, value)` for each record replayed"""
+        self._listeners.append(func)
+
+    def start(self):
+        """Start playing"""
+        self.started_at = self._base_at = self._clock()
+
+    def stop(self):
+        """Stop playing"""
+        self.paused = True
+
+    def position(self):
+        """Return the current replay time as a UNIX timestamp"""
+        if self.paused:
+            return self._base
+        position = self._base + (self._clock() - self._base_at) * self.speed
+        return min(max(position, self._first), self._last)
+
+    def _rebase(self, position):
+        """Continue playing from `position`"""
+        self._base = min(max(position, self._first), self._last)
+        self._base_at = self._clock()
+
+    def seek(self, seconds):
+        """Move the replay time by `seconds`"""
+        self._rebase(self.position() + seconds)
+
+    def set_speed(self, speed):
+        """Change the replay speed"""
+        self._rebase(self.position())
+        self.speed = speed
+
+    def toggle_pause(self):
+        """Pause or resume playing"""
+        self._rebase(self.position())
+        self.paused = not self.paused
+
+    def snapshot(self):
+        """Return the record at the current replay time"""
+        index = self.recording.index_at(self.position())
+        if index == self._index:
+            return self._snapshot
+        previous, self._index = self._index, index
+
+        timestamp, uptime, resources = self.recording.record(index)
+        system_info = dict(self.recording.static)
+        system_info["Uptime"] = format_uptime(uptime)
+        data = {
+            "system_info": system_info,
+            "cpu": resources["CPU Usage"],
+            "memory": resources["Memory"],
+            "time": timestamp,
+            "uptime_seconds": uptime,
+        }
+        if "GPUs" in resources:
+            data["gpu"] = {"GPUs": resources["GPUs"], "GPU Age": 0.0}
+        self._snapshot = MappingProxyType(data)
+
+        # Feed listeners every record passed when playing forward
+        if previous is not None and previous < index:
+            first = max(previous + 1, index - 3600)
+        else:
+            first = index
+        for passed in range(first, index + 1):
+            _, _, values = self.recording.record(passed)
+            self._notify(values)
+        return self._snapshot
+
+    def _notify(self, resources):
+        """Call the listeners with one record"""
+        listeners = self._listeners
+        failed = notify_listeners(listeners, "cpu", resources["CPU Usage"])
+        failed += notify_listeners(listeners, "memory", resources["Memory"])
+        if "GPUs" in resources:
+            failed += notify_listeners(listeners, "gpu", {"GPUs": resources["GPUs"]})
+        self.listener_errors += failed
+
+
+def replay_headless(recording, fmt="jsonl", output=None, speed=0.0, offset=0.0,
+                    flush_every=10):
+    """
+    Stream a recording through an exporter
+
+    Args:
+        recording: Recording to play back
+        fmt: One of exporter.EXPORTERS
+        output: File path to append to, or None for stdout
+        speed: Replay seconds per real second, or 0 for as fast as possible
+        offset: Seconds into the recording to start at
+        flush_every: Number of samples written between flushes
+    """
+    from exporter import EXPORTERS, Snapshot
+
+    stream = open(output, "a", buffering=1 << 16) if output else sys.stdout
+    exporter = EXPORTERS[fmt](stream, flush_every)
+    exporter.write_static(recording.static)
+
+    start = recording.index_at(recording.timestamp(0) + offset)
+    started_at = time.monotonic()
+    first_timestamp = None
+    try:
+        for index in range(start, len(recording)):
+            timestamp, uptime, resources = recording.record(index)
+            if speed > 0:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = started_at + (timestamp - first_timestamp) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            snapshot = Snapshot(timestamp, recording.static, resources, uptime)
+            exporter.write_sample(snapshot.timestamp, snapshot.metrics)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        exporter.flush()
+        if output:
+            stream.close()
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Real-Time System Monitor (RTSM) - Renderer Module
+
+This file contains the damage-tracked curses renderer. Static regions
+are drawn once per layout and dynamic cells are only rewritten when
+their text or attributes change. Text is measured in terminal columns,
+so wide and combining characters clip and blank out correctly.
+"""
+
+import curses
+from utils import clip_to_width, display_width
+
+
+class Renderer:
+    """Draw onto a curses window, writing only what changed since last frame"""
+
+    def __init__(self, stdscr, update=None):
+        """
+        Args:
+            stdscr: The curses window to draw on
+            update: Function pushing pending output to the terminal,
+                curses.doupdate by default
+        """
+        self.stdscr = stdscr
+        self._update = update or curses.doupdate
+        self._cells = {}
+        self._frame = {}
+        self.size = stdscr.getmaxyx()
+        self.needs_layout = True
+        self._erased = True
+        self.frame_bytes = 0
+        self.total_bytes = 0
+        self.frames = 0
+
+    def reset(self):
+        """Erase the window; the next frame lays out everything again"""
+        self.stdscr.erase()
+        self.size = self.stdscr.getmaxyx()
+        self._cells = {}
+        self._frame = {}
+        self.needs_layout = True
+        self._erased = True
+
+    def _write(self, y, x, text, attr):
+        """Write text clipped to the window and count the bytes sent"""
+        height, width = self.size
+        if y >= height or x >= width:
+            return
+        # Leave the bottom-right cell alone: writing it scrolls the window
+        text = clip_to_width(text, width - x - (1 if y == height - 1 else 0))
+        if not text:
+            return
+        self.stdscr.addstr(y, x, text, attr)
+        self.frame_bytes += len(text.encode("utf-8"))
+
+    def static(self, y, x, text, attr=0):
+        """Draw text that stays on screen until the next reset"""
+        self._write(y, x, text, attr)
+
+    def cell(self, y, x, *segments):
+        """Queue a dynamic cell made of (text, attr) segments for this frame"""
+        self._frame[(y, x)] = segments
+
+    def flush(self):
+        """
+        Write damaged cells and push the result to the terminal
+
+        Returns:
+            bool: True if anything was written this frame
+        """
+        # Blank out cells that are no longer drawn
+        for (y, x), (segments, width) in self._cells.items():
+            if (y, x) not in self._frame:
+                self._write(y, x, " " * width, 0)
+
+        cells = {}
+        for (y, x), segments in self._frame.items():
+            previous = self._cells.get((y, x))
+            if previous is not None and previous[0] == segments:
+                cells[(y, x)] = previous
+                continue
+
+            start = x
+            for text, attr in segments:
+                self._write(y, x, text, attr)
+                x += display_width(text)
+            width = x - start
+            if previous is not None and previous[1] > width:
+                self._write(y, x, " " * (previous[1] - width), 0)
+            cells[(y, start)] = (segments, width)
+
+        self._cells = cells
+        self._frame = {}
+        self.needs_layout = False
+
+        changed = self.frame_bytes > 0 or self._erased
+        self._erased = False
+        if changed:
+            self.stdscr.noutrefresh()
+            self._update()
+        self.total_bytes += self.frame_bytes
+        self.frames += 1
+        self.frame_bytes = 0
+        return changed
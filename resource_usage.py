@@ -6,44 +6,127 @@ such as CPU, memory, and GPU (if available).
 """
 
 import psutil
+from procfs import open_proc_reader
+from cgroup import open_cgroup_reader
 
-# Conditionally import GPU monitoring capability
-try:
-    import GPUtil
-except ImportError:
-    pass
+# Collector backends; "auto" reads the cgroup inside a container with
+# limits, and /proc directly where it can
+BACKENDS = ("auto", "cgroup", "procfs", "psutil")
 
+# Prime the CPU counters so the first non-blocking sample has a baseline
+psutil.cpu_percent(interval=None)
 
-def get_resource_usage(gpu_available=False):
-    """Get current resource usage"""
-    resources = {}
-    
-    # CPU
-    resources["CPU Usage"] = psutil.cpu_percent(interval=0.1)
-    
-    # Memory
+# Open /proc or cgroup reader, or None to go through psutil
+_proc_reader = None
+_backend = "psutil"
+
+
+def set_backend(name="auto"):
+    """
+    Select how CPU and memory usage are collected
+
+    Args:
+        name: "cgroup" to report usage against the limits of the current
+            cgroup, "procfs" to read /proc directly, "psutil" to use
+            psutil, or "auto" for cgroup when a CPU or memory limit is
+            set, else procfs where available and psutil elsewhere
+
+    Returns:
+        str: The backend in use
+    """
+    global _proc_reader, _backend
+    if _proc_reader is not None:
+        _proc_reader.close()
+        _proc_reader = None
+    _backend = "psutil"
+    if name in ("auto", "cgroup"):
+        reader = open_cgroup_reader()
+        if reader is None and name == "cgroup":
+            raise RuntimeError("no readable cgroup for this process")
+        if reader is not None and (name == "cgroup" or reader.limited):
+            _proc_reader, _backend = reader, "cgroup"
+        elif reader is not None:
+            reader.close()
+    if name in ("auto", "procfs") and _proc_reader is None:
+        _proc_reader = open_proc_reader()
+        if _proc_reader is None and name == "procfs":
+            raise RuntimeError("/proc is not available on this system")
+        if _proc_reader is not None:
+            _backend = "procfs"
+    return _backend
+
+
+def get_backend():
+    """Return the name of the backend in use"""
+    return _backend
+
+
+def get_container_usage():
+    """Return cgroup limits, throttling and pressure, or None outside the cgroup backend"""
+    reader = _proc_reader
+    if _backend != "cgroup" or reader is None:
+        return None
+    return reader.container_usage()
+
+
+def get_cpu_usage():
+    """Get CPU usage since the previous call without blocking"""
+    reader = _proc_reader
+    if reader is not None:
+        return reader.cpu_percent()
+    return psutil.cpu_percent(interval=None)
+
+
+def get_memory_usage():
+    """Get virtual memory usage"""
+    reader = _proc_reader
+    if reader is not None:
+        return reader.memory_usage()
     mem = psutil.virtual_memory()
-    resources["Memory"] = {
+    return {
         "total": mem.total,
         "used": mem.used,
         "percent": mem.percent
     }
+
+
+def get_gpu_usage(gpu_collector):
+    """Get the latest cached GPU readings from a background collector"""
+    resources = {}
+    if gpu_collector.unavailable:
+        return resources
+    gpus, age = gpu_collector.latest()
+    if gpus:
+        resources["GPUs"] = gpus
+        resources["GPU Age"] = age
+    if gpu_collector.last_error is not None:
+        resources["GPU Error"] = str(gpu_collector.last_error)
+    return resources
+
+
+def get_resource_usage(gpu_available=False, gpu_collector=None):
+    """
+    Get current resource usage
+
+    GPU readings come from the background `gpu_collector` cache, so this
+    never waits on the GPU driver. All GPUs are reported under "GPUs",
+    with the age of the reading under "GPU Age".
+    """
+    resources = {}
+    
+    # CPU (usage since the previous call, never blocks)
+    resources["CPU Usage"] = get_cpu_usage()
+    
+    # Memory
+    resources["Memory"] = get_memory_usage()
+    
+    # Container limits, throttling and pressure (cgroup backend only)
+    container = get_container_usage()
+    if container is not None:
+        resources["Container"] = container
     
     # GPU (if available)
-    if gpu_available:
-        try:
-            gpus = GPUtil.getGPUs()
-            if gpus:
-                resources["GPU"] = {
-                    "name": gpus[0].name,
-                    "usage": gpus[0].load * 100,
-                    "memory": {
-                        "total": gpus[0].memoryTotal,
-                        "used": gpus[0].memoryUsed,
-                        "percent": (gpus[0].memoryUsed / gpus[0].memoryTotal) * 100
-                    }
-                }
-        except Exception:
-            pass
+    if gpu_available and gpu_collector is not None:
+        resources.update(get_gpu_usage(gpu_collector))
     
     return resources
\ No newline at end of file
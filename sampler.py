@@ -0,0 +1,435 @@
+"""
+Real-Time System Monitor (RTSM) - Sampler Module
+
+This file contains the background sampler that runs collectors on their
+own threads and publishes read-only snapshots for the UI to render, the
+pool that runs collectors concurrently for the headless modes, and the
+deadline and quarantine bookkeeping both share.
+"""
+
+import queue
+import threading
+import time
+from types import MappingProxyType
+from scheduler import advance_deadline
+
+# Seconds a collector run may take before it counts as late
+DEFAULT_TIMEOUT = 2.0
+# Failed runs in a row before a collector is quarantined
+STRIKES = 3
+# Seconds between runs of a quarantined collector
+QUARANTINE = 30.0
+
+# Returned by states() while every collector keeps up
+NO_STATES = MappingProxyType({})
+
+
+def notify_listeners(listeners, name, value):
+    """
+    Call each listener with a sample, carrying on past ones that raise
+
+    Listeners include alert rules and the snapshot bus publisher, and one
+    that fails must not end the collector thread that called it.
+
+    Returns:
+        int: Number of listeners that raised
+    """
+    failed = 0
+    for listener in listeners:
+        try:
+            listener(name, value)
+        except Exception:
+            failed += 1
+    return failed
+
+
+class CollectorHealth:
+    """
+    Deadline, staleness and quarantine of one collector
+
+    A run that outlasts its timeout is reported late, but only a run that
+    raises is a strike: `strikes` in a row quarantine the collector, and
+    it then runs only every `quarantine` seconds until a run succeeds. A
+    hung run is never started again until it returns, so it needs no
+    strike to keep it from piling up.
+    """
+
+    __slots__ = ("interval", "timeout", "strikes", "quarantine", "running_since",
+                 "last_started", "last_ok", "failures", "quarantined")
+
+    def __init__(self, interval, timeout, strikes=STRIKES, quarantine=QUARANTINE):
+        """
+        Args:
+            interval: Seconds between runs
+            timeout: Seconds a run may take
+            strikes: Failed runs in a row that quarantine it
+            quarantine: Seconds between runs while quarantined
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.strikes = strikes
+        self.quarantine = quarantine
+        self.running_since = None
+        self.last_started = None
+        self.last_ok = None
+        self.failures = 0
+        self.quarantined = False
+
+    def start(self, now):
+        """Note that a run started at monotonic time `now`"""
+        self.running_since = self.last_started = now
+
+    def finish(self, now, ok):
+        """Note that the run finished at `now`, successfully if `ok`"""
+        self.running_since = None
+        if ok:
+            # A late value is still the newest there is
+            self.last_ok = now
+            self.failures = 0
+            self.quarantined = False
+        else:
+            self.failures += 1
+            if self.failures >= self.strikes:
+                self.quarantined = True
+
+    def interval_for(self, scale=1.0):
+        """Return the seconds until the next run"""
+        interval = self.interval * scale
+        return max(interval, self.quarantine) if self.quarantined else interval
+
+    def due(self, now):
+        """Return whether a collector run on demand should run now"""
+        return (not self.quarantined or self.last_started is None
+                or now - self.last_started >= self.quarantine)
+
+    def state(self, now, scale=1.0):
+        """
+        Return how the collector is keeping up
+
+        Returns:
+            str: "timeout" while a run is past its deadline, "quarantined",
+                "stale" without a good sample for two intervals past the
+                deadline, or "ok"
+        """
+        if self.running_since is not None and now - self.running_since > self.timeout:
+            return "timeout"
+        if self.quarantined:
+            return "quarantined"
+        if self.last_ok is None:
+            return "stale" if self.failures else "ok"
+        if now - self.last_ok > 2 * self.interval * scale + self.timeout:
+            return "stale"
+        return "ok"
+
+
+class Sampler:
+    """Run collectors in the background and publish their latest results"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Initialize an empty sampler
+
+        Args:
+            timeout: Seconds a collector run may take, unless add_collector
+                sets another
+        """
+        self.timeout = timeout
+        self._collectors = {}
+        self._health = {}
+        self._paused = frozenset()
+        self._listeners = []
+        self._threads = []
+        # Listener calls that raised; see notify_listeners
+        self.listener_errors = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._rescaled = threading.Condition()
+        self._generation = 0
+        self._snapshot = MappingProxyType({})
+        self.started_at = None
+        # Factor applied to every collector interval; see set_scale
+        self.scale = 1.0
+        # Set to a dict to record the duration of each collector's last
+        # run in nanoseconds
+        self.timings = None
+
+    def add_collector(self, name, func, interval, timeout=None):
+        """Register a collector that is called every `interval` seconds"""
+        self._collectors[name] = (func, interval)
+        self._health[name] = CollectorHealth(
+            interval, timeout if timeout is not None else self.timeout
+        )
+
+    def add_listener(self, func):
+        """
+        Call `func(name, value)` on the collector thread after each sample
+
+        Listeners must be quick; they delay the collector that called them.
+        """
+        self._listeners.append(func)
+
+    def start(self):
+        """Start one daemon thread per registered collector"""
+        self._stop.clear()
+        self.started_at = time.monotonic()
+        for name, (func, interval) in self._collectors.items():
+            thread = threading.Thread(
+                target=self._run, args=(name, func, interval),
+                name=f"rtsm-{name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def sample_once(self):
+        """Run every collector once on the calling thread and publish the results"""
+        for name, (func, interval) in self._collectors.items():
+            if name in self._paused:
+                continue
+            health = self._health[name]
+            health.start(time.monotonic())
+            try:
+                value = func()
+            except Exception:
+                health.finish(time.monotonic(), False)
+                continue
+            health.finish(time.monotonic(), True)
+            self._publish(name, value)
+
+    def set_scale(self, scale):
+        """
+        Multiply every collector's interval by `scale`
+
+        Each collector's next run moves to its last run plus the new
+        interval, so a collector whose shortened interval has already
+        elapsed samples straight away.
+        """
+        with self._rescaled:
+            self.scale = scale
+            self._generation += 1
+            self._rescaled.notify_all()
+
+    def set_paused(self, names):
+        """
+        Stop running the collectors in `names` until a later call leaves them out
+
+        A paused collector keeps its last value, is left out of states()
+        and runs straight away when it is resumed.
+        """
+        names = frozenset(names)
+        with self._rescaled:
+            if names == self._paused:
+                return
+            for name in self._paused - names:
+                if name in self._health:
+                    # Not stale for the time it was paused
+                    self._health[name].last_ok = None
+            self._paused = names
+            self._rescaled.notify_all()
+
+    def stop(self):
+        """Stop all collector threads"""
+        with self._rescaled:
+            self._stop.set()
+            self._rescaled.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+    def snapshot(self):
+        """
+        Return the latest published snapshot without blocking
+
+        The snapshot is a read-only mapping of collector name to the last
+        value it produced. Published values are never modified afterwards,
+        so readers may keep a reference for as long as they need it. A new
+        snapshot is only made when a value changed, so an unchanged
+        snapshot object means there is nothing new to draw.
+        """
+        return self._snapshot
+
+    def states(self):
+        """
+        Return the collectors that are not keeping up
+
+        Returns:
+            Mapping: Collector name to its CollectorHealth.state for those
+                not "ok"; NO_STATES while all are
+        """
+        now = time.monotonic()
+        states = None
+        paused = self._paused
+        for name, health in self._health.items():
+            if name in paused:
+                continue
+            state = health.state(now, self.scale)
+            if state != "ok":
+                if states is None:
+                    states = {}
+                states[name] = state
+        return states or NO_STATES
+
+    def _publish(self, name, value):
+        """Swap in a new snapshot containing `value` for `name`"""
+        with self._lock:
+            if name not in self._snapshot or self._snapshot[name] != value:
+                data = dict(self._snapshot)
+                data[name] = value
+                self._snapshot = MappingProxyType(data)
+        failed = notify_listeners(self._listeners, name, value)
+        if failed:
+            self.listener_errors += failed
+
+    def _run(self, name, func, interval):
+        """Collector thread body: sample on monotonic deadlines"""
+        health = self._health[name]
+        next_run = ran_for = self.started_at
+        generation = self._generation
+        while True:
+            with self._rescaled:
+                while not self._stop.is_set():
+                    if name in self._paused:
+                        # Wait to be resumed, then run straight away
+                        self._rescaled.wait()
+                        generation = self._generation
+                        next_run = time.monotonic()
+                        continue
+                    now = time.monotonic()
+                    if self._generation != generation:
+                        # Rescaled: count the new interval from the last run
+                        generation = self._generation
+                        next_run = max(ran_for + health.interval_for(self.scale), now)
+                    if next_run <= now:
+                        break
+                    self._rescaled.wait(next_run - now)
+            if self._stop.is_set():
+                return
+
+            ran_for = next_run
+            health.start(time.monotonic())
+            try:
+                timings = self.timings
+                if timings is None:
+                    value = func()
+                else:
+                    start = time.perf_counter_ns()
+                    value = func()
+                    timings[name] = time.perf_counter_ns() - start
+            except Exception:
+                # Keep the previous value; the next run may succeed
+                health.finish(time.monotonic(), False)
+            else:
+                health.finish(time.monotonic(), True)
+                self._publish(name, value)
+
+            # Skip missed runs instead of bursting to catch up; a
+            # quarantined collector waits out the quarantine instead
+            next_run, _ = advance_deadline(next_run, health.interval_for(self.scale), time.monotonic())
+
+
+class _Run:
+    """One collector run handed to a CollectorPool worker"""
+
+    __slots__ = ("func", "done", "ok", "value", "finished_at")
+
+    def __init__(self, func):
+        self.func = func
+        self.done = threading.Event()
+        self.ok = False
+        self.value = None
+        self.finished_at = None
+
+
+class CollectorPool:
+    """
+    Run collectors concurrently on a few worker threads, each under a deadline
+
+    collect() starts every collector that is not still running, then
+    waits for each until its own deadline, so a call never takes longer
+    than the longest timeout however slow a source is. The result of a
+    run that misses its deadline is picked up by a later call, and until
+    then the previous value stands in. A hung collector holds one worker
+    and is not started again until it returns. Workers are daemon
+    threads, so one that never returns does not keep the process alive.
+    """
+
+    def __init__(self, workers=4, clock=time.monotonic):
+        """
+        Args:
+            workers: Threads running collectors
+            clock: Monotonic clock used for deadlines
+        """
+        self.workers = workers
+        self._clock = clock
+        self._collectors = {}
+        self._values = {}
+        self._running = {}
+        self._tasks = queue.SimpleQueue()
+        self._threads = []
+
+    def add_collector(self, name, func, interval, timeout=DEFAULT_TIMEOUT):
+        """Register a collector that runs on each collect(), about every `interval` seconds"""
+        self._collectors[name] = (func, CollectorHealth(interval, timeout))
+
+    def _work(self):
+        """Worker thread body"""
+        while True:
+            run = self._tasks.get()
+            if run is None:
+                return
+            try:
+                run.value = run.func()
+                run.ok = True
+            except Exception:
+                pass
+            run.finished_at = self._clock()
+            run.done.set()
+
+    def collect(self):
+        """
+        Run the collectors and return what finished in time
+
+        Returns:
+            tuple: (dict of collector name to its latest value, where late
+                collectors keep an earlier one or are missing, and the
+                Mapping of collectors not keeping up to their state, see
+                CollectorHealth.state)
+        """
+        if not self._threads:
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"rtsm-collect-{index}",
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+        now = self._clock()
+        for name, (func, health) in self._collectors.items():
+            if name not in self._running and health.due(now):
+                run = self._running[name] = _Run(func)
+                health.start(now)
+                self._tasks.put(run)
+
+        for name, run in list(self._running.items()):
+            health = self._collectors[name][1]
+            remaining = health.running_since + health.timeout - self._clock()
+            if remaining > 0:
+                run.done.wait(remaining)
+            if not run.done.is_set():
+                continue
+            del self._running[name]
+            health.finish(run.finished_at, run.ok)
+            if run.ok:
+                self._values[name] = run.value
+
+        now = self._clock()
+        states = {}
+        for name, (func, health) in self._collectors.items():
+            state = health.state(now)
+            if state != "ok":
+                states[name] = state
+        return dict(self._values), states or NO_STATES
+
+    def close(self):
+        """Stop the workers once they finish their current runs"""
+        for thread in self._threads:
+            self._tasks.put(None)
+        self._threads = []
@@ -0,0 +1,144 @@
+"""
+Real-Time System Monitor (RTSM) - Scheduler Module
+
+This file contains the drift-free scheduler that keeps one monotonic
+deadline per task, so each panel refreshes at its own interval, and the
+adaptive policy that stretches those intervals while nothing happens.
+"""
+
+import time
+
+
+def advance_deadline(deadline, interval, now):
+    """
+    Move a deadline forward by one interval, skipping missed periods
+
+    Returns:
+        tuple: (next deadline, number of periods skipped)
+    """
+    deadline += interval
+    if deadline > now:
+        return deadline, 0
+    missed = int((now - deadline) // interval) + 1
+    return deadline + missed * interval, missed
+
+
+class Scheduler:
+    """Track monotonic deadlines for tasks running at independent intervals"""
+
+    def __init__(self, clock=time.monotonic):
+        """Initialize an empty scheduler"""
+        self._clock = clock
+        self._intervals = {}
+        self._deadlines = {}
+        self.skipped = 0
+        # Factor applied to every interval; see set_scale
+        self.scale = 1.0
+
+    def add(self, name, interval, start=None):
+        """Schedule `name` every `interval` seconds, first due at `start`"""
+        self._intervals[name] = interval
+        self._deadlines[name] = self._clock() if start is None else start
+
+    def set_scale(self, scale, earliest=None):
+        """
+        Multiply every interval by `scale`
+
+        Each task is next due one new interval after its last run, but not
+        before `earliest` (now by default).
+        """
+        earliest = self._clock() if earliest is None else earliest
+        for name, deadline in self._deadlines.items():
+            interval = self._intervals[name]
+            last = deadline - interval * self.scale
+            self._deadlines[name] = max(last + interval * scale, earliest)
+        self.scale = scale
+
+    def due(self, now=None):
+        """
+        Return the names whose deadline has passed and advance them
+
+        When a task fell behind by more than one interval the missed runs
+        are skipped (and counted in `skipped`) instead of run back to back.
+        """
+        if now is None:
+            now = self._clock()
+        names = []
+        for name, deadline in self._deadlines.items():
+            if deadline <= now:
+                names.append(name)
+                self._deadlines[name], missed = advance_deadline(
+                    deadline, self._intervals[name] * self.scale, now
+                )
+                self.skipped += missed
+        return names
+
+    def timeout(self, now=None):
+        """Return the seconds until the next deadline (never negative)"""
+        if not self._deadlines:
+            return None
+        if now is None:
+            now = self._clock()
+        return max(0.0, min(self._deadlines.values()) - now)
+
+
+class AdaptiveRate:
+    """
+    Decide how far to stretch refresh intervals
+
+    The scale doubles for every `settle` seconds without activity, up to
+    `max_scale`, and drops back to 1 on activity: a keypress, the
+    terminal regaining focus, or a CPU, memory or GPU percentage moving
+    by at least `threshold` points between two samples. While the
+    terminal is unfocused the scale stays at `max_scale`.
+    """
+
+    def __init__(self, max_scale=16.0, settle=15.0, threshold=10.0, clock=time.monotonic):
+        """
+        Args:
+            max_scale: Largest factor intervals are multiplied by
+            settle: Seconds without activity before each doubling
+            threshold: Change in percentage points counted as activity
+            clock: Monotonic clock
+        """
+        self.max_scale = max_scale
+        self.settle = settle
+        self.threshold = threshold
+        self.focused = True
+        self._clock = clock
+        self._quiet_since = clock()
+        self._last = {}
+
+    def activity(self):
+        """Return to the full refresh rate"""
+        self._quiet_since = self._clock()
+
+    def set_focus(self, focused):
+        """Record whether the terminal has focus"""
+        if focused and not self.focused:
+            self.activity()
+        self.focused = focused
+
+    def observe(self, name, value):
+        """Sampler listener: count fast-moving metrics as activity"""
+        if name == "cpu":
+            percent = value
+        elif name == "memory":
+            percent = value["percent"]
+        elif name == "gpu" and value.get("GPUs"):
+            percent = max(gpu["usage"] for gpu in value["GPUs"])
+        else:
+            return
+        previous = self._last.get(name)
+        self._last[name] = percent
+        if previous is not None and abs(percent - previous) >= self.threshold:
+            self.activity()
+
+    def scale(self, now=None):
+        """Return the factor to multiply refresh intervals by now"""
+        if not self.focused:
+            return self.max_scale
+        if now is None:
+            now = self._clock()
+        quiet = now - self._quiet_since
+        return min(self.max_scale, 2.0 ** int(quiet // self.settle))
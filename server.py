@@ -0,0 +1,199 @@
+"""
+Real-Time System Monitor (RTSM) - Metrics Server Module
+
+This file contains the opt-in HTTP endpoint serving `/metrics`
+(Prometheus) and `/snapshot.json` from one shared snapshot cache, so any
+number of concurrent scrapers cost one collection per interval.
+"""
+
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from exporter import PrometheusExporter
+
+DEFAULT_HOST = "127.0.0.1"
+
+
+class SnapshotCache:
+    """
+    Share collections between concurrent readers
+
+    A cached snapshot is returned while it is younger than
+    `max_staleness` seconds. Otherwise the first reader collects a new
+    one while every other reader waits for that same collection instead
+    of starting its own.
+    """
+
+    def __init__(self, collect, max_staleness=1.0, clock=time.monotonic):
+        """
+        Args:
+            collect: Function returning a new snapshot
+            max_staleness: Seconds a snapshot may be served after collection
+            clock: Monotonic clock used to age snapshots
+        """
+        self._collect = collect
+        self.max_staleness = max_staleness
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._snapshot = None
+        self._collected_at = None
+        self._collecting = False
+        self.collections = 0
+
+    def get(self):
+        """Return a snapshot no older than `max_staleness` seconds"""
+        with self._condition:
+            while True:
+                if (self._collected_at is not None
+                        and self._clock() - self._collected_at <= self.max_staleness):
+                    return self._snapshot
+                if not self._collecting:
+                    break
+                # Coalesce onto the collection already in flight
+                self._condition.wait()
+            self._collecting = True
+
+        snapshot = None
+        try:
+            snapshot = self._collect()
+        finally:
+            with self._condition:
+                if snapshot is not None:
+                    self._snapshot = snapshot
+                    self._collected_at = self._clock()
+                    self.collections += 1
+                self._collecting = False
+                self._condition.notify_all()
+        return snapshot
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serve `/metrics` and `/snapshot.json` from the server's cache"""
+
+    def do_GET(self):
+        """Handle a GET request"""
+        path = self.path.split("?", 1)[0]
+        if path not in ("/metrics", "/snapshot.json"):
+            self.send_error(404)
+            return
+        try:
+            body, content_type = self.server.metrics.render(path)
+        except Exception as e:
+            self.send_error(503, str(e))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep request logs off the terminal"""
+
+
+class TCPHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for many scrapers"""
+
+    request_queue_size = 128
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded HTTP server listening on a unix socket"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def get_request(self):
+        """Accept a connection with a client address the handler can log"""
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+class MetricsServer:
+    """HTTP endpoint rendering snapshots from a SnapshotCache"""
+
+    def __init__(self, cache, address=f"{DEFAULT_HOST}:9184"):
+        """
+        Args:
+            cache: SnapshotCache providing the snapshots
+            address: "HOST:PORT", "PORT" (bound to localhost) or
+                "unix:PATH"
+        """
+        self.cache = cache
+        self.address = address
+        self._prometheus = PrometheusExporter(None, timestamps=False)
+        self._static = None
+        self._rendered = (None, {})
+
+        if address.startswith("unix:"):
+            self.path = address[len("unix:"):]
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.httpd = UnixHTTPServer(self.path, MetricsRequestHandler)
+        else:
+            self.path = None
+            host, _, port = address.rpartition(":")
+            self.httpd = TCPHTTPServer((host or DEFAULT_HOST, int(port)),
+                                       MetricsRequestHandler)
+        self.httpd.metrics = self
+        self._thread = None
+
+    @property
+    def server_address(self):
+        """Return the address the server is bound to"""
+        return self.httpd.server_address
+
+    def render(self, path):
+        """
+        Return the body and content type for `path`
+
+        Bodies are rendered once per snapshot and shared by every request
+        served from that snapshot.
+        """
+        snapshot = self.cache.get()
+        rendered_for, bodies = self._rendered
+        if rendered_for is not snapshot:
+            bodies = {}
+            self._rendered = (snapshot, bodies)
+        body = bodies.get(path)
+        if body is None:
+            if path == "/metrics":
+                if snapshot.static is not self._static:
+                    self._prometheus.write_static(snapshot.static)
+                    self._static = snapshot.static
+                text = self._prometheus.format_sample(snapshot.timestamp, snapshot.metrics)
+                body = (text.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            else:
+                data = {"ts": snapshot.timestamp, "static": snapshot.static}
+                for key, name, labels, value in snapshot.metrics:
+                    data[key] = value
+                body = (json.dumps(data).encode("utf-8"), "application/json")
+            bodies[path] = body
+        return body
+
+    def start(self):
+        """Serve requests on a daemon thread"""
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="rtsm-http", daemon=True
+        )
+        self._thread.start()
+
+    def serve_forever(self):
+        """Serve requests on the calling thread until interrupted"""
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+    def stop(self):
+        """Stop serving and release the socket"""
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.httpd.server_close()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
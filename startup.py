@@ -0,0 +1,131 @@
+"""
+Real-Time System Monitor (RTSM) - Startup Profiling Module
+
+This file contains the `--profile-startup` instrumentation, which times
+every module import and each startup phase up to the first frame.
+"""
+
+import sys
+import time
+
+
+class _TimedLoader:
+    """Loader proxy that reports how long a module took to load"""
+
+    def __init__(self, loader, name, profiler):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        """Create the module; extension modules are loaded here"""
+        create = getattr(self._loader, "create_module", None)
+        if create is None:
+            return None
+        with self._profiler.timing(self._name):
+            return create(spec)
+
+    def exec_module(self, module):
+        """Run the module body"""
+        with self._profiler.timing(self._name):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _Timing:
+    """Context manager adding elapsed time to an import record"""
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._profiler._stack.append(0.0)
+        self._start = self._profiler.clock()
+
+    def __exit__(self, *exc_info):
+        profiler = self._profiler
+        elapsed = profiler.clock() - self._start
+        children = profiler._stack.pop()
+        if profiler._stack:
+            profiler._stack[-1] += elapsed
+        total, own = profiler.imports.get(self._name, (0.0, 0.0))
+        profiler.imports[self._name] = (total + elapsed, own + elapsed - children)
+
+
+class StartupProfiler:
+    """
+    Time module imports and startup phases
+
+    Installed first on sys.meta_path, the profiler finds modules through
+    the other finders and wraps their loaders, so each import is timed
+    both including and excluding the imports it triggers. It does not
+    subclass importlib.abc.MetaPathFinder, whose import alone costs more
+    than most of what it would measure.
+    """
+
+    def __init__(self, started=None, clock=time.perf_counter):
+        """
+        Args:
+            started: Clock reading the phases are measured from
+            clock: Clock used for all timings
+        """
+        self.clock = clock
+        self.started = clock() if started is None else started
+        self.imports = {}
+        self.phases = []
+        self._stack = []
+
+    def install(self):
+        """Start timing imports"""
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        """Stop timing imports"""
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        """Find a module with the other finders and time its loader"""
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, "find_spec", None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, fullname, self)
+            return spec
+        return None
+
+    def timing(self, name):
+        """Return a context manager timing the import of `name`"""
+        return _Timing(self, name)
+
+    def mark(self, phase, at=None):
+        """Record that `phase` ended now, or at clock reading `at`"""
+        self.phases.append((phase, self.clock() if at is None else at))
+
+    def report(self, stream=None, limit=15):
+        """Write the phase timeline and the slowest imports"""
+        stream = stream or sys.stderr
+        lines = ["Startup profile (ms since main.py started)", f"  {'phase':<28}{'at':>9}{'took':>9}"]
+        previous = self.started
+        for phase, at in self.phases:
+            lines.append(f"  {phase:<28}{(at - self.started) * 1000:>9.1f}"
+                         f"{(at - previous) * 1000:>9.1f}")
+            previous = at
+
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)
+        total = sum(own for _, own in self.imports.values())
+        lines.append(f"Imports: {len(self.imports)} modules, {total * 1000:.1f} ms")
+        lines.append(f"  {'module':<28}{'total':>9}{'self':>9}")
+        for name, (inclusive, own) in slowest[:limit]:
+            lines.append(f"  {name:<28}{inclusive * 1000:>9.1f}{own * 1000:>9.1f}")
+        stream.write("\n".join(lines) + "\n")
\ No newline at end of file
@@ -9,43 +9,185 @@ import os
 import platform
 import socket
 import shutil
+import threading
+import time
 import psutil
-from datetime import datetime
 
+_UNSET = object()
 
-def get_system_info():
-    """Get system information"""
-    info = {}
-    
-    # Basic system information
-    info["OS"] = f"{platform.system()} {platform.release()}"
-    info["Kernel"] = platform.version()
-    info["Hostname"] = socket.gethostname()
-    
-    # Uptime
-    boot_time = datetime.fromtimestamp(psutil.boot_time())
-    uptime = datetime.now() - boot_time
-    days, remainder = divmod(uptime.total_seconds(), 86400)
+
+def format_uptime(seconds):
+    """Format a number of seconds as days, hours, minutes and seconds"""
+    days, remainder = divmod(seconds, 86400)
     hours, remainder = divmod(remainder, 3600)
     minutes, seconds = divmod(remainder, 60)
-    info["Uptime"] = f"{int(days)}d {int(hours)}h {int(minutes)}m {int(seconds)}s"
-    
-    # Shell
+    return f"{int(days)}d {int(hours)}h {int(minutes)}m {int(seconds)}s"
+
+
+def _get_os():
+    return f"{platform.system()} {platform.release()}"
+
+
+def _get_kernel():
+    return platform.version()
+
+
+def _get_shell():
     if platform.system() == "Windows":
-        info["Shell"] = os.environ.get("COMSPEC", "cmd.exe")
-    else:
-        info["Shell"] = os.environ.get("SHELL", "/bin/sh")
-    
-    # Terminal size (as resolution)
+        return os.environ.get("COMSPEC", "cmd.exe")
+    return os.environ.get("SHELL", "/bin/sh")
+
+
+def _get_terminal_size():
     terminal_size = shutil.get_terminal_size()
-    info["Terminal Size"] = f"{terminal_size.columns}x{terminal_size.lines}"
-    
-    # Desktop Environment
-    if platform.system() == "Linux":
-        info["Desktop"] = os.environ.get("XDG_CURRENT_DESKTOP", "Unknown")
-    elif platform.system() == "Darwin":
-        info["Desktop"] = "Aqua"
-    elif platform.system() == "Windows":
-        info["Desktop"] = "Explorer"
-    
-    return info
\ No newline at end of file
+    return f"{terminal_size.columns}x{terminal_size.lines}"
+
+
+def _get_desktop():
+    system = platform.system()
+    if system == "Linux":
+        return os.environ.get("XDG_CURRENT_DESKTOP", "Unknown")
+    elif system == "Darwin":
+        return "Aqua"
+    elif system == "Windows":
+        return "Explorer"
+    return None
+
+
+class SystemInfoProvider:
+    """
+    Cached system information with a time-to-live per field
+
+    Most fields never change while the process is alive, so they are
+    resolved once and kept until `invalidate` is called. Uptime is derived
+    from a single cached boot time instead of being queried each time.
+    """
+
+    # Seconds each field stays cached; None means until invalidated
+    DEFAULT_TTLS = {
+        "OS": None,
+        "Kernel": None,
+        "Hostname": 300.0,
+        "Shell": None,
+        "Terminal Size": None,
+        "Desktop": None,
+    }
+
+    RESOLVERS = {
+        "OS": _get_os,
+        "Kernel": _get_kernel,
+        "Hostname": socket.gethostname,
+        "Shell": _get_shell,
+        "Terminal Size": _get_terminal_size,
+        "Desktop": _get_desktop,
+    }
+
+    def __init__(self, ttls=None):
+        """Initialize the provider, optionally overriding field TTLs"""
+        self.ttls = dict(self.DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self._lock = threading.Lock()
+        self._values = {}
+        self._expires = {}
+        self._boot_time = None
+        self._uptime = (None, "")
+
+    def _field(self, name, now):
+        """Return a cached field, resolving it again once it has expired"""
+        value = self._values.get(name, _UNSET)
+        expires = self._expires.get(name)
+        if value is _UNSET or (expires is not None and now >= expires):
+            value = self.RESOLVERS[name]()
+            ttl = self.ttls.get(name)
+            self._values[name] = value
+            self._expires[name] = None if ttl is None else now + ttl
+        return value
+
+    def boot_time(self):
+        """Return the cached boot time as a UNIX timestamp"""
+        if self._boot_time is None:
+            self._boot_time = psutil.boot_time()
+        return self._boot_time
+
+    def uptime_seconds(self):
+        """Return the seconds since boot derived from the cached boot time"""
+        return time.time() - self.boot_time()
+
+    def uptime(self):
+        """Return the formatted uptime derived from the cached boot time"""
+        seconds = int(self.uptime_seconds())
+        # Frames ask more often than once a second; format each second once
+        cached_seconds, text = self._uptime
+        if cached_seconds != seconds:
+            text = format_uptime(seconds)
+            self._uptime = (seconds, text)
+        return text
+
+    def get(self):
+        """Get system information, touching the OS only for expired fields"""
+        now = time.monotonic()
+        with self._lock:
+            info = {}
+            info["OS"] = self._field("OS", now)
+            info["Kernel"] = self._field("Kernel", now)
+            info["Hostname"] = self._field("Hostname", now)
+            info["Uptime"] = self.uptime()
+            info["Shell"] = self._field("Shell", now)
+            info["Terminal Size"] = self._field("Terminal Size", now)
+            desktop = self._field("Desktop", now)
+            if desktop is not None:
+                info["Desktop"] = desktop
+        return info
+
+    def field(self, name):
+        """Get one field, touching the OS only once it has expired"""
+        with self._lock:
+            return self._field(name, time.monotonic())
+
+    def invalidate(self, field=None):
+        """
+        Drop cached values so they are resolved again on the next `get`
+
+        Args:
+            field: Name of the field to drop, "Uptime" for the boot time,
+                or None to drop everything
+        """
+        with self._lock:
+            if field is None:
+                self._values.clear()
+                self._expires.clear()
+                self._boot_time = None
+            elif field == "Uptime":
+                self._boot_time = None
+            else:
+                self._values.pop(field, None)
+                self._expires.pop(field, None)
+
+
+_default_provider = SystemInfoProvider()
+
+
+def get_system_info():
+    """Get system information"""
+    return _default_provider.get()
+
+
+def get_system_field(name):
+    """Get one field of the system information, such as the terminal size"""
+    return _default_provider.field(name)
+
+
+def get_uptime():
+    """Get the formatted uptime without querying the OS"""
+    return _default_provider.uptime()
+
+
+def get_uptime_seconds():
+    """Get the seconds since boot without querying the OS"""
+    return _default_provider.uptime_seconds()
+
+
+def invalidate_system_info(field=None):
+    """Drop cached system information so it is resolved again"""
+    _default_provider.invalidate(field)
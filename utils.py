@@ -8,15 +8,76 @@ import os
 import sys  # Add this import
 import platform
 import subprocess
+import time
+import unicodedata
+from functools import lru_cache
 
+def char_width(char):
+    """Return how many terminal columns one character takes"""
+    if unicodedata.combining(char) or unicodedata.category(char) in ("Mn", "Me", "Cf"):
+        return 0
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+def display_width(text):
+    """Return how many terminal columns `text` takes"""
+    if text.isascii():
+        return len(text)
+    return sum(map(char_width, text))
+
+def clip_to_width(text, width):
+    """Return the longest start of `text` that fits in `width` columns"""
+    if text.isascii():
+        return text[:max(width, 0)]
+    columns = 0
+    for i, char in enumerate(text):
+        columns += char_width(char)
+        if columns > width:
+            return text[:i]
+    return text
+
+class FileWatcher:
+    """Notice edits to a file by its modification time, checking at most every `interval` seconds"""
+
+    def __init__(self, path, interval=2.0, clock=time.monotonic):
+        self.path = path
+        self.interval = interval
+        self._clock = clock
+        self._checked = clock()
+        self._mtime = self._stat()
+
+    def _stat(self):
+        """Return the file's modification time, or None if it is missing"""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def changed(self):
+        """Return True once after each change to the file"""
+        now = self._clock()
+        if now - self._checked < self.interval:
+            return False
+        self._checked = now
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        return True
+
+@lru_cache(maxsize=1024)
 def format_bytes(bytes_value):
-    """Convert bytes to human-readable format"""
+    """Convert bytes to human-readable format (memoised; totals and idle rates repeat)"""
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
         if bytes_value < 1024:
             return f"{bytes_value:.2f} {unit}"
         bytes_value /= 1024
     return f"{bytes_value:.2f} PB"
 
+@lru_cache(maxsize=2048)
+def format_percent(value):
+    """Format a percentage with one decimal (memoised; samples are rounded to 0.1)"""
+    return f"{value:.1f}%"
+
 def set_square_terminal_size(size=80):
     """
     Attempt to set the terminal to a square size (width x height)